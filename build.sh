@@ -14,8 +14,20 @@ mkdir -p foodshare-app/static/uploads
 # Setup database
 cd foodshare-app
 
-# Run migrations
-python migrate_add_replies.py
+# Add columns introduced since an existing database was created (before
+# init-db, which creates indexes on them)
+python migrate_app_improvements.py
+# Create tables
+flask --app app init-db
+flask --app app rebuild-occupancy
+# Link gardens created before the plant catalog to its plants
+flask --app app index-plants
+
+# Bundle and fingerprint static assets
+flask --app app build-assets
+
+# Pre-render the kiosk pages
+flask --app app kiosk-snapshot
 
 # Run additional migration if it exists
 if [ -f "migrate_profiles.py" ]; then
@@ -0,0 +1,165 @@
+"""
+Batched user activity tracking: last_active and daily streaks
+
+Requests are not written to the database one by one. An after_request hook
+records the signed-in user in an in-memory buffer owned by this worker process,
+keeping one entry per user per (UTC) day. The buffer is written out with two
+executemany UPDATEs when it is ACTIVITY_FLUSH_INTERVAL seconds old or holds
+ACTIVITY_FLUSH_SIZE entries, and once more when the process exits.
+
+  * Any successful request moves User.last_active forward.
+  * Posting, replying, claiming, following, creating gardens (any
+    successful write request) also counts the day towards User.streak: the
+    streak continues if the previous counted day (User.streak_day) was the
+    day before, and restarts at 1 otherwise.
+
+Streaks that were not continued yesterday or today are reset to 0 by the
+'update_streaks' job (jobs.py), one UPDATE over all users.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import g, request
+
+from app import BATCH_SUBREQUEST_KEY, db, User, current_user_id
+
+ACTIVITY_FLUSH_INTERVAL = 30  # seconds
+ACTIVITY_FLUSH_SIZE = 1000
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class ActivityBuffer:
+    """Per-process record of who was active, keyed by (user_id, day)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (user_id, date) -> [last seen datetime, did something]
+        self._started = time.monotonic()
+
+    def record(self, user_id, acted, when=None):
+        when = when or datetime.utcnow()
+        key = (user_id, when.date())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [when, acted]
+            else:
+                entry[0] = max(entry[0], when)
+                entry[1] = entry[1] or acted
+
+    def due(self):
+        return bool(self._entries) and (
+            len(self._entries) >= ACTIVITY_FLUSH_SIZE
+            or time.monotonic() - self._started >= ACTIVITY_FLUSH_INTERVAL
+        )
+
+    def drain(self):
+        """Take every entry, oldest day first"""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._started = time.monotonic()
+        return sorted(entries.items(), key=lambda item: item[0][1])
+
+    def restore(self, entries):
+        """Put drained entries back after a failed write"""
+        for (user_id, _), (when, acted) in entries:
+            self.record(user_id, acted, when)
+
+
+activity_buffer = ActivityBuffer()
+_exit_app = None  # the app the buffer is written through at exit: the latest one set up
+
+
+def flush_at_exit():
+    # Registered once per process: there is one buffer however many apps
+    # (one per test, say) have been created
+    if _exit_app is None:
+        return
+    try:
+        with _exit_app.app_context():
+            flush_activity()
+    except Exception:
+        _exit_app.logger.exception('Could not flush user activity at exit')
+
+
+atexit.register(flush_at_exit)
+
+
+def flush_activity(buffer=activity_buffer):
+    """Write buffered activity to the user table; returns the number of entries"""
+    entries = buffer.drain()
+    if not entries:
+        return 0
+
+    users = User.__table__
+    seen = db.bindparam('seen')
+    touch = users.update().where(users.c.id == db.bindparam('user_id')).values(
+        last_active=db.case(
+            (db.or_(users.c.last_active.is_(None), users.c.last_active < seen), seen),
+            else_=users.c.last_active
+        )
+    )
+    day, previous_day = db.bindparam('day'), db.bindparam('previous_day')
+    count_day = users.update().where(
+        users.c.id == db.bindparam('user_id'),
+        # A day flushed late by another worker must not move streak_day back
+        db.or_(users.c.streak_day.is_(None), users.c.streak_day < day)
+    ).values(
+        streak=db.case(
+            (users.c.streak_day == previous_day, db.func.coalesce(users.c.streak, 0) + 1),
+            else_=1
+        ),
+        streak_day=day
+    )
+
+    touches = [{'user_id': user_id, 'seen': seen_at} for (user_id, _), (seen_at, _) in entries]
+    # One statement per day so consecutive days buffered together both count
+    days = {}
+    for (user_id, active_day), (_, acted) in entries:
+        if acted:
+            days.setdefault(active_day, []).append(
+                {'user_id': user_id, 'day': active_day, 'previous_day': active_day - timedelta(days=1)}
+            )
+
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(touch, touches)
+            for active_day in sorted(days):
+                conn.execute(count_day, days[active_day])
+    except Exception:
+        buffer.restore(entries)
+        raise
+    return len(entries)
+
+
+def reset_broken_streaks(today=None):
+    """Zero every streak whose last counted day is before yesterday"""
+    today = today or datetime.utcnow().date()
+    reset = User.query.filter(
+        User.streak > 0,
+        db.or_(User.streak_day.is_(None), User.streak_day < today - timedelta(days=1))
+    ).update({'streak': 0}, synchronize_session=False)
+    db.session.commit()
+    return reset
+
+
+def init_activity(app):
+    @app.after_request
+    def record_activity(response):
+        user_id = current_user_id()
+        if (user_id is not None and request.blueprint == 'main'
+                and response.status_code < 400 and not g.get('kiosk')):
+            activity_buffer.record(user_id, request.method in WRITE_METHODS)
+            # Not inside /api/batch: an atomic batch holds SQLite's write
+            # lock, so the flush would wait it out and fail
+            if activity_buffer.due() and BATCH_SUBREQUEST_KEY not in request.environ:
+                try:
+                    flush_activity()
+                except Exception:
+                    app.logger.exception('Could not flush user activity')
+        return response
+
+    global _exit_app
+    _exit_app = app
@@ -1,27 +1,37 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import (Blueprint, Flask, abort, current_app, g, render_template, request, jsonify, redirect, session,
+                   stream_with_context, url_for)
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import aliased, joinedload
+import click
+import functools
+import json
 import os
+import random
+import re
+import sys
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import threading
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 
-app = Flask(__name__)
+from config import Config
 
-# Configure SQLite database
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'database', 'foodshare.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Configure file uploads
-UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Helper modules import models from `app`; make that resolve to this module
+# even when it is started directly with `python app.py`
+if __name__ == '__main__':
+    sys.modules['app'] = sys.modules[__name__]
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Extensions are created unbound and attached to an app in create_app(), so
+# importing this module never touches the filesystem or the database.
+db = SQLAlchemy()
+main = Blueprint('main', __name__)
 
-db = SQLAlchemy(app)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 # Request deduplication
 request_locks = {}
@@ -30,10 +40,194 @@ request_queues = defaultdict(list)
 queue_mutex = threading.Lock()
 
 
+# Rows fetched per round trip when streaming list endpoints
+STREAM_BATCH_SIZE = 500
+
+# Home page and garden directory
+FEATURED_GARDEN_COUNT = 3
+GARDEN_DIRECTORY_PAGE_SIZE = 24
+GARDEN_PLANTS_PREVIEW_CHARS = 120
+GARDEN_DIRECTORY_SORTS = ('newest', 'free', 'followed')
+
+# Waitlist allocation: 'fifo' or 'lottery'
+WAITLIST_ALLOCATION_MODE = os.environ.get('WAITLIST_ALLOCATION_MODE', 'fifo')
+
+# Plot attributes (garden owners set them; /api/plots/search filters on them)
+PLOT_SOIL_TYPES = ('loam', 'clay', 'sandy', 'silt')
+PLOT_SUNLIGHT_LEVELS = ('full sun', 'partial shade', 'full shade')
+PLOT_SEARCH_GARDENS = 10  # gardens returned when ?gardens= is not given
+PLOT_SEARCH_MAX_GARDENS = 50
+
+# Community board filters (?status=); 'active' is the live board
+POST_BOARD_FILTERS = ('active', 'resolved', 'all')
+REPLY_PAGE_SIZE = 20
+REPLY_MAX_PAGE_SIZE = 100
+
+# Activity feed limits
+FEED_PAGE_SIZE = 20
+FEED_MAX_ENTRIES_PER_USER = 500
+FEED_MAX_AGE_DAYS = 90
+
+# Plant catalog: names that mean the same plant (the first is the one shown)
+PLANT_SYNONYMS = {
+    'Zucchini': ('courgette',),
+    'Eggplant': ('aubergine', 'brinjal'),
+    'Cilantro': ('coriander',),
+    'Arugula': ('rocket',),
+    'Bell pepper': ('capsicum', 'sweet pepper'),
+    'Scallion': ('green onion', 'spring onion'),
+    'Chickpea': ('garbanzo', 'garbanzo bean'),
+    'Beet': ('beetroot',),
+    'Swiss chard': ('chard', 'silverbeet'),
+    'Okra': ('ladyfinger', 'bhindi'),
+    'Cantaloupe': ('muskmelon', 'rockmelon'),
+}
+PLANT_NAME_MAX_WORDS = 4  # longer pieces of a garden's plants text are prose, not plant names
+PLANT_AUTOCOMPLETE_LIMIT = 10
+
+# Matching new posts to users' favorite plants
+MATCH_MAX_PHRASE_WORDS = 3  # longest plant name found inside a post title
+MATCH_DIGEST_PAGE_SIZE = 10
+MATCH_DIGEST_MAX_AGE_DAYS = 90
+
+# Delta sync (/api/sync): changed entities per response
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+
+# Marks the WSGI environ of requests run by /api/batch (see batch.py)
+BATCH_SUBREQUEST_KEY = 'foodshare.batch'
+
+# Touched whenever a page shown on kiosks changes (see kiosk.py)
+KIOSK_STALE_MARKER = '.stale'
+
+# Background jobs (see jobs.py)
+JOB_MAX_ATTEMPTS = 5
+
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# What the session cookie remembers about the signed-in user (see auth.py)
+SessionUser = namedtuple('SessionUser', 'id username is_guest')
+
+
+def current_user():
+    """The signed-in user making this request, or None.
+
+    Read from the signed session cookie the first time it is asked for and
+    kept on g, so it never costs a database query.
+    """
+    if 'current_user' not in g:
+        try:
+            g.current_user = SessionUser(*session['user'])
+        except (KeyError, TypeError):
+            g.current_user = None
+    return g.current_user
+
+
+def current_user_id():
+    user = current_user()
+    return user.id if user else None
+
+
+def login_required_response():
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Please log in first.'}), 401
+    return redirect(url_for('auth.login', next=request.full_path.rstrip('?')))
+
+
+def login_required(view):
+    """Send anonymous visitors to the login page (401 for API calls)"""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if current_user() is None:
+            return login_required_response()
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def stream_json(query, serialize):
+    """Stream query results as a JSON array, or NDJSON with ?format=ndjson.
+
+    Rows are pulled from the database in batches with yield_per and encoded
+    one at a time, so memory stays flat no matter how large the table is and
+    the first bytes go out before the last row is read.
+    """
+    def dumps(obj):
+        return current_app.json.dumps(obj, separators=(',', ':'))
+
+    ndjson = request.args.get('format') == 'ndjson'
+
+    def generate():
+        if ndjson:
+            for row in query.yield_per(STREAM_BATCH_SIZE):
+                yield dumps(serialize(row)) + '\n'
+            return
+
+        yield '['
+        separator = ''
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            yield separator + dumps(serialize(row))
+            separator = ','
+        yield ']\n'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
+
+
+# =========================
+#      APP FACTORY
+# =========================
+
+def create_app(config=Config):
+    """Build and configure a FoodShare application instance"""
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    if app.config['PROXY_COUNT']:
+        count = app.config['PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=count, x_proto=count, x_host=count)
+
+    db.init_app(app)
+    app.register_blueprint(main)
+
+    from assets import init_assets
+    from auth import init_auth
+    from compression import init_compression
+    from kiosk import init_kiosk
+    from activity import init_activity
+    from ratelimit import init_rate_limiting
+    from plant_search import init_plant_search
+    from profiling import init_profiling
+    from batch import init_batch
+    init_profiling(app)  # first, so profiles include the other hooks
+    init_assets(app)
+    init_auth(app)
+    init_compression(app)
+    init_kiosk(app)
+    init_activity(app)
+    init_rate_limiting(app)
+    init_plant_search(app)
+    init_batch(app)
+
+    from bulk_io import export_command, import_command
+    from jobs import jobs_cli
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(prune_feed_command)
+    app.cli.add_command(rebuild_occupancy_command)
+    app.cli.add_command(pack_gardens_command)
+    app.cli.add_command(index_plants_command)
+    app.cli.add_command(allocate_waitlist_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(jobs_cli)
+
+    return app
+
+
 # =========================
 #       DATABASE MODELS
 # =========================
@@ -56,9 +250,17 @@ class User(db.Model):
     zone = db.Column(db.String(50), default="Zone 3")
     friends = db.Column(db.Integer, default=0)
     streak = db.Column(db.Integer, default=0)
+    streak_day = db.Column(db.Date)  # last (UTC) day counted towards streak
+    password_hash = db.Column(db.String(255))  # None: cannot log in (guest, pre-login accounts)
 
     profile_posts = db.relationship('Post', backref='author', lazy=True)
 
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def check_password(self, password):
+        return bool(self.password_hash) and check_password_hash(self.password_hash, password)
+
     def get_plant_count(self):
         """Calculate real plant count from claimed plots"""
         try:
@@ -111,13 +313,45 @@ class User(db.Model):
         }
 
 
+def plant_words(text):
+    """Lowercase, singular words of a plant name or post text ('Cherry Tomatoes!' -> ['cherry', 'tomato']).
+
+    The singular forms are only approximate, but favorites and posts go
+    through the same rules, so 'Strawberries' still finds 'strawberry'.
+    """
+    words = []
+    for word in re.findall(r'[a-z]+', text.lower()):
+        if len(word) > 3:
+            if word.endswith('ies'):
+                word = word[:-3] + 'y'
+            elif word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+                word = word[:-2]
+            elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+                word = word[:-1]
+        words.append(word)
+    return words
+
+
+def normalize_plant_name(name):
+    return ' '.join(plant_words(name))
+
+
 class FavoritePlant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(120), nullable=False)
+    # normalize_plant_name(name), filled in on insert
+    plant_key = db.Column(db.String(120), default=lambda context: normalize_plant_name(
+        context.get_current_parameters()['name']))
 
     user = db.relationship('User', backref='favorite_plants')
 
+    # The inverted index for matching: plant -> users who like it
+    __table_args__ = (db.Index('ix_favorite_plant_key_user', 'plant_key', 'user_id'),)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name}
+
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -128,10 +362,22 @@ class Post(db.Model):
     location = db.Column(db.String(200))
     image_url = db.Column(db.String(300))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    garden_id = db.Column(db.Integer, db.ForeignKey('garden.id'), nullable=True)
     timestamp = db.Column(db.DateTime, default=db.func.now())
     likes = db.Column(db.Integer, default=0)
+    # 'active' offers are on the live board, 'resolved' ones are kept as
+    # history, 'deleted' ones are hidden everywhere (soft delete)
+    status = db.Column(db.String(20), nullable=False, default='active', server_default='active')
     replies = db.relationship('Reply', backref='post', lazy=True, cascade='all, delete-orphan')
 
+    # The live board only ever reads active posts, so its index stays the
+    # size of the board however much history builds up
+    __table_args__ = (
+        db.Index('ix_post_active_timestamp', 'timestamp', 'id',
+                 sqlite_where=db.text("status = 'active'"),
+                 postgresql_where=db.text("status = 'active'")),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -142,12 +388,38 @@ class Post(db.Model):
             'location': self.location,
             'image_url': self.image_url,
             'author': self.author.username,
+            'garden_id': self.garden_id,
             'likes': self.likes,
+            'status': self.status,
             'timestamp': str(self.timestamp),
-            'reply_count': len(self.replies)
+            'reply_count': self.reply_count
         }
 
 
+# Written as literals rather than bound parameters: SQLite only uses a
+# partial index when the query spells out the index's WHERE condition
+POST_IS_ACTIVE = Post.status == db.literal_column("'active'")
+POST_IS_VISIBLE = Post.status != db.literal_column("'deleted'")
+
+
+def post_board_query(status='active'):
+    """Community board posts, newest first: 'active', 'resolved' or 'all' (not deleted)"""
+    if status == 'resolved':
+        condition = Post.status == db.literal_column("'resolved'")
+    elif status == 'all':
+        condition = POST_IS_VISIBLE
+    else:
+        condition = POST_IS_ACTIVE
+    return Post.query.filter(condition).order_by(Post.timestamp.desc(), Post.id.desc())
+
+
+def get_visible_post_or_404(post_id):
+    post = db.session.get(Post, post_id)
+    if post is None or post.status == 'deleted':
+        abort(404)
+    return post
+
+
 class Reply(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -156,6 +428,9 @@ class Reply(db.Model):
     timestamp = db.Column(db.DateTime, default=db.func.now())
     author = db.relationship('User', backref='replies', lazy=True)
 
+    # A thread page is one range scan, whichever end it starts from
+    __table_args__ = (db.Index('ix_reply_post_id_id', 'post_id', 'id'),)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -167,6 +442,13 @@ class Reply(db.Model):
         }
 
 
+# Counted in the query that loads the post (an index-only count over
+# ix_reply_post_id_id), so showing counts never loads the replies themselves
+Post.reply_count = db.column_property(
+    select(db.func.count(Reply.id)).where(Reply.post_id == Post.id).correlate_except(Reply).scalar_subquery()
+)
+
+
 class Garden(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False, unique=True)
@@ -176,7 +458,11 @@ class Garden(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     rows = db.Column(db.Integer, default=5)
     cols = db.Column(db.Integer, default=5)
-    timestamp = db.Column(db.DateTime, default=db.func.now())
+    timestamp = db.Column(db.DateTime, default=db.func.now(), index=True)
+    # Packed layout: one PLOT_STATE_CODES character per plot, in plot_index
+    # order, and GardenPlot rows only for claimed or annotated plots. None:
+    # a GardenPlot row for every plot. Deferred so listings don't read it.
+    plot_states = db.deferred(db.Column(db.Text))
     plots = db.relationship('GardenPlot', backref='garden', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
@@ -199,11 +485,30 @@ class GardenPlot(db.Model):
     status = db.Column(db.String(20), default='available')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     claimed_at = db.Column(db.DateTime, nullable=True)
+    water_available = db.Column(db.Boolean, default=False)
+    tools_available = db.Column(db.Boolean, default=False)
+    soil_type = db.Column(db.String(50))  # one of PLOT_SOIL_TYPES
+    sunlight_level = db.Column(db.String(20))  # one of PLOT_SUNLIGHT_LEVELS
+    notes = db.Column(db.Text)
+
+    # Both cover plot search (status and attribute filters, then garden and
+    # plot index), so searches and facet counts never read the table: the
+    # first for searches across all gardens, the second for ?garden_id= ones
+    # and for looking up a garden's plots
+    __table_args__ = (
+        db.Index('ix_garden_plot_search', 'status', 'sunlight_level', 'water_available',
+                 'tools_available', 'soil_type', 'garden_id', 'plot_index'),
+        db.Index('ix_garden_plot_garden_search', 'garden_id', 'status', 'sunlight_level',
+                 'water_available', 'tools_available', 'soil_type', 'plot_index'),
+    )
 
-    def to_dict(self):
+    def to_dict(self, owner_names=None):
+        """owner_names: {user_id: username} preloaded for many plots; otherwise the owner is looked up"""
         owner_name = None
-        if self.user_id:
-            user = User.query.get(self.user_id)
+        if self.user_id and owner_names is not None:
+            owner_name = owner_names.get(self.user_id)
+        elif self.user_id:
+            user = db.session.get(User, self.user_id)
             owner_name = user.username if user else None
 
         return {
@@ -213,9 +518,161 @@ class GardenPlot(db.Model):
             'status': self.status,
             'user_id': self.user_id,
             'owner': owner_name,
-            'claimed_at': str(self.claimed_at) if self.claimed_at else None
+            'claimed_at': str(self.claimed_at) if self.claimed_at else None,
+            'water_available': self.water_available,
+            'tools_available': self.tools_available,
+            'soil_type': self.soil_type,
+            'sunlight_level': self.sunlight_level,
+            'notes': self.notes
         }
 
+    def is_annotated(self):
+        return bool(self.water_available or self.tools_available or self.soil_type
+                    or self.sunlight_level or self.notes)
+
+
+def plot_owner_names(plots):
+    """{user_id: username} for the owners of some plots, for GardenPlot.to_dict(owner_names)"""
+    owner_ids = {plot.user_id for plot in plots if plot.user_id}
+    if not owner_ids:
+        return {}
+    return dict(db.session.query(User.id, User.username).filter(User.id.in_(owner_ids)))
+
+
+# Packed layouts (Garden.plot_states): plot status <-> its character
+PLOT_STATE_CODES = {'available': 'a', 'taken': 't', 'mine': 'm', 'null': 'n', 'water': 'w', 'tools': 'o'}
+PLOT_STATES_BY_CODE = {code: status for status, code in PLOT_STATE_CODES.items()}
+
+
+def packed_layout(garden_id):
+    """A garden's packed plot states, or None if it has a row per plot (or does not exist)"""
+    return db.session.query(Garden.plot_states).filter_by(id=garden_id).scalar()
+
+
+def packed_plot_dict(garden_id, plot_index, status):
+    """GardenPlot.to_dict() for a plot of a packed garden that has no row"""
+    return {
+        'id': None,
+        'garden_id': garden_id,
+        'plot_index': plot_index,
+        'status': status,
+        'user_id': None,
+        'owner': None,
+        'claimed_at': None,
+        'water_available': False,
+        'tools_available': False,
+        'soil_type': None,
+        'sunlight_level': None,
+        'notes': None
+    }
+
+
+def packed_plot_dicts(garden_id, plot_states):
+    """Every plot of a packed garden as GardenPlot.to_dict(), in plot_index order"""
+    rows = {plot.plot_index: plot for plot in GardenPlot.query.filter_by(garden_id=garden_id)}
+    owner_names = plot_owner_names(rows.values())
+    plots = []
+    for plot_index, code in enumerate(plot_states):
+        status = PLOT_STATES_BY_CODE[code]
+        plot = rows.get(plot_index)
+        if plot is None:
+            plots.append(packed_plot_dict(garden_id, plot_index, status))
+        else:
+            plots.append(dict(plot.to_dict(owner_names), status=status))  # the packed state is authoritative
+    return plots
+
+
+def packed_plot_to_dict(garden_id, plot_index):
+    """One plot of a packed garden as GardenPlot.to_dict()"""
+    status = PLOT_STATES_BY_CODE[packed_layout(garden_id)[plot_index]]
+    plot = GardenPlot.query.filter_by(garden_id=garden_id, plot_index=plot_index).first()
+    if plot is None:
+        return packed_plot_dict(garden_id, plot_index, status)
+    return dict(plot.to_dict(), status=status)
+
+
+def packed_plot_row(garden_id, plot_index, status):
+    """The GardenPlot row of a plot in a packed garden, added if it has none yet"""
+    plot = GardenPlot.query.filter_by(garden_id=garden_id, plot_index=plot_index).first()
+    if plot is None:
+        plot = GardenPlot(garden_id=garden_id, plot_index=plot_index, status=status)
+        db.session.add(plot)
+        db.session.flush()
+    return plot
+
+
+def set_packed_status(garden_id, plot_index, old_status, new_status):
+    """Change one plot's character in a packed layout if it is still old_status.
+
+    A single conditional UPDATE of the garden row, so of two simultaneous
+    claims only one succeeds. Returns whether the plot changed.
+    """
+    table = Garden.__table__
+    states = table.c.plot_states
+    position = plot_index + 1  # SQL strings are 1-based
+    changed = db.session.execute(table.update().where(
+        table.c.id == garden_id,
+        db.func.substr(states, position, 1) == PLOT_STATE_CODES[old_status]
+    ).values(plot_states=(
+        db.func.substr(states, 1, plot_index, type_=db.Text)
+        + PLOT_STATE_CODES[new_status]
+        + db.func.substr(states, position + 1, type_=db.Text)
+    )))
+    return changed.rowcount == 1
+
+
+def pack_garden(garden_id):
+    """Move a row-per-plot garden to a packed layout, dropping the rows of bare free plots.
+
+    Returns False (and changes nothing) if its plots can't be packed: a gap
+    in the plot indexes or a status without a PLOT_STATE_CODES character.
+    """
+    plots = GardenPlot.query.filter_by(garden_id=garden_id).order_by(GardenPlot.plot_index).all()
+    if ([plot.plot_index for plot in plots] != list(range(len(plots)))
+            or any(plot.status not in PLOT_STATE_CODES for plot in plots)):
+        return False
+    bare = [plot.id for plot in plots if plot.user_id is None and not plot.is_annotated()]
+
+    packed = Garden.query.filter(Garden.id == garden_id, Garden.plot_states.is_(None)).update(
+        {'plot_states': ''.join(PLOT_STATE_CODES[plot.status] for plot in plots)}, synchronize_session=False
+    )
+    if not packed:
+        db.session.rollback()
+        return False
+    GardenPlot.query.filter(GardenPlot.id.in_(bare)).delete(synchronize_session=False)
+    record_change('garden', garden_id)
+    record_change('plot', *bare, op='delete')
+    db.session.commit()
+    return True
+
+
+def unpack_garden(garden_id):
+    """Move a packed garden back to one GardenPlot row per plot"""
+    plot_states = packed_layout(garden_id)
+    if plot_states is None:
+        return False
+    unpacked = Garden.query.filter_by(id=garden_id, plot_states=plot_states).update(
+        {'plot_states': None}, synchronize_session=False
+    )
+    if not unpacked:
+        db.session.rollback()
+        return False
+
+    rows = {plot.plot_index: plot for plot in GardenPlot.query.filter_by(garden_id=garden_id)}
+    added = []
+    for plot_index, code in enumerate(plot_states):
+        plot = rows.get(plot_index)
+        if plot is None:
+            plot = GardenPlot(garden_id=garden_id, plot_index=plot_index)
+            db.session.add(plot)
+            added.append(plot)
+        plot.status = PLOT_STATES_BY_CODE[code]
+    db.session.flush()
+    record_change('garden', garden_id)
+    record_change('plot', *[plot.id for plot in added])
+    db.session.commit()
+    return True
+
 
 class GardenFollower(db.Model):
     """Model for users following gardens"""
@@ -231,28 +688,742 @@ class GardenFollower(db.Model):
     __table_args__ = (db.UniqueConstraint('garden_id', 'user_id', name='unique_garden_follower'),)
 
 
+class Plant(db.Model):
+    """A plant in the catalog; the names people use for it are its PlantAlias rows"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name}
+
+
+class PlantAlias(db.Model):
+    """A normalized plant name (normalize_plant_name) and the catalog plant it means.
+
+    Every plant has one for its own name; PLANT_SYNONYMS adds the others.
+    """
+    key = db.Column(db.String(120), primary_key=True)
+    plant_id = db.Column(db.Integer, db.ForeignKey('plant.id'), nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False)  # as written, for autocomplete
+
+
+class GardenPlant(db.Model):
+    """A catalog plant grown in a garden, parsed from Garden.plants by index_garden_plants()"""
+    garden_id = db.Column(db.Integer, db.ForeignKey('garden.id'), primary_key=True)
+    plant_id = db.Column(db.Integer, db.ForeignKey('plant.id'), primary_key=True)
+
+    # The primary key answers garden -> plants, this index plant -> gardens
+    __table_args__ = (db.Index('ix_garden_plant_plant_id_garden_id', 'plant_id', 'garden_id'),)
+
+
+def split_plant_list(text):
+    """Plant names in a free-text list such as 'Tomatoes, basil & sweet peppers'"""
+    names = []
+    for part in re.split(r'[,;/\n&+]|\band\b', text or '', flags=re.IGNORECASE):
+        part = part.strip(' .\t')
+        if 0 < len(plant_words(part)) <= PLANT_NAME_MAX_WORDS:
+            names.append(part)
+    return names
+
+
+def resolve_plants(names):
+    """Catalog plant ids for plant names, matched by normalized name or alias.
+
+    Names not in the catalog yet are added to it. Call after the
+    transaction's first write: SQLite then lets no other writer add the same
+    plant in between.
+    """
+    wanted = {}
+    for name in names:
+        key = normalize_plant_name(name)
+        if key:
+            wanted.setdefault(key, name)
+    found = dict(db.session.query(PlantAlias.key, PlantAlias.plant_id).filter(PlantAlias.key.in_(wanted)))
+    for key, name in wanted.items():
+        if key not in found:
+            plant = Plant(name=name[:1].upper() + name[1:])
+            db.session.add(plant)
+            db.session.flush()
+            db.session.add(PlantAlias(key=key, plant_id=plant.id, name=name))
+            found[key] = plant.id
+    return [found[key] for key in wanted]
+
+
+def index_garden_plants(garden_id, plants_text):
+    """Link a garden to the catalog plants named in its plants text; the caller commits"""
+    GardenPlant.query.filter_by(garden_id=garden_id).delete(synchronize_session=False)
+    plant_ids = set(resolve_plants(split_plant_list(plants_text)))
+    if plant_ids:
+        db.session.execute(insert(GardenPlant), [
+            {'garden_id': garden_id, 'plant_id': plant_id} for plant_id in plant_ids
+        ])
+    return len(plant_ids)
+
+
+def merge_plant(source_id, target_id):
+    """Fold one catalog plant into another: its aliases and garden links move over"""
+    both = select(GardenPlant.garden_id).where(GardenPlant.plant_id == target_id)
+    GardenPlant.query.filter(
+        GardenPlant.plant_id == source_id, GardenPlant.garden_id.in_(both)
+    ).delete(synchronize_session=False)
+    GardenPlant.query.filter_by(plant_id=source_id).update({'plant_id': target_id}, synchronize_session=False)
+    PlantAlias.query.filter_by(plant_id=source_id).update({'plant_id': target_id}, synchronize_session=False)
+    Plant.query.filter_by(id=source_id).delete(synchronize_session=False)
+
+
+def ensure_plant_synonyms(synonyms=PLANT_SYNONYMS):
+    """Make every synonym name its plant, merging plants that were first added under a synonym"""
+    for canonical, aliases in synonyms.items():
+        [plant_id] = resolve_plants([canonical])
+        keys = {normalize_plant_name(alias): alias for alias in aliases}
+        existing = {alias.key: alias.plant_id for alias in PlantAlias.query.filter(PlantAlias.key.in_(keys))}
+        for key, alias in keys.items():
+            if key not in existing:
+                db.session.add(PlantAlias(key=key, plant_id=plant_id, name=alias))
+            elif existing[key] != plant_id:
+                merge_plant(existing[key], plant_id)
+    db.session.commit()
+
+
+def index_all_garden_plants(only_missing=True):
+    """Parse every garden's plants text into the catalog; returns the number of gardens indexed"""
+    ensure_plant_synonyms()
+    query = db.session.query(Garden.id, Garden.plants).filter(Garden.plants.isnot(None), Garden.plants != '')
+    if only_missing:
+        query = query.filter(~select(GardenPlant.garden_id).where(GardenPlant.garden_id == Garden.id).exists())
+    gardens = query.order_by(Garden.id).all()
+    for count, (garden_id, plants_text) in enumerate(gardens, start=1):
+        index_garden_plants(garden_id, plants_text)
+        if count % STREAM_BATCH_SIZE == 0:
+            db.session.commit()
+    db.session.commit()
+    return len(gardens)
+
+
+class GardenOccupancy(db.Model):
+    """Plot counts per status for one garden.
+
+    Maintained incrementally by garden creation, claim_plot and release_plot
+    so listings can show availability without loading any GardenPlot rows.
+    'flask rebuild-occupancy' recomputes it from garden_plot (and packed
+    layouts).
+    """
+    garden_id = db.Column(db.Integer, db.ForeignKey('garden.id'), primary_key=True)
+    available = db.Column(db.Integer, default=0, nullable=False, index=True)
+    taken = db.Column(db.Integer, default=0, nullable=False)
+    unavailable = db.Column(db.Integer, default=0, nullable=False)
+    water = db.Column(db.Integer, default=0, nullable=False)
+    tools = db.Column(db.Integer, default=0, nullable=False)
+
+    garden = db.relationship('Garden', backref=db.backref('occupancy', uselist=False, cascade='all, delete-orphan'))
+
+    @property
+    def total(self):
+        return self.available + self.taken + self.unavailable + self.water + self.tools
+
+    def to_dict(self):
+        return {
+            'garden_id': self.garden_id,
+            'available': self.available,
+            'taken': self.taken,
+            'null': self.unavailable,
+            'water': self.water,
+            'tools': self.tools,
+            'total': self.total
+        }
+
+
+# GardenPlot.status -> GardenOccupancy column
+OCCUPANCY_COLUMNS = {
+    'available': 'available',
+    'taken': 'taken',
+    'mine': 'taken',
+    'null': 'unavailable',
+    'water': 'water',
+    'tools': 'tools',
+}
+
+
+def occupancy_counts(statuses):
+    """Count an iterable of plot statuses into GardenOccupancy column values"""
+    counts = dict.fromkeys(set(OCCUPANCY_COLUMNS.values()), 0)
+    for status in statuses:
+        column = OCCUPANCY_COLUMNS.get(status)
+        if column:
+            counts[column] += 1
+    return counts
+
+
+def move_occupancy(garden_id, old_status, new_status):
+    """Shift one plot between status counters with a single atomic UPDATE"""
+    old_column = OCCUPANCY_COLUMNS.get(old_status)
+    new_column = OCCUPANCY_COLUMNS.get(new_status)
+    if old_column == new_column:
+        return
+    table = GardenOccupancy.__table__
+    values = {}
+    if old_column:
+        values[old_column] = table.c[old_column] - 1
+    if new_column:
+        values[new_column] = table.c[new_column] + 1
+    db.session.execute(table.update().where(table.c.garden_id == garden_id).values(**values))
+
+
+def rebuild_occupancy(fix=True):
+    """Recompute every garden's counts from garden_plot or its packed layout.
+
+    Returns the ids of gardens whose stored summary was missing or wrong;
+    with fix=True those summaries are rewritten.
+    """
+    actual = defaultdict(lambda: occupancy_counts(()))
+    for garden_id, status, count in db.session.query(
+        GardenPlot.garden_id, GardenPlot.status, db.func.count()
+    ).join(Garden).filter(Garden.plot_states.is_(None)).group_by(GardenPlot.garden_id, GardenPlot.status):
+        column = OCCUPANCY_COLUMNS.get(status)
+        if column:
+            actual[garden_id][column] += count
+    for garden_id, plot_states in db.session.query(Garden.id, Garden.plot_states).filter(
+        Garden.plot_states.isnot(None)
+    ):
+        actual[garden_id] = occupancy_counts(PLOT_STATES_BY_CODE[code] for code in plot_states)
+    for (garden_id,) in db.session.query(Garden.id):
+        actual[garden_id]
+
+    stored = {o.garden_id: o for o in GardenOccupancy.query}
+    mismatched = []
+    for garden_id, counts in actual.items():
+        summary = stored.get(garden_id)
+        if summary and all(getattr(summary, column) == value for column, value in counts.items()):
+            continue
+        mismatched.append(garden_id)
+        if fix:
+            db.session.merge(GardenOccupancy(garden_id=garden_id, **counts))
+
+    if fix:
+        db.session.commit()
+    return sorted(mismatched)
+
+
+class WaitlistEntry(db.Model):
+    """A user queued for a plot in an oversubscribed garden.
+
+    plot_index is None when any plot in the garden will do. Entries are
+    assigned in batches by allocate_waitlist() rather than racing on
+    claim_plot.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    garden_id = db.Column(db.Integer, db.ForeignKey('garden.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    plot_index = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), default='waiting', nullable=False)  # waiting, allocated, cancelled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    allocated_plot_index = db.Column(db.Integer, nullable=True)
+    allocated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_waitlist_entry_garden_status_id', 'garden_id', 'status', 'id'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'garden_id': self.garden_id,
+            'user_id': self.user_id,
+            'plot_index': self.plot_index,
+            'status': self.status,
+            'created_at': str(self.created_at) if self.created_at else None,
+            'allocated_plot_index': self.allocated_plot_index,
+            'allocated_at': str(self.allocated_at) if self.allocated_at else None
+        }
+
+
+def waitlist_is_active(garden_id, plot_index=None):
+    """True if anyone is waiting for this garden (or this specific plot)"""
+    query = WaitlistEntry.query.filter_by(garden_id=garden_id, status='waiting')
+    if plot_index is not None:
+        query = query.filter(db.or_(WaitlistEntry.plot_index.is_(None), WaitlistEntry.plot_index == plot_index))
+    return db.session.query(query.exists()).scalar()
+
+
+def allocate_waitlist(garden_id, mode=None, seed=None):
+    """Hand out a garden's free plots to its waitlist in one transaction.
+
+    'fifo' serves entries in the order they joined, 'lottery' in a random
+    order (pass seed to make a draw reproducible). Each user gets at most one
+    plot per run; entries asking for a plot that is no longer free keep
+    waiting. Returns the list of (user_id, plot_index) assignments.
+    """
+    mode = mode or WAITLIST_ALLOCATION_MODE
+    plot_states = packed_layout(garden_id)
+    if plot_states is None:
+        free = {
+            plot_index: plot_id for plot_id, plot_index in db.session.query(GardenPlot.id, GardenPlot.plot_index)
+            .filter_by(garden_id=garden_id, status='available').order_by(GardenPlot.plot_index)
+        }
+    else:
+        # Plot rows are only added once a plot is actually assigned
+        free = {i: None for i, code in enumerate(plot_states) if code == PLOT_STATE_CODES['available']}
+    entries = WaitlistEntry.query.filter_by(garden_id=garden_id, status='waiting').order_by(WaitlistEntry.id).all()
+    if not free or not entries:
+        return []
+    if mode == 'lottery':
+        random.Random(seed).shuffle(entries)
+
+    now = datetime.utcnow()
+    served_users = set()
+    assignments = []
+    for entry in entries:
+        if not free:
+            break
+        if entry.user_id in served_users:
+            continue
+        if entry.plot_index is None:
+            plot_index = next(iter(free))
+        elif entry.plot_index in free:
+            plot_index = entry.plot_index
+        else:
+            continue
+        plot_id = free.pop(plot_index)
+        served_users.add(entry.user_id)
+        entry.status = 'allocated'
+        entry.allocated_plot_index = plot_index
+        entry.allocated_at = now
+        assignments.append({'plot_id': plot_id, 'user_id': entry.user_id, 'plot_index': plot_index})
+
+    if not assignments:
+        return []
+
+    if plot_states is not None:
+        # All plots in one conditional UPDATE; if anything was claimed since
+        # the layout was read, leave everyone waiting for the next run
+        packed = list(plot_states)
+        for a in assignments:
+            packed[a['plot_index']] = PLOT_STATE_CODES['taken']
+        updated = Garden.query.filter_by(id=garden_id, plot_states=plot_states).update(
+            {'plot_states': ''.join(packed)}, synchronize_session=False
+        )
+        if not updated:
+            db.session.rollback()
+            return []
+        for a in assignments:
+            a['plot_id'] = packed_plot_row(garden_id, a['plot_index'], 'available').id
+        record_change('garden', garden_id)
+
+    # One executemany for all plots, each only if it is still free; if one
+    # was claimed since it was read, leave everyone waiting for the next run
+    plots = GardenPlot.__table__
+    result = db.session.execute(
+        plots.update().where(plots.c.id == db.bindparam('plot_id'), plots.c.status == 'available').values(
+            status='taken', user_id=db.bindparam('user_id'), claimed_at=now
+        ),
+        [{'plot_id': a['plot_id'], 'user_id': a['user_id']} for a in assignments]
+    )
+    if db.engine.dialect.supports_sane_multi_rowcount:
+        updated = result.rowcount
+    else:  # e.g. psycopg2 batches don't report it
+        updated = GardenPlot.query.filter(
+            GardenPlot.id.in_([a['plot_id'] for a in assignments]), GardenPlot.claimed_at == now
+        ).count()
+    if updated != len(assignments):
+        db.session.rollback()
+        return []
+
+    # A user's other queued entries for this garden are no longer needed
+    # once they hold a plot here
+    WaitlistEntry.query.filter(
+        WaitlistEntry.garden_id == garden_id,
+        WaitlistEntry.status == 'waiting',
+        WaitlistEntry.user_id.in_(served_users)
+    ).update({'status': 'cancelled'}, synchronize_session=False)
+
+    occupancy = GardenOccupancy.__table__
+    db.session.execute(occupancy.update().where(occupancy.c.garden_id == garden_id).values(
+        available=occupancy.c.available - len(assignments),
+        taken=occupancy.c.taken + len(assignments)
+    ))
+    for a in assignments:
+        fan_out_garden_event(garden_id, a['user_id'], 'claim', plot_index=a['plot_index'])
+    record_change('plot', *[a['plot_id'] for a in assignments])
+
+    db.session.commit()
+    return [(a['user_id'], a['plot_index']) for a in assignments]
+
+
+class FeedEntry(db.Model):
+    """One item in a follower's activity feed, written when the event happens.
+
+    Garden and actor names are copied in at write time so a feed page is a
+    single range scan over (user_id, id) with no joins.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    garden_id = db.Column(db.Integer, db.ForeignKey('garden.id'), nullable=False)
+    garden_name = db.Column(db.String(120))
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    actor_name = db.Column(db.String(80))
+    event = db.Column(db.String(20), nullable=False)  # 'claim', 'release' or 'post'
+    plot_index = db.Column(db.Integer, nullable=True)
+    post_id = db.Column(db.Integer, nullable=True)
+    post_title = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_feed_entry_user_id_id', 'user_id', 'id'),
+        # Finds a deleted post's entries; most entries are claims with no post
+        db.Index('ix_feed_entry_post_id', 'post_id',
+                 sqlite_where=db.text('post_id IS NOT NULL'),
+                 postgresql_where=db.text('post_id IS NOT NULL')),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'garden_id': self.garden_id,
+            'garden_name': self.garden_name,
+            'actor_id': self.actor_id,
+            'actor': self.actor_name,
+            'event': self.event,
+            'plot_index': self.plot_index,
+            'post_id': self.post_id,
+            'post_title': self.post_title,
+            'created_at': str(self.created_at) if self.created_at else None
+        }
+
+
+def fan_out_garden_event(garden_id, actor_id, event, plot_index=None, post=None, occurred_at=None):
+    """Copy a garden event into the feed of every follower of the garden.
+
+    Runs as one INSERT ... SELECT over garden_follower inside the caller's
+    transaction; the caller commits. Request handlers defer this to the job
+    queue (the 'fan_out_garden_event' job) and pass occurred_at along.
+    """
+    garden_name = db.session.query(Garden.name).filter_by(id=garden_id).scalar()
+    actor_name = db.session.query(User.username).filter_by(id=actor_id).scalar()
+    followers = select(
+        GardenFollower.user_id,
+        literal(garden_id),
+        literal(garden_name),
+        literal(actor_id),
+        literal(actor_name),
+        literal(event),
+        literal(plot_index),
+        literal(post.id if post else None),
+        literal(post.title if post else None),
+        literal(occurred_at or datetime.utcnow()),
+    ).where(GardenFollower.garden_id == garden_id, GardenFollower.user_id != actor_id)
+
+    db.session.execute(insert(FeedEntry).from_select(
+        ['user_id', 'garden_id', 'garden_name', 'actor_id', 'actor_name', 'event',
+         'plot_index', 'post_id', 'post_title', 'created_at'],
+        followers
+    ))
+
+
+def prune_feeds(max_entries=FEED_MAX_ENTRIES_PER_USER, max_age_days=FEED_MAX_AGE_DAYS):
+    """Drop feed entries older than max_age_days or beyond each user's newest max_entries"""
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    expired = FeedEntry.query.filter(FeedEntry.created_at < cutoff).delete(synchronize_session=False)
+
+    ranked = select(
+        FeedEntry.id,
+        db.func.row_number().over(partition_by=FeedEntry.user_id, order_by=FeedEntry.id.desc()).label('rank')
+    ).subquery()
+    overflow = FeedEntry.query.filter(
+        FeedEntry.id.in_(select(ranked.c.id).where(ranked.c.rank > max_entries))
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    return expired + overflow
+
+
+class SurplusMatch(db.Model):
+    """A new post offering a plant that the user has among their favorites.
+
+    Written by match_post() shortly after the post is created, then bundled
+    into the user's next MatchDigest by send_match_digests().
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    plant_name = db.Column(db.String(120))  # the favorite that matched, as the user wrote it
+    digest_id = db.Column(db.Integer, db.ForeignKey('match_digest.id'), nullable=True)  # None: not delivered yet
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_surplus_match'),
+        db.Index('ix_surplus_match_digest_id', 'digest_id'),
+        # Only the undelivered matches, which is all the digest job reads
+        db.Index('ix_surplus_match_pending', 'user_id', 'id',
+                 sqlite_where=db.text('digest_id IS NULL'),
+                 postgresql_where=db.text('digest_id IS NULL')),
+    )
+
+
+class MatchDigest(db.Model):
+    """One delivery of a user's matches: everything since their previous digest"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    match_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_match_digest_user_id_id', 'user_id', 'id'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'match_count': self.match_count,
+            'created_at': str(self.created_at) if self.created_at else None
+        }
+
+
+def post_match_terms(post):
+    """Every run of up to MATCH_MAX_PHRASE_WORDS words in a post's food type and title, normalized"""
+    terms = set()
+    for text in (post.food_type or '', post.title or ''):
+        words = plant_words(text)
+        for length in range(1, MATCH_MAX_PHRASE_WORDS + 1):
+            for start in range(len(words) - length + 1):
+                terms.add(' '.join(words[start:start + length]))
+    return terms
+
+
+def match_post(post):
+    """Record a SurplusMatch for every user, other than the author, whose favorites the post offers.
+
+    One INSERT ... SELECT that looks the post's terms (and their synonyms
+    in the plant catalog) up in the (plant_key, user_id) index, so the cost
+    grows with the number of matches rather than the number of users or
+    favorites. Runs inside the
+    caller's transaction; the caller commits. Returns the number of matches.
+    """
+    terms = post_match_terms(post)
+    if not terms:
+        return 0
+    # Synonyms from the plant catalog: a 'courgette' post reaches 'zucchini' fans
+    synonyms = select(PlantAlias.plant_id).where(PlantAlias.key.in_(terms))
+    terms |= {key for (key,) in db.session.query(PlantAlias.key).filter(PlantAlias.plant_id.in_(synonyms))}
+    already_matched = select(SurplusMatch.id).where(
+        SurplusMatch.post_id == post.id, SurplusMatch.user_id == FavoritePlant.user_id
+    ).exists()
+    matches = select(
+        FavoritePlant.user_id,
+        literal(post.id),
+        db.func.min(FavoritePlant.name),
+        literal(datetime.utcnow()),
+    ).where(
+        FavoritePlant.plant_key.in_(terms),
+        FavoritePlant.user_id != post.user_id,
+        ~already_matched
+    ).group_by(FavoritePlant.user_id)
+
+    result = db.session.execute(insert(SurplusMatch).from_select(
+        ['user_id', 'post_id', 'plant_name', 'created_at'], matches
+    ))
+    return result.rowcount
+
+
+def send_match_digests(max_age_days=MATCH_DIGEST_MAX_AGE_DAYS):
+    """Bundle each user's undelivered matches into one MatchDigest.
+
+    Matches whose post came off the live board in the meantime are dropped
+    instead of delivered, and digests older than max_age_days are deleted.
+    Returns the number of digests created.
+    """
+    post_is_live = select(Post.id).where(Post.id == SurplusMatch.post_id, POST_IS_ACTIVE).exists()
+    SurplusMatch.query.filter(SurplusMatch.digest_id.is_(None), ~post_is_live).delete(synchronize_session=False)
+
+    pending = db.session.query(
+        SurplusMatch.user_id, db.func.count(), db.func.max(SurplusMatch.id)
+    ).filter(SurplusMatch.digest_id.is_(None)).group_by(SurplusMatch.user_id).all()
+    digests = [MatchDigest(user_id=user_id, match_count=count) for user_id, count, _ in pending]
+    db.session.add_all(digests)
+    db.session.flush()
+
+    # Bounded by the last id counted, so matches arriving meanwhile wait
+    # for the next digest instead of making this one's count wrong
+    matches = SurplusMatch.__table__
+    if digests:
+        db.session.execute(
+            matches.update().where(
+                matches.c.user_id == db.bindparam('match_user_id'),
+                matches.c.digest_id.is_(None),
+                matches.c.id <= db.bindparam('last_match_id')
+            ).values(digest_id=db.bindparam('new_digest_id')),
+            [{'match_user_id': digest.user_id, 'last_match_id': last_id, 'new_digest_id': digest.id}
+             for digest, (_, _, last_id) in zip(digests, pending)]
+        )
+
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    expired = select(MatchDigest.id).where(MatchDigest.created_at < cutoff)
+    SurplusMatch.query.filter(SurplusMatch.digest_id.in_(expired)).delete(synchronize_session=False)
+    MatchDigest.query.filter(MatchDigest.created_at < cutoff).delete(synchronize_session=False)
+
+    db.session.commit()
+    return len(digests)
+
+
+def load_match_digests(user_id, limit, before=None):
+    """A user's newest digests as dicts, each with the matched posts that are still visible"""
+    query = MatchDigest.query.filter_by(user_id=user_id)
+    if before:
+        query = query.filter(MatchDigest.id < before)
+    digests = [digest.to_dict() for digest in query.order_by(MatchDigest.id.desc()).limit(limit)]
+    by_id = {digest['id']: dict(digest, matches=[]) for digest in digests}
+    if by_id:
+        rows = db.session.query(SurplusMatch.digest_id, SurplusMatch.plant_name, Post).join(
+            Post, Post.id == SurplusMatch.post_id
+        ).options(joinedload(Post.author)).filter(
+            SurplusMatch.digest_id.in_(by_id), POST_IS_VISIBLE
+        ).order_by(SurplusMatch.id.desc())
+        for digest_id, plant_name, post in rows:
+            by_id[digest_id]['matches'].append({'plant': plant_name, 'post': post.to_dict()})
+    return [by_id[digest['id']] for digest in digests]
+
+
+def mark_kiosk_snapshot_stale():
+    """Flag the kiosk snapshot for re-rendering; call after committing a public change"""
+    marker = os.path.join(current_app.config['KIOSK_SNAPSHOT_DIR'], KIOSK_STALE_MARKER)
+    try:
+        os.utime(marker)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        open(marker, 'a').close()
+
+
+class Job(db.Model):
+    """A unit of deferred work, run by `flask jobs work` (see jobs.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=JOB_MAX_ATTEMPTS)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'payload': json.loads(self.payload),
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': str(self.run_at) if self.run_at else None,
+            'locked_by': self.locked_by,
+            'last_error': self.last_error,
+            'created_at': str(self.created_at) if self.created_at else None,
+            'finished_at': str(self.finished_at) if self.finished_at else None
+        }
+
+
+def enqueue_job(name, run_at=None, max_attempts=JOB_MAX_ATTEMPTS, **payload):
+    """Queue a job inside the caller's transaction; the caller commits.
+
+    The job only becomes visible to workers if the change that triggered it
+    is committed too. payload must be JSON-serializable.
+    """
+    job = Job(
+        name=name,
+        payload=json.dumps(payload, separators=(',', ':')),
+        run_at=run_at or datetime.utcnow(),
+        max_attempts=max_attempts
+    )
+    db.session.add(job)
+    return job
+
+
+class ChangeLog(db.Model):
+    """One write to an entity that clients sync; the id is its version (see api_sync).
+
+    Versions are handed out while SQLite holds its single write lock, so a
+    change never becomes visible after a later version already has.
+    compact_change_log() keeps only the newest row per entity, so the table
+    grows with the number of entities rather than the number of writes.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # a SYNC_ENTITIES key
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False, default='upsert')  # 'upsert' or 'delete'
+    user_id = db.Column(db.Integer, nullable=True)  # private to this user (favorites); None: public
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_change_log_entity', 'entity', 'entity_id', 'id'),
+        # Never reuse a version, even one whose row was compacted away
+        {'sqlite_autoincrement': True},
+    )
+
+
+def record_change(entity, *entity_ids, op='upsert', user_id=None):
+    """Log changed entities inside the caller's transaction; the caller commits"""
+    if not entity_ids:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(ChangeLog), [
+        {'entity': entity, 'entity_id': entity_id, 'op': op, 'user_id': user_id, 'created_at': now}
+        for entity_id in entity_ids
+    ])
+
+
+def compact_change_log():
+    """Delete change log rows superseded by a newer change to the same entity.
+
+    /api/sync only ever sends an entity's newest change, so this never
+    alters what a client receives from any version.
+    """
+    newer = aliased(ChangeLog)
+    removed = ChangeLog.query.filter(
+        select(newer.id).where(
+            newer.entity == ChangeLog.entity,
+            newer.entity_id == ChangeLog.entity_id,
+            newer.id > ChangeLog.id
+        ).exists()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
 # =========================
 #          ROUTES
 # =========================
 
-@app.route('/')
+@main.route('/')
 def index():
-    gardens = Garden.query.all()
-    return render_template('index.html', gardens=gardens)
+    gardens = Garden.query.options(joinedload(Garden.occupancy)).order_by(Garden.id).limit(FEATURED_GARDEN_COUNT).all()
+    garden_count = db.session.query(db.func.count(Garden.id)).scalar()
+    return render_template('index.html', gardens=gardens, garden_count=garden_count)
 
 
-@app.route('/community')
+@main.route('/community')
 def community():
-    posts = Post.query.order_by(Post.timestamp.desc()).all()
-    return render_template('community.html', posts=posts)
+    """The community board: active offers unless ?status=resolved or all"""
+    status = request.args.get('status', 'active')
+    if status not in POST_BOARD_FILTERS:
+        # /api/posts answers 400; a page goes to the default board instead,
+        # so the address shows the filter actually applied
+        return redirect(url_for('main.community'))
+    posts = post_board_query(status).options(joinedload(Post.author)).all()
+    return render_template('community.html', posts=posts, status=status)
 
 
-@app.route('/guest')
+@main.route('/guest')
 def guest_mode():
-    """Guest/Kiosk mode - browse-only access"""
+    """Guest/Kiosk mode - browse-only access.
+
+    Normally answered from the kiosk snapshot (kiosk.py); this live version
+    is only used until the first snapshot has been rendered.
+    """
+    return profile(get_or_create_guest_user().id)
+
+
+def get_or_create_guest_user():
     guest_user = User.query.filter_by(username='guest').first()
     if not guest_user:
-        # Create guest user if it doesn't exist
         guest_user = User(
             username='guest',
             email='guest@foodshare.local',
@@ -263,24 +1434,90 @@ def guest_mode():
         )
         db.session.add(guest_user)
         db.session.commit()
-    
-    # Redirect to guest profile
-    return profile(guest_user.id)
+    return guest_user
 
 
-@app.route('/garden')
+@main.route('/garden')
 def garden():
-    gardens = Garden.query.all()
-    return render_template('garden.html', gardens=gardens)
+    """Garden directory, one page at a time.
+
+    ?sort= newest | free | followed, ?q= filters by name or location,
+    ?open=1 keeps only gardens with free plots and ?page= selects the page. With ?partial=1 only the cards are rendered so
+    the page can append them for infinite scrolling.
+    """
+    sort = request.args.get('sort', 'newest')
+    if sort not in GARDEN_DIRECTORY_SORTS:
+        sort = 'newest'
+    search = request.args.get('q', '').strip()
+    open_only = bool(request.args.get('open'))
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    # Fetch one extra row to know whether another page exists
+    rows = garden_directory_query(sort, search, open_only).offset(
+        (page - 1) * GARDEN_DIRECTORY_PAGE_SIZE
+    ).limit(GARDEN_DIRECTORY_PAGE_SIZE + 1).all()
+    gardens = rows[:GARDEN_DIRECTORY_PAGE_SIZE]
+    next_page = page + 1 if len(rows) > GARDEN_DIRECTORY_PAGE_SIZE else None
+
+    partial = bool(request.args.get('partial'))
+    return render_template(
+        'garden_cards.html' if partial else 'garden.html',
+        gardens=gardens,
+        sort=sort,
+        search=search,
+        open_only=open_only,
+        next_page=next_page,
+        partial=partial
+    )
+
+
+def garden_directory_query(sort, search='', open_only=False):
+    """Column-projected garden listing; plants is truncated to a preview"""
+    query = db.session.query(
+        Garden.id,
+        Garden.name,
+        Garden.description,
+        Garden.location,
+        db.func.substr(Garden.plants, 1, GARDEN_PLANTS_PREVIEW_CHARS).label('plants'),
+        Garden.rows,
+        Garden.cols,
+        Garden.timestamp,
+        db.func.coalesce(GardenOccupancy.available, 0).label('free_plots')
+    ).outerjoin(GardenOccupancy, GardenOccupancy.garden_id == Garden.id)
+
+    if open_only:
+        query = query.filter(GardenOccupancy.available > 0)
+
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(db.or_(Garden.name.ilike(pattern), Garden.location.ilike(pattern)))
+
+    if sort == 'free':
+        query = query.order_by(GardenOccupancy.available.desc(), Garden.id.desc())
+    elif sort == 'followed':
+        follower_counts = db.session.query(
+            GardenFollower.garden_id, db.func.count().label('n')
+        ).group_by(GardenFollower.garden_id).subquery()
+        query = query.outerjoin(follower_counts, follower_counts.c.garden_id == Garden.id).order_by(
+            db.func.coalesce(follower_counts.c.n, 0).desc(), Garden.id.desc()
+        )
+    else:
+        query = query.order_by(Garden.timestamp.desc(), Garden.id.desc())
+
+    return query
 
 
 # ---------- PROFILE + NEW SECTIONS ----------
 
-@app.route('/profile')
-@app.route('/profile/<int:user_id>')
-def profile(user_id=1):
+@main.route('/profile')
+@main.route('/profile/<int:user_id>')
+def profile(user_id=None):
+    if user_id is None:
+        if current_user() is None:
+            return login_required_response()
+        user_id = current_user_id()
     user = User.query.get_or_404(user_id)
-    posts = Post.query.filter_by(user_id=user_id).order_by(Post.timestamp.desc()).all()
+    posts = Post.query.filter(Post.user_id == user_id, POST_IS_VISIBLE).order_by(Post.timestamp.desc()).all()
     gardens = Garden.query.filter_by(user_id=user_id).order_by(Garden.timestamp.desc()).all()
 
     # Calculate real stats
@@ -289,6 +1526,8 @@ def profile(user_id=1):
     followers_count = user.get_followers_count()
 
     favorite_plants = [f.name for f in FavoritePlant.query.filter_by(user_id=user_id).all()]
+    # Only shown to the user themselves
+    match_digests = load_match_digests(user_id, 1) if user_id == current_user_id() else []
 
     # Simple contributions list (computed)
     contributions = [
@@ -306,21 +1545,24 @@ def profile(user_id=1):
         following_count=following_count,
         followers_count=followers_count,
         favorite_plants=favorite_plants,
+        match_digests=match_digests,
         contributions=contributions
     )
 
 
-@app.route('/activity')
+@main.route('/activity')
+@login_required
 def activity():
-    user_id = 1
+    user_id = current_user_id()
     user = User.query.get_or_404(user_id)
     gardens = Garden.query.filter_by(user_id=user_id).order_by(Garden.timestamp.desc()).all()
     return render_template('activity.html', user=user, gardens=gardens)
 
 
-@app.route('/favorites', methods=['GET', 'POST'])
+@main.route('/favorites', methods=['GET', 'POST'])
+@login_required
 def favorites():
-    user_id = 1
+    user_id = current_user_id()
     user = User.query.get_or_404(user_id)
 
     if request.method == 'POST':
@@ -328,26 +1570,36 @@ def favorites():
         plant_name = request.form.get('plant_name', '').strip()
 
         if action == 'add' and plant_name:
-            existing = FavoritePlant.query.filter_by(user_id=user_id, name=plant_name).first()
+            # 'Tomatoes' when 'tomato' is already a favorite is the same plant
+            existing = FavoritePlant.query.filter_by(
+                user_id=user_id, plant_key=normalize_plant_name(plant_name)
+            ).first()
             if not existing:
-                db.session.add(FavoritePlant(user_id=user_id, name=plant_name))
+                favorite = FavoritePlant(user_id=user_id, name=plant_name)
+                db.session.add(favorite)
+                db.session.flush()
+                record_change('favorite', favorite.id, user_id=user_id)
                 db.session.commit()
 
         if action == 'remove' and plant_name:
-            FavoritePlant.query.filter_by(user_id=user_id, name=plant_name).delete()
+            removed = FavoritePlant.query.filter_by(user_id=user_id, name=plant_name).all()
+            for favorite in removed:
+                db.session.delete(favorite)
+            record_change('favorite', *[f.id for f in removed], op='delete', user_id=user_id)
             db.session.commit()
 
-        return redirect(url_for('favorites'))
+        return redirect(url_for('main.favorites'))
 
     favorite_plants = [f.name for f in FavoritePlant.query.filter_by(user_id=user_id).all()]
     return render_template('favorites.html', user=user, favorite_plants=favorite_plants)
 
 
-@app.route('/contributions')
+@main.route('/contributions')
+@login_required
 def contributions():
-    user_id = 1
+    user_id = current_user_id()
     user = User.query.get_or_404(user_id)
-    posts = Post.query.filter_by(user_id=user_id).all()
+    posts = Post.query.filter(Post.user_id == user_id, POST_IS_VISIBLE).all()
     gardens = Garden.query.filter_by(user_id=user_id).all()
 
     contributions = [
@@ -360,7 +1612,7 @@ def contributions():
 
 # ---------- API: USERS ----------
 
-@app.route('/api/users', methods=['GET', 'POST'])
+@main.route('/api/users', methods=['GET', 'POST'])
 def api_users():
     if request.method == 'POST':
         data = request.json
@@ -368,21 +1620,23 @@ def api_users():
         db.session.add(user)
         db.session.commit()
         return jsonify(user.to_dict()), 201
-    users = User.query.all()
-    return jsonify([u.to_dict() for u in users])
+    return stream_json(User.query.order_by(User.id), User.to_dict)
 
 
 # ---------- API: POSTS ----------
 
-@app.route('/api/posts', methods=['GET', 'POST'])
+@main.route('/api/posts', methods=['GET', 'POST'])
 def api_posts():
     if request.method == 'POST':
+        if current_user() is None:
+            return login_required_response()
         title = request.form.get('title', '').strip()
         content = request.form.get('content', '').strip()
         food_type = request.form.get('food_type', '')
         quantity = request.form.get('quantity', '')
         location = request.form.get('location', '')
-        user_id = int(request.form.get('user_id', 1))
+        user_id = current_user_id()
+        garden_id = request.form.get('garden_id', type=int)
 
         if not title or not content:
             return jsonify({'error': 'Title and content are required'}), 400
@@ -426,7 +1680,7 @@ def api_posts():
                     filename = secure_filename(file.filename)
                     timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S_')
                     filename = timestamp_str + filename
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                     file.save(filepath)
                     image_filename = filename
 
@@ -437,10 +1691,18 @@ def api_posts():
                 quantity=quantity,
                 location=location,
                 image_url=image_filename,
-                user_id=user_id
+                user_id=user_id,
+                garden_id=garden_id
             )
             db.session.add(post)
+            db.session.flush()
+            record_change('post', post.id)
+            enqueue_job('match_post', post_id=post.id)
+            if garden_id:
+                enqueue_job('fan_out_garden_event', garden_id=garden_id, actor_id=user_id,
+                            event='post', post_id=post.id, occurred_at=datetime.utcnow().isoformat())
             db.session.commit()
+            mark_kiosk_snapshot_stale()
 
             return jsonify(post.to_dict()), 201
 
@@ -450,26 +1712,74 @@ def api_posts():
         finally:
             post_lock.release()
 
-    posts = Post.query.order_by(Post.timestamp.desc()).all()
-    return jsonify([p.to_dict() for p in posts])
+    status = request.args.get('status', 'active')
+    if status not in POST_BOARD_FILTERS:
+        return jsonify({'error': f"status must be one of {', '.join(POST_BOARD_FILTERS)}"}), 400
+    return stream_json(post_board_query(status).options(joinedload(Post.author)), Post.to_dict)
 
 
-@app.route('/api/posts/<int:post_id>/like', methods=['POST'])
+@main.route('/api/posts/<int:post_id>/like', methods=['POST'])
+@login_required
 def like_post(post_id):
-    post = Post.query.get_or_404(post_id)
+    post = get_visible_post_or_404(post_id)
     post.likes += 1
+    record_change('post', post.id)
     db.session.commit()
+    mark_kiosk_snapshot_stale()
     return jsonify({'likes': post.likes})
 
 
-@app.route('/api/posts/<int:post_id>/replies', methods=['GET', 'POST'])
-def post_replies(post_id):
-    post = Post.query.get_or_404(post_id)
+@main.route('/api/posts/<int:post_id>/resolve', methods=['POST'])
+@login_required
+def resolve_post(post_id):
+    """Take a fulfilled offer off the live board; it stays in the history"""
+    post = get_visible_post_or_404(post_id)
+    if post.user_id != current_user_id():
+        return jsonify({'error': 'Only the author can resolve this post'}), 403
+
+    # Conditional so a double click only changes (and invalidates) once
+    resolved = Post.query.filter_by(id=post.id, status='active').update(
+        {'status': 'resolved'}, synchronize_session=False
+    )
+    if resolved:
+        record_change('post', post.id)
+    db.session.commit()
+    if resolved:
+        mark_kiosk_snapshot_stale()
+    db.session.refresh(post)
+    return jsonify({'success': True, 'status': post.status, 'post': post.to_dict()})
+
+
+@main.route('/api/posts/<int:post_id>', methods=['DELETE'])
+@login_required
+def delete_post(post_id):
+    """Soft delete: the row (and its replies) stay for exports but are hidden everywhere"""
+    post = get_visible_post_or_404(post_id)
+    if post.user_id != current_user_id():
+        return jsonify({'error': 'Only the author can delete this post'}), 403
+
+    deleted = Post.query.filter(Post.id == post.id, POST_IS_VISIBLE).update(
+        {'status': 'deleted'}, synchronize_session=False
+    )
+    if deleted:
+        # Followers' feeds stop linking to it
+        FeedEntry.query.filter(FeedEntry.post_id == post.id).delete(synchronize_session=False)
+        record_change('post', post.id, op='delete')
+    db.session.commit()
+    if deleted:
+        mark_kiosk_snapshot_stale()
+    return jsonify({'success': True, 'message': 'Post deleted'})
+
 
+@main.route('/api/posts/<int:post_id>/replies', methods=['GET', 'POST'])
+def post_replies(post_id):
     if request.method == 'POST':
+        get_visible_post_or_404(post_id)
+        if current_user() is None:
+            return login_required_response()
         data = request.json
         content = data.get('content', '').strip()
-        user_id = data.get('user_id', 1)
+        user_id = current_user_id()
 
         if not content:
             return jsonify({'error': 'Reply content is required'}), 400
@@ -509,7 +1819,6 @@ def post_replies(post_id):
 
             data = best_request
             content = data.get('content', '').strip()
-            user_id = data.get('user_id', 1)
 
             reply = Reply(
                 content=content,
@@ -517,7 +1826,12 @@ def post_replies(post_id):
                 post_id=post_id
             )
             db.session.add(reply)
+            db.session.flush()
+            # The post changes too: its reply_count
+            record_change('reply', reply.id)
+            record_change('post', post_id)
             db.session.commit()
+            mark_kiosk_snapshot_stale()
 
             return jsonify(reply.to_dict()), 201
 
@@ -527,15 +1841,47 @@ def post_replies(post_id):
         finally:
             reply_lock.release()
 
-    replies = Reply.query.filter_by(post_id=post_id).order_by(Reply.timestamp.asc()).all()
-    return jsonify([r.to_dict() for r in replies])
+    return reply_page(post_id)
+
+
+def reply_page(post_id):
+    """Replies oldest first, a page at a time, with their authors in the same query.
+
+    Without a cursor this is the newest page of the thread; pass next_before
+    as ?before= for the page before it. ?since=<id> returns only replies newer
+    than the one the client already has (next_since is set when there are
+    more). ?limit= sets the page size.
+    """
+    limit = min(max(request.args.get('limit', REPLY_PAGE_SIZE, type=int), 1), REPLY_MAX_PAGE_SIZE)
+    before = request.args.get('before', type=int)
+    since = request.args.get('since', type=int)
+
+    query = Reply.query.options(joinedload(Reply.author)).join(Post).filter(
+        Reply.post_id == post_id, POST_IS_VISIBLE
+    )
+    if since is not None:
+        rows = query.filter(Reply.id > since).order_by(Reply.id).limit(limit + 1).all()
+        replies, more = rows[:limit], len(rows) > limit
+        cursors = {'next_since': replies[-1].id if more else None}
+    else:
+        if before is not None:
+            query = query.filter(Reply.id < before)
+        rows = query.order_by(Reply.id.desc()).limit(limit + 1).all()
+        replies, more = rows[:limit][::-1], len(rows) > limit
+        cursors = {'next_before': replies[0].id if more else None}
+
+    if not replies:
+        get_visible_post_or_404(post_id)  # an empty page of a missing post is a 404
+    return jsonify({'replies': [r.to_dict() for r in replies], **cursors})
 
 
 # ---------- API: GARDENS ----------
 
-@app.route('/api/gardens', methods=['GET', 'POST'])
+@main.route('/api/gardens', methods=['GET', 'POST'])
 def api_gardens():
     if request.method == 'POST':
+        if current_user() is None:
+            return login_required_response()
         data = request.json
         garden_name = data['name'].strip()
 
@@ -585,7 +1931,7 @@ def api_gardens():
                 description=data.get('description'),
                 location=data.get('location'),
                 plants=data.get('plants'),
-                user_id=data['user_id'],
+                user_id=current_user_id(),
                 rows=rows,
                 cols=cols
             )
@@ -593,21 +1939,35 @@ def api_gardens():
             db.session.flush()
 
             total_plots = rows * cols
+            statuses = []
             for i in range(total_plots):
                 if plot_states and i < len(plot_states):
                     status = plot_states[i]
                 else:
                     is_null = (i == 0 or i == cols - 1 or i == total_plots - cols or i == total_plots - 1)
                     status = 'null' if is_null else 'available'
+                statuses.append(status)
 
-                plot = GardenPlot(
-                    garden_id=garden.id,
-                    plot_index=i,
-                    status=status
-                )
-                db.session.add(plot)
-
+            plots = []
+            if current_app.config['PACKED_PLOT_LAYOUTS'] and all(status in PLOT_STATE_CODES for status in statuses):
+                garden.plot_states = ''.join(PLOT_STATE_CODES[s] for s in statuses)
+            else:
+                for i, status in enumerate(statuses):
+                    plot = GardenPlot(
+                        garden_id=garden.id,
+                        plot_index=i,
+                        status=status
+                    )
+                    db.session.add(plot)
+                    plots.append(plot)
+
+            db.session.add(GardenOccupancy(garden_id=garden.id, **occupancy_counts(statuses)))
+            db.session.flush()
+            index_garden_plants(garden.id, garden.plants)
+            record_change('garden', garden.id)
+            record_change('plot', *[p.id for p in plots])
             db.session.commit()
+            mark_kiosk_snapshot_stale()
             return jsonify(garden.to_dict()), 201
 
         except Exception as e:
@@ -619,23 +1979,23 @@ def api_gardens():
                 if request_key in request_locks:
                     del request_locks[request_key]
 
-    gardens = Garden.query.all()
-    return jsonify([g.to_dict() for g in gardens])
+    return stream_json(Garden.query.order_by(Garden.id), Garden.to_dict)
 
 
-@app.route('/api/gardens/<int:garden_id>/plots', methods=['GET'])
+@main.route('/api/gardens/<int:garden_id>/plots', methods=['GET'])
 def get_garden_plots(garden_id):
-    garden = Garden.query.get_or_404(garden_id)
-    plots = GardenPlot.query.filter_by(garden_id=garden_id).order_by(GardenPlot.plot_index).all()
-
-    current_user_id = 1
-    plots_data = []
-
-    for plot in plots:
-        plot_dict = plot.to_dict()
-        if plot.user_id == current_user_id and plot.status == 'taken':
+    garden = Garden.query.options(db.undefer(Garden.plot_states)).get_or_404(garden_id)
+    if garden.plot_states is None:
+        plots = GardenPlot.query.filter_by(garden_id=garden_id).order_by(GardenPlot.plot_index).all()
+        owner_names = plot_owner_names(plots)
+        plots_data = [plot.to_dict(owner_names) for plot in plots]
+    else:
+        plots_data = packed_plot_dicts(garden_id, garden.plot_states)
+
+    user_id = current_user_id()
+    for plot_dict in plots_data:
+        if user_id is not None and plot_dict['user_id'] == user_id and plot_dict['status'] == 'taken':
             plot_dict['status'] = 'mine'
-        plots_data.append(plot_dict)
 
     return jsonify({
         'garden_id': garden.id,
@@ -646,70 +2006,602 @@ def get_garden_plots(garden_id):
     })
 
 
-@app.route('/api/gardens/<int:garden_id>/plots/<int:plot_index>/claim', methods=['POST'])
+@main.route('/api/gardens/<int:garden_id>/plots/<int:plot_index>/claim', methods=['POST'])
+@login_required
 def claim_plot(garden_id, plot_index):
-    data = request.json
-    user_id = data.get('user_id', 1)
+    user_id = current_user_id()
 
-    plot = GardenPlot.query.filter_by(garden_id=garden_id, plot_index=plot_index).first()
+    plot_states = packed_layout(garden_id)
+    if plot_states is None:
+        plot = GardenPlot.query.filter_by(garden_id=garden_id, plot_index=plot_index).first()
+        found = plot is not None
+    else:
+        found = 0 <= plot_index < len(plot_states)
 
-    if not plot:
+    if not found:
         return jsonify({'success': False, 'error': 'Plot not found'}), 404
 
-    if plot.status != 'available':
+    # While people are queued, plots go through the waitlist instead
+    if waitlist_is_active(garden_id, plot_index):
+        return jsonify({
+            'success': False,
+            'waitlist': True,
+            'error': 'This garden has a waitlist. Join it to be assigned a plot.'
+        }), 409
+
+    # Conditional update so two simultaneous claims can't both succeed
+    if plot_states is None:
+        claimed = GardenPlot.query.filter_by(id=plot.id, status='available').update(
+            {'status': 'taken', 'user_id': user_id, 'claimed_at': db.func.now()},
+            synchronize_session=False
+        )
+    else:
+        claimed = set_packed_status(garden_id, plot_index, 'available', 'taken')
+        if claimed:
+            plot = packed_plot_row(garden_id, plot_index, 'taken')
+            plot.status, plot.user_id, plot.claimed_at = 'taken', user_id, db.func.now()
+            record_change('garden', garden_id)
+    if not claimed:
         return jsonify({'success': False, 'error': 'Plot is not available'}), 400
 
-    plot.status = 'taken'
-    plot.user_id = user_id
-    plot.claimed_at = db.func.now()
+    move_occupancy(garden_id, 'available', 'taken')
+    record_change('plot', plot.id)
+    enqueue_job('fan_out_garden_event', garden_id=garden_id, actor_id=user_id, event='claim',
+                plot_index=plot_index, occurred_at=datetime.utcnow().isoformat())
 
     db.session.commit()
+    mark_kiosk_snapshot_stale()
+    db.session.refresh(plot)
 
     return jsonify({'success': True, 'plot': plot.to_dict()})
 
 
-@app.route('/api/gardens/<int:garden_id>/plots/<int:plot_index>/release', methods=['POST'])
+@main.route('/api/gardens/<int:garden_id>/plots/<int:plot_index>/release', methods=['POST'])
+@login_required
 def release_plot(garden_id, plot_index):
-    data = request.json
-    user_id = data.get('user_id', 1)
+    user_id = current_user_id()
 
+    plot_states = packed_layout(garden_id)
     plot = GardenPlot.query.filter_by(garden_id=garden_id, plot_index=plot_index).first()
 
-    if not plot:
+    # In a packed garden an unclaimed plot usually has no row
+    if not plot and not (plot_states is not None and 0 <= plot_index < len(plot_states)):
         return jsonify({'success': False, 'error': 'Plot not found'}), 404
 
-    if plot.user_id != user_id:
+    if plot is None or plot.user_id != user_id:
         return jsonify({'success': False, 'error': 'You do not own this plot'}), 403
 
-    plot.status = 'available'
-    plot.user_id = None
-    plot.claimed_at = None
+    # Conditional on the status we read, so a double release only counts once
+    released = GardenPlot.query.filter_by(id=plot.id, user_id=user_id, status=plot.status).update(
+        {'status': 'available', 'user_id': None, 'claimed_at': None},
+        synchronize_session=False
+    )
+    if released:
+        move_occupancy(garden_id, plot.status, 'available')
+        if plot_states is None:
+            record_change('plot', plot.id)
+        else:
+            set_packed_status(garden_id, plot_index, plot.status, 'available')
+            record_change('garden', garden_id)
+            if plot.is_annotated():
+                record_change('plot', plot.id)
+            else:
+                # A plain free plot again, which packed gardens keep no row for
+                db.session.delete(plot)
+                record_change('plot', plot.id, op='delete')
+        enqueue_job('fan_out_garden_event', garden_id=garden_id, actor_id=user_id, event='release',
+                    plot_index=plot_index, occurred_at=datetime.utcnow().isoformat())
 
     db.session.commit()
 
+    # A released plot goes straight to the next person in line
+    if released and waitlist_is_active(garden_id, plot_index):
+        allocate_waitlist(garden_id)
+    if released:
+        mark_kiosk_snapshot_stale()
+
+    if plot_states is not None:
+        return jsonify({'success': True, 'plot': packed_plot_to_dict(garden_id, plot_index)})
+    db.session.refresh(plot)
+    return jsonify({'success': True, 'plot': plot.to_dict()})
+
+
+@main.route('/api/gardens/occupancy', methods=['GET'])
+def garden_occupancy():
+    """Occupancy for many gardens at once: ?ids=1,2,3 (or every garden if omitted)"""
+    query = GardenOccupancy.query
+    ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip().isdigit()]
+    if ids:
+        query = query.filter(GardenOccupancy.garden_id.in_(ids))
+    return jsonify({o.garden_id: o.to_dict() for o in query})
+
+
+# ---------- API: PLOT ATTRIBUTES + SEARCH ----------
+
+# In index column order, so the facet GROUP BY streams off the index
+PLOT_FACETS = ('sunlight_level', 'water_available', 'tools_available', 'soil_type')
+
+
+def parse_flag(value):
+    """'1'/'true'/'yes' -> True, '0'/'false'/'no' -> False, missing -> None"""
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+@main.route('/api/gardens/<int:garden_id>/plots/<int:plot_index>', methods=['PATCH'])
+@login_required
+def update_plot_attributes(garden_id, plot_index):
+    """Set a plot's water/tools/soil/sunlight/notes (garden creator only)"""
+    garden = Garden.query.options(db.undefer(Garden.plot_states)).get_or_404(garden_id)
+    if garden.user_id != current_user_id():
+        return jsonify({'error': 'Only the garden creator can edit its plots'}), 403
+    if garden.plot_states is None:
+        plot = GardenPlot.query.filter_by(garden_id=garden_id, plot_index=plot_index).first_or_404()
+    elif not 0 <= plot_index < len(garden.plot_states):
+        abort(404)
+
+    data = request.get_json(silent=True) or {}
+    if data.get('soil_type') not in (None, *PLOT_SOIL_TYPES):
+        return jsonify({'error': f"soil_type must be one of {', '.join(PLOT_SOIL_TYPES)}"}), 400
+    if data.get('sunlight_level') not in (None, *PLOT_SUNLIGHT_LEVELS):
+        return jsonify({'error': f"sunlight_level must be one of {', '.join(PLOT_SUNLIGHT_LEVELS)}"}), 400
+
+    if garden.plot_states is not None:
+        plot = packed_plot_row(garden_id, plot_index, PLOT_STATES_BY_CODE[garden.plot_states[plot_index]])
+    for field in ('water_available', 'tools_available'):
+        if field in data:
+            setattr(plot, field, bool(data[field]))
+    for field in ('soil_type', 'sunlight_level', 'notes'):
+        if field in data:
+            setattr(plot, field, data[field] or None)
+    record_change('plot', plot.id)
+    db.session.commit()
     return jsonify({'success': True, 'plot': plot.to_dict()})
 
 
+@main.route('/api/plots/search', methods=['GET'])
+def search_plots():
+    """Plots in any garden matching ?sunlight=, ?soil=, ?water=1 and ?tools=1.
+
+    ?status= defaults to available and ?garden_id= (repeatable) limits the
+    search to those gardens. Results are grouped by garden, the N gardens
+    with the most matches first (?gardens=N). facets counts each attribute
+    value among plots that match the other filters, i.e. how many results
+    picking that value would give. In packed gardens only plots with a row
+    (claimed or annotated) are searched, so their bare free plots, which
+    have no attributes to match, are left out of unfiltered counts.
+    """
+    status = request.args.get('status', 'available')
+    filters = {
+        'sunlight_level': request.args.get('sunlight') or None,
+        'soil_type': request.args.get('soil') or None,
+        'water_available': parse_flag(request.args.get('water')),
+        'tools_available': parse_flag(request.args.get('tools')),
+    }
+    filters = {name: value for name, value in filters.items() if value is not None}
+    garden_ids = request.args.getlist('garden_id', type=int)
+    garden_limit = min(max(request.args.get('gardens', PLOT_SEARCH_GARDENS, type=int), 1), PLOT_SEARCH_MAX_GARDENS)
+
+    scope = [GardenPlot.status == status]
+    if garden_ids:
+        scope.append(GardenPlot.garden_id.in_(garden_ids))
+    matching = scope + [getattr(GardenPlot, name) == value for name, value in filters.items()]
+
+    # Every facet and the total from one grouped query over the search index
+    facet_columns = [getattr(GardenPlot, name) for name in PLOT_FACETS]
+    facets = {name: {} for name in PLOT_FACETS}
+    total = 0
+    for *values, count in db.session.query(*facet_columns, db.func.count()).filter(*scope).group_by(*facet_columns):
+        row = dict(zip(PLOT_FACETS, values))
+        mismatched = {name for name, wanted in filters.items() if row[name] != wanted}
+        if not mismatched:
+            total += count
+        for name in PLOT_FACETS:
+            if row[name] is not None and mismatched <= {name}:
+                key = str(row[name]).lower() if isinstance(row[name], bool) else row[name]
+                facets[name][key] = facets[name].get(key, 0) + count
+
+    per_garden = db.session.query(
+        GardenPlot.garden_id, db.func.count().label('matches')
+    ).filter(*matching).group_by(GardenPlot.garden_id).subquery()
+    gardens = db.session.query(
+        Garden.id, Garden.name, Garden.location, per_garden.c.matches
+    ).join(per_garden, per_garden.c.garden_id == Garden.id).order_by(
+        per_garden.c.matches.desc(), Garden.id
+    ).limit(garden_limit).all()
+
+    plot_indexes = defaultdict(list)
+    if gardens:
+        rows = db.session.query(GardenPlot.garden_id, GardenPlot.plot_index).filter(
+            *matching, GardenPlot.garden_id.in_([garden.id for garden in gardens])
+        ).order_by(GardenPlot.garden_id, GardenPlot.plot_index)
+        for garden_id, plot_index in rows:
+            plot_indexes[garden_id].append(plot_index)
+
+    return jsonify({
+        'status': status,
+        'filters': filters,
+        'total': total,
+        'gardens': [{
+            'garden_id': garden.id,
+            'garden_name': garden.name,
+            'location': garden.location,
+            'matches': garden.matches,
+            'plot_indexes': plot_indexes[garden.id]
+        } for garden in gardens],
+        'facets': facets
+    })
+
+
+# ---------- API: WAITLIST ----------
+
+@main.route('/api/gardens/<int:garden_id>/waitlist', methods=['GET', 'POST', 'DELETE'])
+@login_required
+def garden_waitlist(garden_id):
+    """Join (POST), leave (DELETE) or check (GET) a garden's waitlist"""
+    Garden.query.get_or_404(garden_id)
+    user_id = current_user_id()
+
+    waiting = WaitlistEntry.query.filter_by(garden_id=garden_id, user_id=user_id, status='waiting')
+
+    if request.method == 'POST':
+        plot_index = (request.get_json(silent=True) or {}).get('plot_index')
+        entry = waiting.filter_by(plot_index=plot_index).first()
+        if not entry:
+            entry = WaitlistEntry(garden_id=garden_id, user_id=user_id, plot_index=plot_index)
+            db.session.add(entry)
+            db.session.commit()
+        return jsonify({'success': True, 'entry': entry.to_dict(), 'position': waitlist_position(entry)}), 201
+
+    if request.method == 'DELETE':
+        cancelled = waiting.update({'status': 'cancelled'}, synchronize_session=False)
+        db.session.commit()
+        return jsonify({'success': True, 'cancelled': cancelled})
+
+    entries = waiting.order_by(WaitlistEntry.id).all()
+    return jsonify({
+        'garden_id': garden_id,
+        'waiting': db.session.query(db.func.count(WaitlistEntry.id)).filter_by(
+            garden_id=garden_id, status='waiting').scalar(),
+        'entries': [dict(e.to_dict(), position=waitlist_position(e)) for e in entries]
+    })
+
+
+def waitlist_position(entry):
+    """1-based place in the FIFO queue (informational in lottery mode)"""
+    return db.session.query(db.func.count(WaitlistEntry.id)).filter(
+        WaitlistEntry.garden_id == entry.garden_id,
+        WaitlistEntry.status == 'waiting',
+        WaitlistEntry.id <= entry.id
+    ).scalar()
+
+
+# ---------- API: PLANT CATALOG ----------
+
+def get_plant_or_404(name):
+    """The catalog plant a name or any of its synonyms refers to"""
+    plant_id = db.session.query(PlantAlias.plant_id).filter_by(key=normalize_plant_name(name)).scalar()
+    if plant_id is None:
+        abort(404)
+    return db.session.get(Plant, plant_id)
+
+
+@main.route('/api/plants/<name>/gardens', methods=['GET'])
+def plant_gardens(name):
+    """Gardens growing a plant, found by any of its names ('courgette' finds zucchini)"""
+    plant = get_plant_or_404(name)
+    query = Garden.query.join(GardenPlant, GardenPlant.garden_id == Garden.id).filter(
+        GardenPlant.plant_id == plant.id
+    ).order_by(Garden.id)
+    return stream_json(query, Garden.to_dict)
+
+
+@main.route('/api/gardens/<int:garden_id>/plants', methods=['GET'])
+def garden_plants(garden_id):
+    if db.session.query(Garden.id).filter_by(id=garden_id).scalar() is None:
+        abort(404)
+    plants = Plant.query.join(GardenPlant, GardenPlant.plant_id == Plant.id).filter(
+        GardenPlant.garden_id == garden_id
+    ).order_by(Plant.name)
+    return jsonify([plant.to_dict() for plant in plants])
+
+
+@main.route('/api/plants/autocomplete', methods=['GET'])
+def plant_autocomplete():
+    """Catalog plants with a name or synonym starting with ?q=, from the in-memory trie (plant_search.py)"""
+    limit = max(1, min(request.args.get('limit', PLANT_AUTOCOMPLETE_LIMIT, type=int), 50))
+    return jsonify(current_app.extensions['plant_names'].complete(request.args.get('q', ''), limit))
+
+
+# ---------- API: FOLLOWING + FEED ----------
+
+@main.route('/api/gardens/<int:garden_id>/follow', methods=['POST'])
+@login_required
+def follow_garden(garden_id):
+    Garden.query.get_or_404(garden_id)
+    user_id = current_user_id()
+
+    if not GardenFollower.query.filter_by(garden_id=garden_id, user_id=user_id).first():
+        db.session.add(GardenFollower(garden_id=garden_id, user_id=user_id))
+        db.session.commit()
+
+    return jsonify({'success': True, 'is_following': True})
+
+
+@main.route('/api/gardens/<int:garden_id>/unfollow', methods=['POST'])
+@login_required
+def unfollow_garden(garden_id):
+    user_id = current_user_id()
+    GardenFollower.query.filter_by(garden_id=garden_id, user_id=user_id).delete()
+    db.session.commit()
+    return jsonify({'success': True, 'is_following': False})
+
+
+@main.route('/api/gardens/<int:garden_id>/is-following', methods=['GET'])
+def is_following_garden(garden_id):
+    user_id = current_user_id()
+    if user_id is None:
+        return jsonify({'is_following': False})
+    following = GardenFollower.query.filter_by(garden_id=garden_id, user_id=user_id).first() is not None
+    return jsonify({'is_following': following})
+
+
+@main.route('/api/feed', methods=['GET'])
+@login_required
+def api_feed():
+    """Newest-first page of the user's garden activity feed.
+
+    Pass the returned next_before as ?before= to get the following page.
+    """
+    user_id = current_user_id()
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', FEED_PAGE_SIZE, type=int), 100))
+
+    query = FeedEntry.query.filter_by(user_id=user_id)
+    if before:
+        query = query.filter(FeedEntry.id < before)
+    entries = query.order_by(FeedEntry.id.desc()).limit(limit).all()
+
+    return jsonify({
+        'entries': [e.to_dict() for e in entries],
+        'next_before': entries[-1].id if entries and len(entries) == limit else None
+    })
+
+
+@main.route('/api/digests', methods=['GET'])
+@login_required
+def api_digests():
+    """Newest-first page of the user's match digests: new posts offering their favorite plants.
+
+    Pass the returned next_before as ?before= to get the following page.
+    """
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', MATCH_DIGEST_PAGE_SIZE, type=int), 50))
+    digests = load_match_digests(current_user_id(), limit, before)
+    return jsonify({
+        'digests': digests,
+        'next_before': digests[-1]['id'] if digests and len(digests) == limit else None
+    })
+
+
+# ---------- API: SYNC ----------
+
+def sync_plots(ids):
+    plots = GardenPlot.query.filter(GardenPlot.id.in_(ids)).all()
+    owner_names = plot_owner_names(plots)
+    return [p.to_dict(owner_names) for p in plots]
+
+
+# Entity name -> function loading the current state of a list of ids. An id
+# it does not return (gone, or a deleted post and its replies) is sent as a
+# tombstone.
+SYNC_ENTITIES = {
+    'post': lambda ids: [p.to_dict() for p in Post.query.options(joinedload(Post.author))
+                         .filter(Post.id.in_(ids), POST_IS_VISIBLE)],
+    'reply': lambda ids: [r.to_dict() for r in Reply.query.options(joinedload(Reply.author))
+                          .join(Post).filter(Reply.id.in_(ids), POST_IS_VISIBLE)],
+    # Packed gardens' plot states travel with the garden, which changes
+    # whenever one of its plots does
+    'garden': lambda ids: [dict(g.to_dict(), plot_states=g.plot_states) for g in Garden.query.options(
+        db.undefer(Garden.plot_states)).filter(Garden.id.in_(ids))],
+    'plot': sync_plots,
+    'favorite': lambda ids: [f.to_dict() for f in FavoritePlant.query.filter(FavoritePlant.id.in_(ids))],
+}
+
+
+@main.route('/api/sync', methods=['GET'])
+def api_sync():
+    """What changed after ?since=<version>, for clients that keep a local copy.
+
+    Each changed entity appears once, at its newest version, with its
+    current state ('upsert') or as a tombstone ('delete'). Store the
+    returned version and pass it as ?since= next time; has_more means
+    another page is waiting. Without ?since= only the current version is
+    returned: load the full lists (/api/posts, /api/gardens, ...) and sync
+    from that version on. Favorites are only synced to their owner.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        version = db.session.query(db.func.max(ChangeLog.id)).scalar() or 0
+        return jsonify({'version': version, 'changes': [], 'has_more': False})
+    limit = max(1, min(request.args.get('limit', SYNC_PAGE_SIZE, type=int), SYNC_MAX_PAGE_SIZE))
+
+    user_id = current_user_id()
+    visible = ChangeLog.user_id.is_(None)
+    if user_id is not None:
+        visible = db.or_(visible, ChangeLog.user_id == user_id)
+    newest = select(db.func.max(ChangeLog.id)).where(ChangeLog.id > since, visible).group_by(
+        ChangeLog.entity, ChangeLog.entity_id
+    )
+    rows = ChangeLog.query.filter(ChangeLog.id.in_(newest)).order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    upserted = defaultdict(list)
+    for row in rows:
+        if row.op == 'upsert':
+            upserted[row.entity].append(row.entity_id)
+    current = {
+        (entity, item['id']): item
+        for entity, ids in upserted.items()
+        for item in SYNC_ENTITIES[entity](ids)
+    }
+
+    changes = []
+    for row in rows:
+        data = current.get((row.entity, row.entity_id))
+        change = {'version': row.id, 'entity': row.entity, 'id': row.entity_id,
+                  'op': 'delete' if data is None else 'upsert'}
+        if data is not None:
+            change['data'] = data
+        changes.append(change)
+
+    return jsonify({
+        'version': rows[-1].id if rows else since,
+        'changes': changes,
+        'has_more': has_more
+    })
+
+
+# =========================
+#        CLI
+# =========================
+
+def init_db():
+    """Create all tables and make sure the demo user exists.
+
+    With DEMO_PASSWORD set, the demo user can log in with that password.
+    """
+    db.create_all()
+
+    # create_all skips tables that already exist, so add any indexes that
+    # were introduced after those tables were first created
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    # Table statistics let SQLite choose between indexes that share columns
+    # (e.g. the two plot search indexes); PostgreSQL gathers them itself
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    ensure_plant_synonyms()
+    if User.query.filter_by(username='demo').first() is None:
+        demo_user = User(
+            username='demo',
+            email='demo@foodshare.com',
+            bio='Helping our community grow one plant at a time.',
+            location='Clemson, SC',
+            plant_count=45,
+            zone='Zone 3',
+            friends=18,
+            streak=7
+        )
+        db.session.add(demo_user)
+        db.session.commit()
+    demo_password = current_app.config['DEMO_PASSWORD']
+    if demo_password:
+        demo_user = User.query.filter_by(username='demo').first()
+        if not demo_user.check_password(demo_password):
+            demo_user.set_password(demo_password)
+            db.session.commit()
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create database tables and seed the demo user."""
+    init_db()
+    click.echo('Initialized the database.')
+
+
+@click.command('rebuild-occupancy')
+@click.option('--check', is_flag=True, help='Only report gardens whose summary is wrong.')
+@with_appcontext
+def rebuild_occupancy_command(check):
+    """Verify or rebuild the per-garden occupancy summary."""
+    mismatched = rebuild_occupancy(fix=not check)
+    if not mismatched:
+        click.echo('Occupancy summary is consistent.')
+    elif check:
+        click.echo(f'{len(mismatched)} garden(s) out of date: {mismatched[:20]}')
+        sys.exit(1)
+    else:
+        click.echo(f'Rebuilt occupancy for {len(mismatched)} garden(s).')
+
+
+@click.command('pack-gardens')
+@click.option('--garden', 'garden_ids', type=int, multiple=True,
+              help='Only this garden (repeatable; default: every garden).')
+@click.option('--unpack', is_flag=True, help='Go back to one plot row per plot.')
+@with_appcontext
+def pack_gardens_command(garden_ids, unpack):
+    """Convert gardens to packed plot layouts (or back), one transaction each."""
+    query = db.session.query(Garden.id).filter(
+        Garden.plot_states.isnot(None) if unpack else Garden.plot_states.is_(None)
+    )
+    if garden_ids:
+        query = query.filter(Garden.id.in_(garden_ids))
+    convert = unpack_garden if unpack else pack_garden
+    converted = 0
+    for (garden_id,) in query.order_by(Garden.id).all():
+        if convert(garden_id):
+            converted += 1
+        else:
+            click.echo(f'Garden {garden_id}: skipped (plots changed meanwhile or cannot be packed)')
+    click.echo(f"{'Unpacked' if unpack else 'Packed'} {converted} garden(s).")
+
+
+@click.command('index-plants')
+@click.option('--all', 'reindex_all', is_flag=True, help='Re-parse every garden, not just unindexed ones.')
+@with_appcontext
+def index_plants_command(reindex_all):
+    """Fill the plant catalog from gardens' plants text."""
+    indexed = index_all_garden_plants(only_missing=not reindex_all)
+    click.echo(f'Indexed plants for {indexed} garden(s); catalog has '
+               f'{db.session.query(db.func.count(Plant.id)).scalar()} plant(s).')
+
+
+@click.command('allocate-waitlist')
+@click.option('--garden', 'garden_id', type=int, help='Only this garden (default: every garden with a waitlist).')
+@click.option('--mode', type=click.Choice(['fifo', 'lottery']), help='Allocation order.')
+@click.option('--seed', type=int, help='Random seed for a reproducible lottery.')
+@with_appcontext
+def allocate_waitlist_command(garden_id, mode, seed):
+    """Assign free plots to waiting users in one batch per garden."""
+    if garden_id:
+        garden_ids = [garden_id]
+    else:
+        garden_ids = [g for (g,) in db.session.query(WaitlistEntry.garden_id).filter_by(status='waiting').distinct()]
+    for gid in garden_ids:
+        assigned = allocate_waitlist(gid, mode, seed)
+        click.echo(f'Garden {gid}: assigned {len(assigned)} plot(s)')
+
+
+@click.command('prune-feed')
+@click.option('--max-entries', default=FEED_MAX_ENTRIES_PER_USER, show_default=True,
+              help='Entries kept per user.')
+@click.option('--max-age-days', default=FEED_MAX_AGE_DAYS, show_default=True,
+              help='Entries older than this are removed.')
+@with_appcontext
+def prune_feed_command(max_entries, max_age_days):
+    """Trim activity feeds to their size and age limits."""
+    removed = prune_feeds(max_entries, max_age_days)
+    click.echo(f'Removed {removed} feed entries.')
+
+
 # =========================
 #        MAIN
 # =========================
 
 if __name__ == '__main__':
+    app = create_app()
     if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not app.debug:
         with app.app_context():
-            db.create_all()
-            if User.query.filter_by(username='demo').first() is None:
-                demo_user = User(
-                    username='demo',
-                    email='demo@foodshare.com',
-                    bio='Helping our community grow one plant at a time.',
-                    location='Clemson, SC',
-                    plant_count=45,
-                    zone='Zone 3',
-                    friends=18,
-                    streak=7
-                )
-                db.session.add(demo_user)
-                db.session.commit()
+            init_db()
+
+    # The dev server runs its own job worker so feeds etc. still update
+    from jobs import start_worker_thread
+    start_worker_thread(app)
 
     app.run(debug=False, port=5000)
@@ -0,0 +1,275 @@
+"""
+Static asset pipeline
+
+    flask --app app build-assets
+
+Concatenates and minifies the app's stylesheets and scripts into bundles,
+downloads the pinned Bootstrap and Font Awesome releases so pages render
+without internet access (kiosks, flaky garden Wi-Fi), and writes every output
+to static/dist/ under a content-hashed name next to precompressed .gz (and
+.br, when the optional brotli package is installed) copies. The mapping from
+bundle name to hashed file is stored in static/dist/manifest.json.
+
+Templates call asset_tags('<bundle>'). With a manifest, hashed files are
+served with a one-year immutable Cache-Control header and the best
+precompressed variant the client accepts. Without one (local development)
+the source files and CDN links are used directly.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import urllib.request
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are written without it
+    brotli = None
+
+BOOTSTRAP_CDN = 'https://cdnjs.cloudflare.com/ajax/libs/bootstrap/5.3.0'
+FONTAWESOME_CDN = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+
+# Pinned third-party files: path under static/vendor/ -> download URL
+VENDOR_FILES = {
+    'bootstrap/bootstrap.min.css': f'{BOOTSTRAP_CDN}/css/bootstrap.min.css',
+    'bootstrap/bootstrap.bundle.min.js': f'{BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js',
+    'fontawesome/css/all.min.css': f'{FONTAWESOME_CDN}/css/all.min.css',
+}
+for _font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility'):
+    for _ext in ('woff2', 'ttf'):
+        VENDOR_FILES[f'fontawesome/webfonts/{_font}.{_ext}'] = \
+            f'{FONTAWESOME_CDN}/webfonts/{_font}.{_ext}'
+
+# Bundle name -> source files under static/, in load order
+BUNDLES = {
+    'vendor.css': ['vendor/bootstrap/bootstrap.min.css', 'vendor/fontawesome/css/all.min.css'],
+    'vendor.js': ['vendor/bootstrap/bootstrap.bundle.min.js'],
+    'app.css': ['css/main.css', 'css/base.css'],
+    'app.js': ['js/script.js'],
+    'garden.css': ['css/garden.css'],
+    'garden.js': ['js/plot_grid.js', 'js/garden.js'],
+    'community.css': ['css/community.css'],
+    'community.js': ['js/community.js'],
+}
+
+# Used for vendor bundles in development, before anything has been downloaded
+CDN_FALLBACK = {
+    'vendor/bootstrap/bootstrap.min.css': VENDOR_FILES['bootstrap/bootstrap.min.css'],
+    'vendor/bootstrap/bootstrap.bundle.min.js': VENDOR_FILES['bootstrap/bootstrap.bundle.min.js'],
+    'vendor/fontawesome/css/all.min.css': VENDOR_FILES['fontawesome/css/all.min.css'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_TYPES = ('.css', '.js', '.svg', '.ttf', '.json')
+
+assets = Blueprint('assets', __name__)
+
+
+# ============================================================================
+# MINIFICATION
+# ============================================================================
+
+def minify_css(source):
+    """Strip comments and collapse whitespace around CSS punctuation"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """Drop comment-only lines, indentation and blank lines.
+
+    Line breaks are kept so automatic semicolon insertion behaves exactly as
+    in the source; this saves most of the whitespace without needing a parser.
+    """
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def fetch_vendor_files(vendor_dir, force=False):
+    """Download pinned vendor files that are not already present"""
+    for rel_path, url in VENDOR_FILES.items():
+        path = os.path.join(vendor_dir, rel_path)
+        if os.path.exists(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        with open(path + '.part', 'wb') as out:
+            out.write(data)
+        os.replace(path + '.part', path)
+        click.echo(f'Downloaded {url}')
+
+
+def read_bundle_sources(static_dir, sources, fonts):
+    parts = []
+    for rel_path in sources:
+        with open(os.path.join(static_dir, rel_path), encoding='utf-8') as src:
+            text = src.read()
+        if rel_path.endswith('fontawesome/css/all.min.css'):
+            # Point the @font-face rules at the fingerprinted copies in dist/
+            for font, filename in fonts.items():
+                text = text.replace(f'../webfonts/{font}', filename)
+        parts.append(text)
+    return parts
+
+
+def write_hashed(dist_dir, name, data):
+    """Write data as <stem>.<hash><ext> plus compressed variants, return the filename"""
+    stem, ext = os.path.splitext(name)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    filename = f'{stem}.{digest}{ext}'
+    path = os.path.join(dist_dir, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as out:
+        out.write(data)
+    if ext in COMPRESSIBLE_TYPES:
+        # mtime=0 keeps the .gz byte-identical between builds
+        with open(path + '.gz', 'wb') as out:
+            out.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as out:
+                out.write(brotli.compress(data))
+    return filename
+
+
+def build_assets(static_dir):
+    """Rebuild static/dist/ and return the manifest it was written with"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    tmp_dir = dist_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {}
+    fonts = {}
+    fonts_dir = os.path.join(static_dir, 'vendor', 'fontawesome', 'webfonts')
+    if os.path.isdir(fonts_dir):
+        for font in sorted(os.listdir(fonts_dir)):
+            with open(os.path.join(fonts_dir, font), 'rb') as src:
+                fonts[font] = write_hashed(tmp_dir, f'webfonts/{font}', src.read())
+
+    for name, sources in BUNDLES.items():
+        ext = os.path.splitext(name)[1]
+        minify = MINIFIERS[ext]
+        parts = [
+            text if source.startswith('vendor/') else minify(text)
+            for source, text in zip(sources, read_bundle_sources(static_dir, sources, fonts))
+        ]
+        data = '\n'.join(parts).encode('utf-8')
+        manifest[name] = write_hashed(tmp_dir, name, data)
+
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+
+    # Swap in the finished build so a running server never sees half of it
+    old_dir = dist_dir + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(dist_dir):
+        os.replace(dist_dir, old_dir)
+    os.replace(tmp_dir, dist_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+@click.command('build-assets')
+@click.option('--skip-download', is_flag=True,
+              help='Use the vendor files already in static/vendor/ without fetching.')
+@click.option('--refresh-vendor', is_flag=True,
+              help='Download vendor files again even if they are present.')
+def build_assets_command(skip_download, refresh_vendor):
+    """Bundle, fingerprint and precompress static assets into static/dist/."""
+    static_dir = current_app.static_folder
+    if not skip_download:
+        fetch_vendor_files(os.path.join(static_dir, 'vendor'), force=refresh_vendor)
+    manifest = build_assets(static_dir)
+    for name, filename in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(static_dir, DIST_DIR, filename))
+        click.echo(f'{name:<16} -> {filename} ({size} bytes)')
+    if brotli is None:
+        click.echo('brotli not installed: wrote .gz variants only')
+
+
+# ============================================================================
+# SERVING
+# ============================================================================
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as src:
+        return json.load(src)
+
+
+def asset_urls(name):
+    """URLs to include for a bundle: one hashed file when built, else the sources"""
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest and name in manifest:
+        return [url_for('assets.dist_file', filename=manifest[name])]
+    urls = []
+    for source in BUNDLES[name]:
+        if source in CDN_FALLBACK and not os.path.exists(
+                os.path.join(current_app.static_folder, source)):
+            urls.append(CDN_FALLBACK[source])
+        else:
+            urls.append(url_for('static', filename=source))
+    return urls
+
+
+def asset_tags(name):
+    """<link>/<script> tags for a bundle, for use in templates"""
+    if name.endswith('.css'):
+        template = '<link href="{}" rel="stylesheet">'
+    else:
+        template = '<script src="{}"></script>'
+    return Markup('\n'.join(template.format(escape(url)) for url in asset_urls(name)))
+
+
+@assets.route('/static/dist/<path:filename>')
+def dist_file(filename):
+    """Serve a built file, precompressed when the client accepts it"""
+    directory = os.path.join(current_app.static_folder, DIST_DIR)
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.exists(os.path.join(directory, filename + suffix)):
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Every built file is fingerprinted, so a URL's content never changes
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_assets(app):
+    """Register the dist route, template helpers and CLI command"""
+    app.extensions['asset_manifest'] = load_manifest(app)
+    app.register_blueprint(assets)
+    app.jinja_env.globals['asset_tags'] = asset_tags
+    app.cli.add_command(build_assets_command)
@@ -0,0 +1,130 @@
+"""
+Logins and cookie sessions
+
+People sign in at /login with their username and password, or create an
+account at /register. The session is Flask's signed cookie (SECRET_KEY) and
+holds everything a request needs to know about its user: id, username and
+the guest flag. current_user() in app.py reads it once per request, so
+knowing who is asking never costs a database query. Only logging in looks
+the user up.
+
+Passwords are stored as salted hashes (User.password_hash). Accounts made
+before logins existed have none and cannot sign in until one is set:
+
+    flask --app app set-password demo
+
+Session cookies are SameSite=Lax, so other sites cannot make a signed-in
+browser send write requests to the app.
+"""
+import click
+from flask import Blueprint, g, redirect, render_template, request, session, url_for
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+
+from app import db, User, current_user
+
+MIN_PASSWORD_LENGTH = 8
+
+auth = Blueprint('auth', __name__)
+
+
+def login_user(user):
+    # Start from an empty session so nothing from before login carries over
+    session.clear()
+    session['user'] = [user.id, user.username, bool(user.is_guest)]
+    session.permanent = True
+    g.pop('current_user', None)
+
+
+def logout_user():
+    session.clear()
+    g.pop('current_user', None)
+
+
+def redirect_target():
+    """The ?next= page to return to after logging in, if it is on this site"""
+    target = request.values.get('next', '')
+    if target.startswith('/') and not target.startswith('//') and '\\' not in target:
+        return target
+    return url_for('main.index')
+
+
+@auth.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'GET':
+        if current_user() is not None:
+            return redirect(redirect_target())
+        return render_template('login.html', next=request.args.get('next', ''))
+
+    username = request.form.get('username', '').strip()
+    password = request.form.get('password', '')
+    user = User.query.filter_by(username=username).first()
+    if user is None or not user.check_password(password):
+        return render_template('login.html', next=request.form.get('next', ''), username=username,
+                               error='Wrong username or password.'), 401
+
+    login_user(user)
+    return redirect(redirect_target())
+
+
+@auth.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'GET':
+        return render_template('register.html', next=request.args.get('next', ''))
+
+    username = request.form.get('username', '').strip()
+    email = request.form.get('email', '').strip().lower()
+    password = request.form.get('password', '')
+
+    error = None
+    if not username or not email:
+        error = 'Username and email are required.'
+    elif len(password) < MIN_PASSWORD_LENGTH:
+        error = f'Passwords need at least {MIN_PASSWORD_LENGTH} characters.'
+    elif User.query.filter(db.or_(User.username == username, User.email == email)).first():
+        error = 'That username or email is already registered.'
+    else:
+        user = User(username=username, email=email)
+        user.set_password(password)
+        db.session.add(user)
+        try:
+            db.session.commit()
+        except IntegrityError:  # registered by someone else just now
+            db.session.rollback()
+            error = 'That username or email is already registered.'
+
+    if error:
+        return render_template('register.html', next=request.form.get('next', ''), username=username,
+                               email=email, error=error), 400
+
+    login_user(user)
+    return redirect(redirect_target())
+
+
+@auth.route('/logout', methods=['POST'])
+def logout():
+    logout_user()
+    return redirect(url_for('main.index'))
+
+
+@click.command('set-password')
+@click.argument('username')
+@click.password_option()
+@with_appcontext
+def set_password_command(username, password):
+    """Set the login password for a user."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.BadParameter(f'No user called {username!r}.', param_hint='USERNAME')
+    user.set_password(password)
+    db.session.commit()
+    click.echo(f'Password set for {username}.')
+
+
+def init_auth(app):
+    app.register_blueprint(auth)
+    app.cli.add_command(set_password_command)
+
+    @app.context_processor
+    def inject_current_user():
+        return {'current_user': current_user()}
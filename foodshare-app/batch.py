@@ -0,0 +1,150 @@
+"""
+Batched API requests
+
+Pages that need several API calls make them in one round trip:
+
+    POST /api/batch
+    {"requests": [{"method": "POST", "path": "/api/posts/7/replies", "body": {"content": "Thanks!"}},
+                  {"method": "GET", "path": "/api/posts/7/replies?since=41"}]}
+
+    {"responses": [{"status": 201, "body": {...}}, {"status": 200, "body": {...}}]}
+
+Each sub-request goes through the app's normal routing and hooks (the
+caller's session, rate limits, activity), one after another in the order
+given, and the responses come back in that order. Only /api/ paths can be
+batched, at most BATCH_MAX_REQUESTS at a time. A sub-request sends either
+a JSON "body" or, for routes that read a form (creating a post), a
+"form" object of field values; file uploads (post photos) can't be
+batched.
+
+By default every sub-request commits on its own, exactly as if it had been
+sent separately, and a failure doesn't stop the ones after it. With
+"atomic": true the batch is one database transaction: the routes' own
+commits only release savepoints, the first sub-request to answer with an
+error status rolls the whole batch back, and the ones after it are not run
+(status 424). The response then says whether the batch was "committed".
+"""
+import json
+from contextlib import contextmanager
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy.orm import Session
+
+from app import BATCH_SUBREQUEST_KEY, db
+
+BATCH_MAX_REQUESTS = 20
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# Passed on from the batch request to each sub-request
+FORWARDED_HEADERS = ('Cookie', 'User-Agent', 'Accept-Language')
+
+batch = Blueprint('batch', __name__)
+
+
+def batch_error(message):
+    return jsonify({'error': message}), 400
+
+
+def parse_batch_item(item):
+    """(method, path, body, form) of one batched request, or None if it is malformed"""
+    if not isinstance(item, dict):
+        return None
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in BATCH_METHODS or not isinstance(path, str) or not path.startswith('/api/'):
+        return None
+    if path.split('?')[0].rstrip('/') == '/api/batch':  # no nesting
+        return None
+    body, form = item.get('body'), item.get('form')
+    if form is not None and (body is not None or not isinstance(form, dict)
+                             or not all(isinstance(value, (str, int, float)) for value in form.values())):
+        return None
+    return method, path, body, form
+
+
+def run_subrequest(method, path, body, form):
+    """Dispatch one batched request through the app; returns (status, body)"""
+    app = current_app._get_current_object()
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    environ = {'REMOTE_ADDR': request.remote_addr, BATCH_SUBREQUEST_KEY: True}
+    if form is not None:
+        options = {'data': {name: str(value) for name, value in form.items()}}
+    else:
+        options = {} if body is None else {'json': body}
+
+    with app.test_request_context(path, method=method, headers=headers, environ_base=environ, **options):
+        try:
+            response = app.full_dispatch_request()
+            data = response.get_data()  # streamed bodies are read while the context is still up
+        except Exception:
+            app.logger.exception('Batched request %s %s failed', method, path)
+            db.session.rollback()  # so the requests after it start clean
+            return 500, {'error': 'Internal server error'}
+
+    if response.is_json:
+        return response.status_code, json.loads(data) if data else None
+    return response.status_code, data.decode('utf-8', 'replace')
+
+
+@contextmanager
+def single_transaction():
+    """Run the block in one transaction that the routes' commits and rollbacks can't end.
+
+    The routes use db.session as usual; for the duration it is a session
+    bound to one connection whose commit() releases a savepoint. Yields
+    that connection's transaction for the caller to commit; anything not
+    committed is rolled back.
+    """
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    if connection.dialect.name == 'sqlite':
+        # pysqlite only starts a transaction before INSERT/UPDATE/DELETE, so
+        # without this the first savepoint would be the transaction and
+        # releasing it would commit. IMMEDIATE takes the write lock up front.
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+    session = Session(bind=connection, join_transaction_mode='create_savepoint')
+    outer_session = db.session()
+    db.session.registry.set(session)
+    try:
+        yield transaction
+    finally:
+        db.session.registry.set(outer_session)
+        session.close()
+        if transaction.is_active:
+            transaction.rollback()
+        connection.close()
+
+
+@batch.route('/api/batch', methods=['POST'])
+def api_batch():
+    data = request.get_json(silent=True)
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return batch_error('Send {"requests": [{"method": ..., "path": ..., "body" or "form": ...}, ...]}.')
+    if len(items) > BATCH_MAX_REQUESTS:
+        return batch_error(f'At most {BATCH_MAX_REQUESTS} requests per batch.')
+    parsed = [parse_batch_item(item) for item in items]
+    if None in parsed:
+        return batch_error(f'Request {parsed.index(None)} is not an /api/ request this endpoint can run.')
+
+    if not data.get('atomic'):
+        return jsonify({'responses': [
+            dict(zip(('status', 'body'), run_subrequest(*item))) for item in parsed
+        ]})
+
+    responses = []
+    with single_transaction() as transaction:
+        for item in parsed:
+            status, body = run_subrequest(*item)
+            responses.append({'status': status, 'body': body})
+            if status >= 400:
+                break
+        committed = len(responses) == len(parsed) and responses[-1]['status'] < 400
+        if committed:
+            transaction.commit()
+    skipped = {'status': 424, 'body': {'error': 'Not run: an earlier request in this atomic batch failed.'}}
+    responses += [skipped] * (len(parsed) - len(responses))
+    return jsonify({'committed': committed, 'responses': responses})
+
+
+def init_batch(app):
+    app.register_blueprint(batch)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Garden layout benchmark
+
+Creates one garden per storage mode (a GardenPlot row per plot, and the
+packed Garden.plot_states layout) with a few claimed plots, then times
+garden creation, the grid view (GET /api/gardens/<id>/plots) and a
+claim/release round trip, end to end through the app. Creation includes
+api_gardens' fixed 150 ms request-coalescing wait.
+
+Usage:
+    python benchmarks/bench_garden_layout.py [--size 50] [--claimed 50] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def timed(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=50, help='Rows and columns of each garden.')
+    parser.add_argument('--claimed', type=int, default=50, help='Plots claimed before timing the grid view.')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        os.environ['RATELIMIT_ENABLED'] = '0'
+        os.environ['KIOSK_SNAPSHOT_DIR'] = os.path.join(tmp, 'kiosk')
+
+        from activity import flush_activity
+        from app import create_app, db, GardenPlot, init_db
+
+        app = create_app()
+        with app.app_context():
+            init_db()
+        client = app.test_client()
+        client.post('/register', data={'username': 'bench', 'email': 'bench@example.com',
+                                       'password': 'bench-password'})
+
+        print(f"{args.size}x{args.size} garden, {args.claimed} plots claimed ({args.runs} runs each)")
+        for packed in (False, True):
+            app.config['PACKED_PLOT_LAYOUTS'] = packed
+            names = iter(range(10 ** 6))
+
+            def create():
+                response = client.post('/api/gardens', json={
+                    'name': f"{'packed' if packed else 'rows'}-{next(names)}", 'rows': args.size, 'cols': args.size
+                })
+                return response.json['id']
+
+            create_ms = timed(create, args.runs)
+            garden_id = create()
+            for plot_index in range(1, args.claimed + 1):
+                client.post(f'/api/gardens/{garden_id}/plots/{plot_index}/claim')
+
+            view_ms = timed(lambda: client.get(f'/api/gardens/{garden_id}/plots'), args.runs)
+            free_index = args.claimed + 1
+
+            def claim_release():
+                client.post(f'/api/gardens/{garden_id}/plots/{free_index}/claim')
+                client.post(f'/api/gardens/{garden_id}/plots/{free_index}/release')
+
+            claim_ms = timed(claim_release, args.runs)
+            with app.app_context():
+                rows = db.session.query(db.func.count(GardenPlot.id)).filter_by(garden_id=garden_id).scalar()
+            print(f"{'packed' if packed else 'rows':<7} plot rows={rows:<5} create {create_ms:6.1f} ms   "
+                  f"grid view {view_ms:6.1f} ms   claim+release {claim_ms:6.1f} ms")
+
+        with app.app_context():
+            flush_activity()  # before the database is deleted, not at exit
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Plot search benchmark
+
+Generates a synthetic database (seed_data/seed_database.py --generate) and
+times /api/plots/search for a few typical filter combinations, end to end
+through the app.
+
+Usage:
+    python benchmarks/bench_plot_search.py [--gardens 2000] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+SEARCHES = [
+    '/api/plots/search',
+    '/api/plots/search?sunlight=full+sun&water=1',
+    '/api/plots/search?sunlight=full+sun&water=1&tools=1&soil=loam&gardens=3',
+    '/api/plots/search?water=1&garden_id=5&garden_id=7',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--gardens', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'))
+        subprocess.run(
+            [sys.executable, 'seed_data/seed_database.py', '--generate', '--gardens', str(args.gardens),
+             '--users', str(args.gardens), '--posts-per-user', '1'],
+            cwd=APP_DIR, env=env, check=True, capture_output=True
+        )
+        os.environ.update(env)
+        os.environ['RATELIMIT_ENABLED'] = '0'
+
+        from app import create_app, db, GardenPlot, init_db
+
+        app = create_app()
+        with app.app_context():
+            init_db()  # indexes and ANALYZE, as after a deploy
+            plots = db.session.query(db.func.count(GardenPlot.id)).scalar()
+        client = app.test_client()
+
+        print(f"Plot search over {plots} plots in {args.gardens} gardens ({args.runs} runs each)")
+        for url in SEARCHES:
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"{url:<76} total={response.json['total']:<7} median {statistics.median(timings) * 1e3:6.1f} ms   "
+                  f"max {timings[-1] * 1e3:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Request profiling overhead benchmark
+
+Measures what profiling.py costs when it is idle: the before/after request
+hooks on a request without an X-Profile header, and the SQLAlchemy cursor
+listeners on a query (timed against the same query with the listeners
+removed). Then times the community page unprofiled and profiled, end to
+end through the app.
+
+Usage:
+    python benchmarks/bench_profiling.py [--requests 20000] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def median_us(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        os.environ['RATELIMIT_ENABLED'] = '0'
+        os.environ['KIOSK_SNAPSHOT_DIR'] = os.path.join(tmp, 'kiosk')
+        os.environ['PROFILE_DIR'] = os.path.join(tmp, 'profiles')
+
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        import profiling
+        from activity import flush_activity
+        from app import create_app, db, init_db
+
+        app = create_app()
+        with app.app_context():
+            init_db()
+
+        print(f"Idle profiling overhead ({args.requests} calls each)")
+        with app.test_request_context('/community'):
+            response = app.response_class('')
+
+            def hooks():
+                profiling.start_profile()
+                profiling.finish_profile(response)
+
+            print(f"{'request hooks':<22} median {median_us(hooks, args.requests):7.2f} us")
+
+        with app.app_context():
+            connection = db.engine.connect()
+            query = db.text('SELECT 1')
+            listening = median_us(lambda: connection.execute(query), args.requests)
+            event.remove(Engine, 'before_cursor_execute', profiling._before_cursor_execute)
+            event.remove(Engine, 'after_cursor_execute', profiling._after_cursor_execute)
+            bare = median_us(lambda: connection.execute(query), args.requests)
+            event.listen(Engine, 'before_cursor_execute', profiling._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', profiling._after_cursor_execute)
+            connection.close()
+        print(f"{'SQL listeners':<22} median {listening - bare:7.2f} us per query "
+              f"({bare:.1f} us without, {listening:.1f} us with)")
+
+        client = app.test_client()
+        with app.test_request_context():
+            token = profiling.profile_signer().sign('bench').decode()
+
+        def page(headers=None):
+            client.get('/community', headers=headers).close()  # closing writes the profile
+
+        page()  # compile templates
+        print(f"\n/community, {args.runs} runs each")
+        print(f"{'unprofiled':<22} median {median_us(page, args.runs) / 1e3:7.1f} ms")
+        print(f"{'profiled':<22} median {median_us(lambda: page({'X-Profile': token}), args.runs) / 1e3:7.1f} ms")
+
+        with app.app_context():
+            flush_activity()  # before the database is deleted, not at exit
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Rate limiter overhead benchmark
+
+Measures what the limiter adds to a write request: the cost of one
+check_rate_limit() call (a user bucket and an IP bucket) against the
+shared memory-mapped bucket table. Requests are spread over --users users so
+buckets are both created and updated; with fewer users than
+requests / burst, some requests are refused and timed separately.
+
+Usage:
+    python benchmarks/bench_ratelimit.py [--requests 20000] [--users 2000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        os.environ['RATELIMIT_FILE'] = os.path.join(tmp, 'ratelimit.bin')
+
+        from flask import session
+
+        from app import create_app
+        from ratelimit import check_rate_limit
+
+        app = create_app()
+        timings = {'allowed': [], 'refused (429)': []}
+        for i in range(args.requests):
+            user_id = i % args.users
+            with app.test_request_context(
+                '/api/posts/1/like', method='POST',
+                environ_base={'REMOTE_ADDR': f'10.0.{user_id // 250}.{user_id % 250}'}
+            ):
+                session['user'] = [user_id, f'user{user_id}', False]  # signed in
+                start = time.perf_counter()
+                refused = check_rate_limit()
+                elapsed = time.perf_counter() - start
+                timings['refused (429)' if refused else 'allowed'].append(elapsed)
+
+    print(f"Rate limit check over {args.requests} requests ({args.users} users)")
+    for label, samples in timings.items():
+        if not samples:
+            continue
+        samples.sort()
+        print(f"{label:<14} n={len(samples):<6} median {statistics.median(samples) * 1e6:7.1f} us   "
+              f"p99 {samples[int(len(samples) * 0.99)] * 1e6:7.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Worker startup benchmark
+
+Compares how long it takes a fresh worker to serve its first request when
+  1. it imports and builds the app itself (gunicorn without --preload), and
+  2. it is forked from a master that already built the app (--preload).
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 20]
+"""
+import argparse
+import gc
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+COLD_START = """
+import time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+app.test_client().get('/')
+print(time.perf_counter() - start)
+"""
+
+
+def bench_cold(runs, env):
+    """Import + create_app + first request in a brand new interpreter"""
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', COLD_START],
+            cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def bench_fork(runs):
+    """Fork from a preloaded parent and serve the first request"""
+    from app import create_app
+
+    app = create_app()
+    app.test_client().get('/')  # warm templates the way preload would
+    gc.freeze()
+
+    timings = []
+    for _ in range(runs):
+        read_fd, write_fd = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            app.test_client().get('/')
+            os.write(write_fd, b'x')
+            os._exit(0)
+        os.close(write_fd)
+        os.read(read_fd, 1)
+        timings.append(time.perf_counter() - start)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:<28} median {statistics.median(timings) * 1000:8.2f} ms   "
+          f"min {min(timings) * 1000:8.2f} ms   max {max(timings) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        env = dict(os.environ)
+
+        from app import create_app, init_db
+        with create_app().app_context():
+            init_db()
+
+        print(f"Worker cold start over {args.runs} runs")
+        report('import + create_app', bench_cold(args.runs, env))
+        report('fork from preloaded master', bench_fork(args.runs))
+
+
+if __name__ == '__main__':
+    main()
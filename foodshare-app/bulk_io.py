@@ -0,0 +1,180 @@
+"""
+Bulk NDJSON export/import for the FoodShare database
+
+    flask --app app export backups/2025-12-01
+    flask --app app import backups/2025-12-01
+
+Each model is written to its own <table>.ndjson file, one row per line, in
+foreign-key order. Import reads the files back in the same order and inserts
+rows in batched transactions (one executemany per batch). Rows keep their
+primary keys, so the target tables must start out empty (not even the demo
+user from init-db): rows already there would share ids with exported rows
+and the exported ones would be dropped. An interrupted import is continued
+with --resume, which takes the rows already in each table to be the ones
+this import committed and carries on after the highest id.
+"""
+import json
+import os
+from datetime import date, datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+from app import (db, User, Garden, GardenPlot, Post, Reply, GardenFollower,
+                 FavoritePlant, index_all_garden_plants, rebuild_occupancy)
+
+# Parents before children so foreign keys always resolve
+EXPORT_MODELS = [User, Garden, GardenPlot, Post, Reply, GardenFollower, FavoritePlant]
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decoders(table):
+    """Map column name -> function turning a JSON value back into a DB value"""
+    decoders = {}
+    for column in table.columns:
+        if isinstance(column.type, db.DateTime):
+            decoders[column.name] = lambda v: datetime.fromisoformat(v) if v else None
+        elif isinstance(column.type, db.Date):
+            decoders[column.name] = lambda v: date.fromisoformat(v) if v else None
+    return decoders
+
+
+def export_table(table, path, batch_size):
+    """Stream every row of a table into an NDJSON file, ordered by id"""
+    columns = [c.name for c in table.columns]
+    query = select(table).order_by(table.c.id).execution_options(
+        stream_results=True, max_row_buffer=batch_size
+    )
+    count = 0
+    tmp_path = path + '.part'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for row in db.session.execute(query):
+            record = {name: _encode(value) for name, value in zip(columns, row)}
+            out.write(json.dumps(record, separators=(',', ':')) + '\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def id_sequence_reset(table, dialect):
+    """PostgreSQL statement moving a table's id sequence past its highest id"""
+    name = dialect.identifier_preparer.format_table(table)  # quoted: "user" is reserved
+    return select(func.setval(
+        func.pg_get_serial_sequence(name, 'id'), func.coalesce(func.max(table.c.id), 0) + 1, False
+    ))
+
+
+def reset_id_sequence(table):
+    """After inserting explicit ids, make PostgreSQL hand out new ids after them (SQLite does this itself)"""
+    dialect = db.engine.dialect
+    if dialect.name == 'postgresql':
+        db.session.execute(id_sequence_reset(table, dialect))
+        db.session.commit()
+
+
+def import_table(table, path, batch_size):
+    """Insert the rows of an NDJSON file in batches, skipping ids up to the highest one already loaded"""
+    decoders = _decoders(table)
+    last_id = db.session.execute(select(func.max(table.c.id))).scalar() or 0
+    insert = table.insert()
+
+    inserted = 0
+    batch = []
+    with open(path, encoding='utf-8') as src:
+        for line in src:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['id'] <= last_id:
+                continue
+            for name, decode in decoders.items():
+                if name in record:
+                    record[name] = decode(record[name])
+            batch.append(record)
+            if len(batch) >= batch_size:
+                db.session.execute(insert, batch)
+                db.session.commit()
+                inserted += len(batch)
+                batch = []
+
+    if batch:
+        db.session.execute(insert, batch)
+        db.session.commit()
+        inserted += len(batch)
+    return inserted
+
+
+@click.command('export')
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows buffered per database round trip.')
+@with_appcontext
+def export_command(directory, batch_size):
+    """Write every table to DIRECTORY as NDJSON files.
+
+    Tables whose file already exists are skipped, so an interrupted export
+    can be resumed by running the same command again.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for model in EXPORT_MODELS:
+        table = model.__table__
+        path = os.path.join(directory, f'{table.name}.ndjson')
+        if os.path.exists(path):
+            click.echo(f'{table.name}: already exported, skipping')
+            continue
+        count = export_table(table, path, batch_size)
+        click.echo(f'{table.name}: exported {count} rows')
+
+
+@click.command('import')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows inserted per transaction.')
+@click.option('--resume', is_flag=True,
+              help='Continue an interrupted import: rows already in a table are taken to be '
+                   'from that import, and only rows after its highest id are loaded.')
+@with_appcontext
+def import_command(directory, batch_size, resume):
+    """Load NDJSON files written by 'export' from DIRECTORY into empty tables.
+
+    Refuses to load into a table that already has rows, since they could
+    share ids with the exported ones. After an interruption, run it again
+    with --resume to continue where the last committed batch left off.
+    """
+    db.create_all()
+    tables = []
+    for model in EXPORT_MODELS:
+        table = model.__table__
+        path = os.path.join(directory, f'{table.name}.ndjson')
+        if not os.path.exists(path):
+            click.echo(f'{table.name}: no file, skipping')
+            continue
+        tables.append((table, path))
+
+    if not resume:
+        filled = [table.name for table, _ in tables
+                  if db.session.execute(select(table.c.id).limit(1)).first() is not None]
+        if filled:
+            raise click.ClickException(
+                f'Tables already holding rows: {", ".join(filled)}. Import into an empty database '
+                '(let this command create it, not init-db), or pass --resume to continue an '
+                'interrupted import.'
+            )
+
+    for table, path in tables:
+        count = import_table(table, path, batch_size)
+        reset_id_sequence(table)
+        click.echo(f'{table.name}: imported {count} rows')
+
+    # Summaries are derived data, so they are rebuilt rather than exported
+    rebuild_occupancy()
+    click.echo('Rebuilt garden occupancy summary')
+    click.echo(f'Indexed plants for {index_all_garden_plants()} garden(s)')
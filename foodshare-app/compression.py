@@ -0,0 +1,135 @@
+"""
+Response compression and HTTP caching headers
+
+Every response passes through finalize_response() after the view has run:
+
+  * Cache-Control is filled in when the view did not set one. Pages and API
+    reads are 'private, no-cache' and carry a weak ETag, so a browser that
+    already has the current version gets an empty 304 instead of the body.
+    Anything that is not a GET/HEAD is 'no-store'. Files under /static/ use
+    SEND_FILE_MAX_AGE_DEFAULT, and built assets set their own headers.
+
+  * Text responses (HTML, JSON, NDJSON, CSS, JS) are compressed with brotli
+    or gzip, whichever the client prefers (brotli only when the optional
+    brotli package is installed). Buffered bodies below COMPRESS_MIN_SIZE are
+    sent as-is. Streamed responses (stream_json) are compressed chunk by
+    chunk, so they still start sending before the last row is read.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is used on its own without it
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'image/svg+xml',
+}
+
+# Streamed bodies are flushed at least this often so clients see progress
+STREAM_FLUSH_BYTES = 64 * 1024
+
+
+def choose_encoding(accept_encodings):
+    """Pick 'br', 'gzip' or None from the client's Accept-Encoding"""
+    offers = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offers)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31 writes a gzip header and trailer around the deflate data
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def compress_bytes(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return zlib.compress(data, level, wbits=31)
+
+
+def compress_stream(chunks, encoding, level, charset='utf-8'):
+    """Compress an iterable of str/bytes chunks as they are produced"""
+    stream = _BrotliStream(level) if encoding == 'br' else _GzipStream(level)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode(charset)
+        out = stream.compress(chunk)
+        pending += len(chunk)
+        if pending >= STREAM_FLUSH_BYTES:
+            out += stream.flush()
+            pending = 0
+        if out:
+            yield out
+    yield stream.finish()
+
+
+def set_cache_headers(response):
+    if 'Cache-Control' in response.headers or response.direct_passthrough:
+        return
+    if request.method not in ('GET', 'HEAD') or response.status_code >= 400:
+        response.headers['Cache-Control'] = 'no-store'
+        return
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if response.status_code == 200 and not response.is_streamed:
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+
+
+def compress_response(response, config):
+    if (response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)):
+        return
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or request.method == 'HEAD':
+        return
+
+    level = config['COMPRESS_BR_LEVEL'] if encoding == 'br' else config['COMPRESS_GZIP_LEVEL']
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return
+        response.set_data(compress_bytes(data, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+
+
+def init_compression(app):
+    @app.after_request
+    def finalize_response(response):
+        set_cache_headers(response)
+        compress_response(response, app.config)
+        return response
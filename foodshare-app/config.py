@@ -2,19 +2,62 @@
 # Instructions: https://render.com
 
 import os
+from datetime import timedelta
+
+basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Environment configuration
 class Config:
     # Use environment variable for database in production
-    DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///foodshare.db')
+    DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'database', 'foodshare.db'))
     SQLALCHEMY_DATABASE_URI = DATABASE_URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # Security
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
+
+    # Login sessions are signed cookies (see auth.py)
+    PERMANENT_SESSION_LIFETIME = timedelta(days=30)
+    SESSION_COOKIE_SAMESITE = 'Lax'
+    SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', '0') == '1'
+    DEMO_PASSWORD = os.environ.get('DEMO_PASSWORD')  # lets the seeded demo user log in
     
     # File uploads
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
+
+    # HTTP caching and compression (see compression.py)
+    SEND_FILE_MAX_AGE_DEFAULT = int(os.environ.get('STATIC_MAX_AGE', 3600))
+    COMPRESS_MIN_SIZE = 500  # bytes; smaller bodies are not worth the CPU
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BR_LEVEL = 4
+
+    # Kiosk mode snapshots (see kiosk.py)
+    KIOSK_SNAPSHOT_DIR = os.environ.get('KIOSK_SNAPSHOT_DIR', os.path.join(basedir, 'database', 'kiosk'))
+    KIOSK_SNAPSHOT_MAX_AGE = int(os.environ.get('KIOSK_SNAPSHOT_MAX_AGE', 300))  # seconds
+    KIOSK_SNAPSHOT_MIN_AGE = 30  # don't re-render more often than this after writes
+
+    # Rate limiting of write requests (see ratelimit.py)
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
+    RATELIMIT_FILE = os.environ.get('RATELIMIT_FILE', '/dev/shm/foodshare-ratelimit' if os.path.isdir('/dev/shm')
+                                    else os.path.join(basedir, 'database', 'ratelimit.bin'))
+
+    # New gardens store plot statuses packed into one column, with plot rows
+    # only for claimed or annotated plots (see Garden.plot_states)
+    PACKED_PLOT_LAYOUTS = os.environ.get('PACKED_PLOT_LAYOUTS', '0') == '1'
+
+    # Signed-in users allowed on the admin pages (comma-separated usernames)
+    ADMIN_USERNAMES = {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()}
+
+    # On-demand request profiling (see profiling.py)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # fraction of requests, e.g. 0.001
+    PROFILE_TOKEN_MAX_AGE = int(os.environ.get('PROFILE_TOKEN_MAX_AGE', 3600))  # seconds an X-Profile token works
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(basedir, 'database', 'profiles'))
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+
+    # Number of reverse proxies in front of the app (Render: 1), so the
+    # client IP is read from X-Forwarded-For
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 0))
 
 # Update app config for production
 def configure_app(app):
@@ -23,7 +66,6 @@ def configure_app(app):
     app.config.from_object(config)
     
     # Ensure upload directory exists
-    upload_dir = os.path.join(app.root_path, 'static', 'uploads')
-    os.makedirs(upload_dir, exist_ok=True)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
-    return app
\ No newline at end of file
+    return app
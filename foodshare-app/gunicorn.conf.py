@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for production deployment
+
+The application is imported once in the master process (preload_app) and
+workers are forked from it, so modules, templates and the URL map are shared
+copy-on-write instead of being rebuilt by every worker. Recycling a worker
+(max_requests) is then just a fork.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+
+# Recycle workers periodically; with preload this is cheap
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+
+def pre_fork(server, worker):
+    # Move everything allocated during preload into the permanent generation so
+    # the garbage collector in the workers never writes to (and copies) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Workers must never share database connections opened by the master
+    from app import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose()
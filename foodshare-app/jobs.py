@@ -0,0 +1,366 @@
+"""
+Background job queue stored in the app database
+
+    flask --app app jobs work              # run a worker; start several for more throughput
+    flask --app app jobs work --burst      # run everything that is due, then exit
+    flask --app app jobs list --status failed
+    flask --app app jobs stats
+    flask --app app jobs retry 42          # or --all-failed
+    flask --app app jobs enqueue prune_feed
+    flask --app app jobs purge
+
+Request handlers queue work with enqueue_job() (app.py) in their own
+transaction, so a job exists exactly when the change that caused it was
+committed. Workers claim the oldest due job with a conditional UPDATE, which
+lets any number of them share one database without a broker.
+
+A job that raises is retried with exponential backoff until it has been
+tried max_attempts times, then left as 'failed' for `jobs retry`. Jobs still
+'running' after JOB_LOCK_TIMEOUT (their worker died) are put back in the
+queue. Workers keep one instance of every PERIODIC_JOBS entry scheduled.
+"""
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from activity import reset_broken_streaks
+from app import (db, Job, Post, WaitlistEntry, allocate_waitlist, compact_change_log, enqueue_job,
+                 fan_out_garden_event, match_post, prune_feeds, rebuild_occupancy, send_match_digests)
+
+# Retry delay after the n-th failed attempt: base * 2 ** (n - 1), capped
+JOB_BACKOFF_BASE = 30  # seconds
+JOB_BACKOFF_MAX = 3600
+# A job running longer than this is assumed to belong to a dead worker
+JOB_LOCK_TIMEOUT = 600
+JOB_POLL_INTERVAL = 1.0
+# How often a worker requeues abandoned jobs and tops up periodic jobs
+JOB_MAINTENANCE_INTERVAL = 60
+# Finished jobs are deleted after this many days by the purge_jobs job
+JOB_RETENTION_DAYS = 7
+
+TASKS = {}
+
+# Job name -> seconds between runs
+PERIODIC_JOBS = {
+    'allocate_waitlists': 3600,
+    'update_streaks': 3600,
+    'rebuild_occupancy': 24 * 3600,
+    'prune_feed': 24 * 3600,
+    'compact_change_log': 3600,
+    'send_match_digests': 3600,
+    'purge_jobs': 24 * 3600,
+}
+
+
+def task(name):
+    """Register a function as the handler for jobs called name"""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+# ============================================================================
+# TASKS
+# ============================================================================
+
+@task('fan_out_garden_event')
+def fan_out_garden_event_task(garden_id, actor_id, event, plot_index=None, post_id=None, occurred_at=None):
+    post = None
+    if post_id is not None:
+        post = db.session.get(Post, post_id)
+        if post is None or post.status == 'deleted':
+            return  # deleted before the job ran
+    fan_out_garden_event(
+        garden_id, actor_id, event, plot_index=plot_index, post=post,
+        occurred_at=datetime.fromisoformat(occurred_at) if occurred_at else None
+    )
+    db.session.commit()
+
+
+@task('match_post')
+def match_post_task(post_id):
+    post = db.session.get(Post, post_id)
+    if post is None or post.status != 'active':
+        return  # taken down before the job ran
+    match_post(post)
+    db.session.commit()
+
+
+@task('send_match_digests')
+def send_match_digests_task():
+    send_match_digests()
+
+
+@task('allocate_waitlists')
+def allocate_waitlists_task():
+    garden_ids = [g for (g,) in db.session.query(WaitlistEntry.garden_id).filter_by(status='waiting').distinct()]
+    for garden_id in garden_ids:
+        allocate_waitlist(garden_id)
+
+
+@task('update_streaks')
+def update_streaks_task():
+    reset_broken_streaks()
+
+
+@task('rebuild_occupancy')
+def rebuild_occupancy_task():
+    rebuild_occupancy(fix=True)
+
+
+@task('prune_feed')
+def prune_feed_task():
+    prune_feeds()
+
+
+@task('compact_change_log')
+def compact_change_log_task():
+    compact_change_log()
+
+
+@task('purge_jobs')
+def purge_jobs_task(days=JOB_RETENTION_DAYS):
+    purge_jobs(days)
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+def backoff_delay(attempts):
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_next_job(worker_id):
+    """Mark the oldest due job as running for this worker and return it"""
+    while True:
+        now = datetime.utcnow()
+        job_id = db.session.query(Job.id).filter(
+            Job.status == 'queued', Job.run_at <= now
+        ).order_by(Job.run_at, Job.id).limit(1).scalar()
+        if job_id is None:
+            return None
+
+        # Conditional so two workers can't both take the same job
+        claimed = Job.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'running', 'locked_by': worker_id, 'locked_at': now, 'attempts': Job.attempts + 1},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome"""
+    job_id, name = job.id, job.name
+    try:
+        handler = TASKS.get(name)
+        if handler is None:
+            raise LookupError(f'No task registered as {name!r}')
+        handler(**json.loads(job.payload))
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        job = db.session.get(Job, job_id)
+        job.last_error = error
+        job.locked_by = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+        finished = job.status == 'failed'
+    else:
+        job = db.session.get(Job, job_id)
+        job.status = 'done'
+        job.locked_by = None
+        job.finished_at = datetime.utcnow()
+        finished = True
+
+    if finished and name in PERIODIC_JOBS:
+        enqueue_job(name, run_at=datetime.utcnow() + timedelta(seconds=PERIODIC_JOBS[name]))
+    db.session.commit()
+    return job.status
+
+
+def requeue_abandoned_jobs():
+    """Put jobs whose worker died back in the queue (or fail them if out of attempts)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    abandoned = Job.query.filter(Job.status == 'running', Job.locked_at < cutoff)
+    failed = abandoned.filter(Job.attempts >= Job.max_attempts).update(
+        {'status': 'failed', 'locked_by': None, 'finished_at': datetime.utcnow(),
+         'last_error': 'Worker stopped responding'},
+        synchronize_session=False
+    )
+    requeued = abandoned.update(
+        {'status': 'queued', 'locked_by': None, 'run_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return requeued + failed
+
+
+def ensure_periodic_jobs():
+    """Queue any periodic job that has no pending or running instance"""
+    pending = {name for (name,) in db.session.query(Job.name).filter(
+        Job.name.in_(PERIODIC_JOBS), Job.status.in_(['queued', 'running'])
+    ).distinct()}
+    for name in PERIODIC_JOBS:
+        if name not in pending:
+            enqueue_job(name)
+    db.session.commit()
+
+
+def purge_jobs(days=JOB_RETENTION_DAYS):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = Job.query.filter(
+        Job.status.in_(['done', 'failed']), Job.finished_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def work(worker_id=None, burst=False, poll_interval=JOB_POLL_INTERVAL, stop_event=None):
+    """Process jobs until stopped (or, with burst, until none are due).
+
+    Must run inside an app context. Returns the number of jobs processed.
+    """
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    stop_event = stop_event or threading.Event()
+    last_maintenance = None
+    processed = 0
+
+    while not stop_event.is_set():
+        if last_maintenance is None or time.monotonic() - last_maintenance >= JOB_MAINTENANCE_INTERVAL:
+            requeue_abandoned_jobs()
+            ensure_periodic_jobs()
+            last_maintenance = time.monotonic()
+
+        job = claim_next_job(worker_id)
+        if job is None:
+            db.session.remove()
+            if burst:
+                break
+            stop_event.wait(poll_interval)
+            continue
+
+        run_job(job)
+        processed += 1
+        db.session.remove()
+
+    return processed
+
+
+def start_worker_thread(app):
+    """Run a worker inside this process, for the single-process dev server"""
+    def run():
+        with app.app_context():
+            try:
+                work()
+            except Exception:
+                app.logger.exception('Job worker thread stopped')
+
+    thread = threading.Thread(target=run, name='job-worker', daemon=True)
+    thread.start()
+    return thread
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+@click.option('--poll-interval', default=JOB_POLL_INTERVAL, show_default=True,
+              help='Seconds to sleep when the queue is empty.')
+def work_command(burst, poll_interval):
+    """Process queued jobs. Stops after the current job on SIGTERM/SIGINT."""
+    stop_event = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop_event.set())
+    processed = work(burst=burst, poll_interval=poll_interval, stop_event=stop_event)
+    click.echo(f'Processed {processed} job(s).')
+
+
+@jobs_cli.command('list')
+@click.option('--status', type=click.Choice(['queued', 'running', 'done', 'failed']))
+@click.option('--name', help='Only jobs with this name.')
+@click.option('--limit', default=20, show_default=True)
+def list_command(status, name, limit):
+    """Show the most recent jobs."""
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    if name:
+        query = query.filter_by(name=name)
+    for job in query.order_by(Job.id.desc()).limit(limit):
+        click.echo(f'{job.id:>7}  {job.status:<8} {job.name:<24} attempts={job.attempts}/{job.max_attempts}  '
+                   f'run_at={job.run_at:%Y-%m-%d %H:%M:%S}  {job.payload}')
+        if job.last_error and job.status != 'done':
+            click.echo('         ' + job.last_error.strip().splitlines()[-1])
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """Count jobs by name and status."""
+    rows = db.session.query(Job.name, Job.status, db.func.count()).group_by(Job.name, Job.status).order_by(Job.name)
+    for name, status, count in rows:
+        click.echo(f'{name:<24} {status:<8} {count}')
+    oldest = db.session.query(db.func.min(Job.run_at)).filter(
+        Job.status == 'queued', Job.run_at <= datetime.utcnow()
+    ).scalar()
+    if oldest:
+        click.echo(f'Oldest due job has waited {(datetime.utcnow() - oldest).total_seconds():.0f}s')
+
+
+@jobs_cli.command('retry')
+@click.argument('job_ids', nargs=-1, type=int)
+@click.option('--all-failed', is_flag=True, help='Retry every failed job.')
+def retry_command(job_ids, all_failed):
+    """Queue failed jobs again with a fresh set of attempts."""
+    query = Job.query.filter_by(status='failed')
+    if not all_failed:
+        if not job_ids:
+            raise click.UsageError('Give job ids or --all-failed.')
+        query = query.filter(Job.id.in_(job_ids))
+    retried = query.update(
+        {'status': 'queued', 'attempts': 0, 'run_at': datetime.utcnow(), 'finished_at': None},
+        synchronize_session=False
+    )
+    db.session.commit()
+    click.echo(f'Requeued {retried} job(s).')
+
+
+@jobs_cli.command('enqueue')
+@click.argument('name', type=click.Choice(sorted(TASKS)))
+@click.option('--payload', default='{}', help='JSON object of keyword arguments.')
+@click.option('--delay', default=0, help='Seconds from now to run it.')
+def enqueue_command(name, payload, delay):
+    """Queue a job by hand."""
+    job = enqueue_job(name, run_at=datetime.utcnow() + timedelta(seconds=delay), **json.loads(payload))
+    db.session.commit()
+    click.echo(f'Queued job {job.id}.')
+
+
+@jobs_cli.command('purge')
+@click.option('--older-than-days', default=JOB_RETENTION_DAYS, show_default=True)
+def purge_command(older_than_days):
+    """Delete finished and failed jobs."""
+    click.echo(f'Deleted {purge_jobs(older_than_days)} job(s).')
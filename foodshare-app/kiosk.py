@@ -0,0 +1,169 @@
+"""
+Kiosk mode served from pre-rendered snapshots
+
+Kiosk screens at garden sites open /guest, which turns on kiosk mode for that
+browser (a cookie). From then on the public pages (home, garden directory,
+community board, guest profile) are answered from HTML files rendered ahead
+of time into KIOSK_SNAPSHOT_DIR. Serving them never touches the database, so
+kiosks keep working while the database is busy or unavailable.
+
+Snapshots are refreshed in a background thread when a kiosk asks for a page
+and either
+  * they are older than KIOSK_SNAPSHOT_MAX_AGE seconds, or
+  * something shown on them was written (mark_kiosk_snapshot_stale in app.py)
+    and the last render is at least KIOSK_SNAPSHOT_MIN_AGE seconds old.
+The request that triggers a refresh is still served the previous snapshot.
+
+    flask --app app kiosk-snapshot      # render now, e.g. from cron or at deploy
+
+Visit /guest/exit to leave kiosk mode.
+"""
+import os
+import threading
+import time
+
+import click
+from flask import Blueprint, after_this_request, current_app, g, redirect, request, url_for
+from flask.cli import with_appcontext
+
+from app import (KIOSK_STALE_MARKER, community, garden, get_or_create_guest_user,
+                 index, profile)
+
+KIOSK_COOKIE = 'kiosk'
+KIOSK_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+# URL path -> snapshot file
+SNAPSHOT_PAGES = {
+    '/': 'index.html',
+    '/garden': 'garden.html',
+    '/community': 'community.html',
+    '/guest': 'guest.html',
+}
+
+# Its mtime is the time the snapshot currently on disk started rendering
+RENDERED_MARKER = '.rendered'
+
+kiosk = Blueprint('kiosk', __name__)
+
+_refresh_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def render_snapshot_pages():
+    """Render every kiosk page with the live views, returning {file name: html}"""
+    # Rendered as seen by a kiosk, so the navbar offers "Exit Kiosk"
+    headers = {'Cookie': f'{KIOSK_COOKIE}=1'}
+    pages = {}
+    for path, view in (('/', index), ('/garden', garden), ('/community', community)):
+        with current_app.test_request_context(path, headers=headers):
+            pages[SNAPSHOT_PAGES[path]] = view()
+    with current_app.test_request_context('/guest', headers=headers):
+        pages[SNAPSHOT_PAGES['/guest']] = profile(get_or_create_guest_user().id)
+    return pages
+
+
+def refresh_snapshot():
+    """Re-render the snapshot and swap each page in atomically"""
+    directory = current_app.config['KIOSK_SNAPSHOT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    started = time.time()
+
+    for name, html in render_snapshot_pages().items():
+        path = os.path.join(directory, name)
+        with open(path + '.part', 'w', encoding='utf-8') as out:
+            out.write(html)
+        os.replace(path + '.part', path)
+
+    # Stamped with the start time: writes that landed while rendering leave
+    # the stale marker newer than this, so they trigger another refresh
+    rendered = os.path.join(directory, RENDERED_MARKER)
+    open(rendered, 'a').close()
+    os.utime(rendered, (started, started))
+
+
+def snapshot_needs_refresh(config, now=None):
+    now = now or time.time()
+    directory = config['KIOSK_SNAPSHOT_DIR']
+    rendered_at = _mtime(os.path.join(directory, RENDERED_MARKER))
+    if rendered_at is None:
+        return True
+    age = now - rendered_at
+    if age >= config['KIOSK_SNAPSHOT_MAX_AGE']:
+        return True
+    stale_at = _mtime(os.path.join(directory, KIOSK_STALE_MARKER))
+    return stale_at is not None and stale_at > rendered_at and age >= config['KIOSK_SNAPSHOT_MIN_AGE']
+
+
+def schedule_refresh(app):
+    """Refresh in a background thread unless one is already running here"""
+    if not snapshot_needs_refresh(app.config):
+        return
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            with app.app_context():
+                refresh_snapshot()
+        except Exception:
+            # Database down or similar: keep serving the previous snapshot
+            app.logger.exception('Kiosk snapshot refresh failed')
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name='kiosk-snapshot', daemon=True).start()
+
+
+def _enable_kiosk_cookie(response):
+    response.set_cookie(KIOSK_COOKIE, '1', max_age=KIOSK_COOKIE_MAX_AGE, samesite='Lax')
+    return response
+
+
+def serve_snapshot():
+    """before_request hook: answer kiosk page views from disk"""
+    if request.method != 'GET' or request.args:
+        return None
+    name = SNAPSHOT_PAGES.get(request.path)
+    if name is None:
+        return None
+    if request.path == '/guest':
+        after_this_request(_enable_kiosk_cookie)
+    elif request.cookies.get(KIOSK_COOKIE) != '1':
+        return None
+    g.kiosk = True  # shared screen: not anyone's activity
+
+    app = current_app._get_current_object()
+    schedule_refresh(app)
+    try:
+        with open(os.path.join(app.config['KIOSK_SNAPSHOT_DIR'], name), 'rb') as src:
+            body = src.read()
+    except FileNotFoundError:
+        return None  # not rendered yet: fall through to the live page
+    return app.response_class(body, mimetype='text/html')
+
+
+@kiosk.route('/guest/exit')
+def exit_kiosk():
+    response = redirect(url_for('main.index'))
+    response.delete_cookie(KIOSK_COOKIE)
+    return response
+
+
+@click.command('kiosk-snapshot')
+@with_appcontext
+def kiosk_snapshot_command():
+    """Render the kiosk page snapshot now."""
+    refresh_snapshot()
+    click.echo(f"Wrote kiosk snapshot to {current_app.config['KIOSK_SNAPSHOT_DIR']}")
+
+
+def init_kiosk(app):
+    app.register_blueprint(kiosk)
+    app.before_request(serve_snapshot)
+    app.cli.add_command(kiosk_snapshot_command)
@@ -8,9 +8,10 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, Reply
+from app import create_app, db, Reply
 
 def migrate():
+    app = create_app()
     with app.app_context():
         print("Creating Reply table...")
         try:
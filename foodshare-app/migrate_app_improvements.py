@@ -4,16 +4,27 @@ Database migration script to add new features:
 1. Add plot attributes to GardenPlot (water_available, tools_available, soil_type, sunlight_level, notes)
 2. Add status field to Post (active/resolved)
 3. Add garden_follower table for garden following functionality
+4. Add garden_id to Post (posts about a garden show up in its followers' feeds)
+5. Add streak_day to User (last day counted towards the activity streak)
+6. Add password_hash to User (logins)
+7. Add partial indexes for active posts and post feed entries
+8. Add plot_states to Garden (packed plot layouts; convert with `flask pack-gardens`)
+9. Add plant_key to FavoritePlant (matching new posts to favorites) and fill it in
 """
 
 import sqlite3
 import os
 
+from app import normalize_plant_name
+
 # Get the database path
 db_path = os.path.join(os.path.dirname(__file__), 'database', 'foodshare.db')
 
 def migrate():
     """Add new columns to existing tables and create new tables"""
+    if not os.path.exists(db_path):
+        print("No database yet; `flask init-db` creates it with every column.")
+        return
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
@@ -56,6 +67,52 @@ def migrate():
             # Update existing posts to have 'active' status
             cursor.execute("UPDATE post SET status = 'active' WHERE status IS NULL")
         
+        # Add garden_id column to Post table if it doesn't exist
+        if 'garden_id' not in post_columns:
+            print("Adding garden_id column to post...")
+            cursor.execute("ALTER TABLE post ADD COLUMN garden_id INTEGER REFERENCES garden (id)")
+        
+        # Add streak_day column to User table if it doesn't exist
+        cursor.execute("PRAGMA table_info(user)")
+        user_columns = [col[1] for col in cursor.fetchall()]
+        if 'streak_day' not in user_columns:
+            print("Adding streak_day column to user...")
+            cursor.execute("ALTER TABLE user ADD COLUMN streak_day DATE")
+        
+        if 'password_hash' not in user_columns:
+            print("Adding password_hash column to user...")
+            cursor.execute("ALTER TABLE user ADD COLUMN password_hash VARCHAR(255)")
+        
+        # Add plot_states column to Garden table if it doesn't exist
+        cursor.execute("PRAGMA table_info(garden)")
+        garden_table_columns = [col[1] for col in cursor.fetchall()]
+        if 'plot_states' not in garden_table_columns:
+            print("Adding plot_states column to garden...")
+            cursor.execute("ALTER TABLE garden ADD COLUMN plot_states TEXT")
+        
+        # Add plant_key column to FavoritePlant table and fill it in for existing favorites
+        cursor.execute("PRAGMA table_info(favorite_plant)")
+        favorite_columns = [col[1] for col in cursor.fetchall()]
+        if favorite_columns and 'plant_key' not in favorite_columns:
+            print("Adding plant_key column to favorite_plant...")
+            cursor.execute("ALTER TABLE favorite_plant ADD COLUMN plant_key VARCHAR(120)")
+            cursor.execute("SELECT id, name FROM favorite_plant")
+            cursor.executemany(
+                "UPDATE favorite_plant SET plant_key = ? WHERE id = ?",
+                [(normalize_plant_name(name), favorite_id) for favorite_id, name in cursor.fetchall()]
+            )
+        
+        # Partial indexes: the live community board only reads active posts
+        print("Creating partial indexes...")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_post_active_timestamp ON post (timestamp, id) WHERE status = 'active'"
+        )
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='feed_entry'")
+        if cursor.fetchone():
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS ix_feed_entry_post_id ON feed_entry (post_id) WHERE post_id IS NOT NULL"
+            )
+        
         # Check if garden_follower table exists
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='garden_follower'")
         if not cursor.fetchone():
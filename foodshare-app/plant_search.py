@@ -0,0 +1,105 @@
+"""
+Plant name autocomplete
+
+/api/plants/autocomplete answers from a prefix trie of every catalog name
+(PlantAlias rows: each plant's own name and its synonyms) held in memory, so
+typing in the plant field never hits the database. The trie is small (a few
+thousand names) and is built once per process: wsgi.py loads it before
+gunicorn forks so workers share it, and the first request to find it older
+than PLANT_TRIE_MAX_AGE rebuilds it, which picks up plants added by new
+gardens.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import Plant, PlantAlias, db
+
+PLANT_TRIE_MAX_AGE = 300  # seconds
+
+END = ''  # child key holding the entries for names that end at a node
+
+
+class PlantTrie:
+    """Prefix tree of lowercased names -> (plant id, plant name, name matched)"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, text, entry):
+        node = self.root
+        for char in text.lower():
+            node = node.setdefault(char, {})
+        node.setdefault(END, []).append(entry)
+
+    def complete(self, prefix, limit):
+        """Up to limit plants with a name starting with prefix, shortest names first"""
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        results, seen = [], set()
+        level = [node]
+        while level and len(results) < limit:
+            next_level = []
+            for node in level:
+                for entry in node.get(END, ()):
+                    if entry[0] not in seen:
+                        seen.add(entry[0])
+                        results.append(entry)
+                next_level.extend(child for char, child in sorted(node.items()) if char != END)
+            level = next_level
+        return results[:limit]
+
+
+class PlantNameIndex:
+    """The catalog trie, rebuilt from the database when stale"""
+
+    def __init__(self, max_age=PLANT_TRIE_MAX_AGE):
+        self.max_age = max_age
+        self.trie = PlantTrie()
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        trie = PlantTrie()
+        rows = db.session.query(PlantAlias.key, PlantAlias.name, Plant.id, Plant.name).join(
+            Plant, Plant.id == PlantAlias.plant_id
+        ).order_by(Plant.name)
+        for key, written, plant_id, plant_name in rows:
+            entry = (plant_id, plant_name, written)
+            trie.insert(key, entry)
+            if written.lower() != key:  # 'Tomatoes' is found by 'tomatoe' as well as 'tomato'
+                trie.insert(written, entry)
+        self.trie, self.loaded_at = trie, time.monotonic()
+
+    def complete(self, prefix, limit):
+        prefix = ' '.join(prefix.split())
+        if not prefix:
+            return []
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+            # One request reloads; the others keep answering from the old trie
+            if self._lock.acquire(blocking=self.loaded_at is None):
+                try:
+                    self.load()
+                finally:
+                    self._lock.release()
+        return [
+            {'id': plant_id, 'name': name, 'matched': matched}
+            for plant_id, name, matched in self.trie.complete(prefix, limit)
+        ]
+
+
+def warm_plant_names(app):
+    """Load the trie now (before workers fork) rather than on the first request"""
+    with app.app_context():
+        try:
+            app.extensions['plant_names'].load()
+        except SQLAlchemyError:
+            app.logger.warning('Plant catalog not loaded; it will be on first use', exc_info=True)
+
+
+def init_plant_search(app):
+    app.extensions['plant_names'] = PlantNameIndex()
@@ -0,0 +1,369 @@
+"""
+On-demand request profiling
+
+A request is profiled when it carries a valid X-Profile token, or at random
+for a PROFILE_SAMPLE_RATE fraction of requests. Admins (ADMIN_USERNAMES)
+get a token from /admin/profiles; it is signed with SECRET_KEY and expires
+after PROFILE_TOKEN_MAX_AGE seconds:
+
+    curl -H "X-Profile: <token>" https://.../community
+
+While a profiled request runs, a sampler thread records the request
+thread's Python stack every SAMPLE_INTERVAL seconds. Each sample is filed
+under [python], [sql] or [template] according to what the request was doing
+(SQLAlchemy cursor events and Flask's template signals tell), and the same
+hooks time SQL and Jinja rendering exactly. The profile is written after the
+response has been sent (streamed bodies included) as a speedscope file
+(https://www.speedscope.app) with a small .meta.json beside it, in
+PROFILE_DIR; only the newest PROFILE_MAX_FILES are kept. /admin/profiles
+lists them and downloads either format: speedscope JSON, or collapsed
+stacks for flamegraph.pl.
+
+Requests that are not profiled pay a few microseconds for the hooks, and
+so does each SQL query (a thread-local read in the cursor listeners):
+
+    python benchmarks/bench_profiling.py
+"""
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from flask import (Blueprint, abort, before_render_template, current_app, render_template, request,
+                   send_from_directory, template_rendered)
+from itsdangerous import BadSignature, TimestampSigner
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import BATCH_SUBREQUEST_KEY, current_user, login_required
+
+PROFILE_HEADER = 'X-Profile'
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+MAX_PROFILE_SECONDS = 30  # a longer request keeps only its first 30 s of samples
+SPEEDSCOPE_SUFFIX = '.speedscope.json'
+META_SUFFIX = '.meta.json'
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+profiling = Blueprint('profiling', __name__)
+
+# The profile of the request running on this thread, if any
+_active = threading.local()
+_sequence = itertools.count(1)
+
+
+def _source_file(path):
+    if path.startswith(APP_DIR + os.sep):
+        return os.path.relpath(path, APP_DIR)
+    return '/'.join(path.split(os.sep)[-2:])  # e.g. orm/session.py
+
+
+class RequestProfile:
+    """Stack samples and SQL/template timings for one request"""
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.thread_id = threading.get_ident()
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.end = None
+        self.phase = 'python'
+        self.sql_seconds = self.sql_in_template = self.template_seconds = 0.0
+        self.queries = 0
+        self._sql_start = self._template_start = None
+        self.frames = {}  # (name, file, line) -> index
+        self.samples = []  # [stack of frame indexes, seconds]; consecutive repeats are merged
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='request-profiler', daemon=True)
+        self._sampler.start()
+
+    def _frame(self, key):
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _sample(self):
+        last = self.start
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            now = time.perf_counter()
+            if now - self.start > MAX_PROFILE_SECONDS:
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(self._frame((code.co_name, _source_file(code.co_filename), code.co_firstlineno)))
+                frame = frame.f_back
+            stack.append(self._frame((f'[{self.phase}]', None, None)))
+            stack.reverse()
+            if self.samples and self.samples[-1][0] == stack:
+                self.samples[-1][1] += now - last
+            else:
+                self.samples.append([stack, now - last])
+            last = now
+
+    def stop(self):
+        self.end = time.perf_counter()
+        self._stopped.set()
+        self._sampler.join()
+
+    # Called on the request's thread by the SQLAlchemy and template hooks
+
+    def sql_started(self):
+        self._sql_start = time.perf_counter()
+        self.phase = 'sql'
+
+    def sql_finished(self):
+        if self._sql_start is None:
+            return
+        elapsed = time.perf_counter() - self._sql_start
+        self.sql_seconds += elapsed
+        if self._template_start is not None:
+            self.sql_in_template += elapsed  # lazy loads while rendering
+        self.queries += 1
+        self._sql_start = None
+        self.phase = 'python' if self._template_start is None else 'template'
+
+    def template_started(self):
+        self._template_start = time.perf_counter()
+        self.phase = 'template'
+
+    def template_finished(self):
+        if self._template_start is None:
+            return
+        self.template_seconds += time.perf_counter() - self._template_start
+        self._template_start = None
+        self.phase = 'python'
+
+    def meta(self, request_line, status):
+        total = self.end - self.start
+        template_only = self.template_seconds - self.sql_in_template
+        return {
+            'request': request_line,
+            'status': status,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'trigger': self.trigger,
+            'total_ms': round(total * 1e3, 1),
+            'python_ms': round(max(0.0, total - self.sql_seconds - template_only) * 1e3, 1),
+            'sql_ms': round(self.sql_seconds * 1e3, 1),
+            'queries': self.queries,
+            'template_ms': round(template_only * 1e3, 1),
+        }
+
+    def speedscope(self, meta):
+        name = f"{meta['request']} ({meta['total_ms']} ms)"
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'foodshare',
+            'activeProfileIndex': 0,
+            'shared': {'frames': [
+                {'name': frame_name} if file is None else {'name': frame_name, 'file': file, 'line': line}
+                for frame_name, file, line in self.frames
+            ]},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': meta['total_ms'],
+                'samples': [stack for stack, _ in self.samples],
+                'weights': [round(seconds * 1e3, 3) for _, seconds in self.samples],
+            }],
+        }
+
+
+def collapsed_stacks(speedscope):
+    """Collapsed stacks ('root;...;leaf <microseconds>' per line) from a speedscope file"""
+    names = [
+        f"{frame['name']} ({frame['file']}:{frame['line']})" if 'file' in frame else frame['name']
+        for frame in speedscope['shared']['frames']
+    ]
+    totals = {}
+    profile = speedscope['profiles'][0]
+    for stack, weight in zip(profile['samples'], profile['weights']):
+        key = ';'.join(names[index] for index in stack)
+        totals[key] = totals.get(key, 0) + weight
+    return ''.join(f'{stack} {round(weight * 1e3)}\n' for stack, weight in totals.items())
+
+
+# ---------- Storage: a ring buffer of files ----------
+
+def write_profile(config, profile, meta):
+    """Save a profile as <stamp>.speedscope.json + <stamp>.meta.json and drop the oldest beyond the limit"""
+    directory = config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    # Sorts by time; pid and sequence keep concurrent workers apart
+    stem = f"{profile.started_at:%Y%m%dT%H%M%S%f}-{os.getpid()}-{next(_sequence)}"
+    meta['id'] = stem
+    for suffix, document in ((SPEEDSCOPE_SUFFIX, profile.speedscope(meta)), (META_SUFFIX, meta)):
+        path = os.path.join(directory, stem + suffix)
+        with open(path + '.part', 'w', encoding='utf-8') as out:
+            json.dump(document, out, separators=(',', ':'))
+        os.replace(path + '.part', path)
+
+    for old in list_profile_ids(directory)[config['PROFILE_MAX_FILES']:]:
+        for suffix in (META_SUFFIX, SPEEDSCOPE_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, old + suffix))
+            except FileNotFoundError:  # another worker pruned it first
+                pass
+    return stem
+
+
+def list_profile_ids(directory):
+    """Saved profiles, newest first"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-len(META_SUFFIX)] for name in names if name.endswith(META_SUFFIX)), reverse=True)
+
+
+def load_profile_meta(directory, profile_id):
+    try:
+        with open(os.path.join(directory, profile_id + META_SUFFIX), encoding='utf-8') as src:
+            return json.load(src)
+    except (FileNotFoundError, ValueError):  # pruned or still being written
+        return None
+
+
+# ---------- Hooks ----------
+
+def profile_signer():
+    return TimestampSigner(current_app.secret_key, salt='request-profile')
+
+
+def profile_trigger():
+    """Why this request is profiled ('token:<admin>' or 'sampled'), or None"""
+    token = request.headers.get(PROFILE_HEADER)
+    if token is not None:
+        try:
+            admin = profile_signer().unsign(token, max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'])
+        except BadSignature:
+            return None
+        return f'token:{admin.decode()}'
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate and not request.path.startswith('/static/'):
+        return 'sampled'
+    return None
+
+
+def start_profile():
+    """before_request hook, registered ahead of the others so their time is included"""
+    if BATCH_SUBREQUEST_KEY in request.environ:
+        return  # part of the /api/batch request's profile
+    _active.profile = None
+    trigger = profile_trigger()
+    if trigger is not None:
+        _active.profile = RequestProfile(trigger)
+
+
+def finish_profile(response):
+    """after_request hook: write the profile once the response has been sent"""
+    profile = getattr(_active, 'profile', None)
+    if profile is None or BATCH_SUBREQUEST_KEY in request.environ:
+        return response
+    app = current_app._get_current_object()
+    request_line = f"{request.method} {request.full_path.rstrip('?')}"
+
+    def save():
+        _active.profile = None
+        profile.stop()
+        try:
+            write_profile(app.config, profile, profile.meta(request_line, response.status_code))
+        except OSError:
+            app.logger.exception('Could not save request profile')
+
+    response.call_on_close(save)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        profile.sql_started()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        profile.sql_finished()
+
+
+def _cursor_error(exception_context):
+    _after_cursor_execute(None, None, None, None, None, None)
+
+
+def _before_render(sender, template, context, **extra):
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        profile.template_started()
+
+
+def _after_render(sender, template, context, **extra):
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        profile.template_finished()
+
+
+# ---------- Admin pages ----------
+
+def admin_required(view):
+    """Signed in as one of ADMIN_USERNAMES; anyone else gets a 404"""
+    @functools.wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if current_user().username not in current_app.config['ADMIN_USERNAMES']:
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@profiling.route('/admin/profiles', methods=['GET', 'POST'])
+@admin_required
+def list_profiles():
+    directory = current_app.config['PROFILE_DIR']
+    profiles = [meta for meta in (load_profile_meta(directory, profile_id)
+                                  for profile_id in list_profile_ids(directory)) if meta]
+    token = profile_signer().sign(current_user().username).decode() if request.method == 'POST' else None
+    return render_template('admin_profiles.html', profiles=profiles, token=token,
+                           header=PROFILE_HEADER, token_minutes=current_app.config['PROFILE_TOKEN_MAX_AGE'] // 60,
+                           sample_rate=current_app.config['PROFILE_SAMPLE_RATE'])
+
+
+@profiling.route('/admin/profiles/<profile_id>.<fmt>')
+@admin_required
+def download_profile(profile_id, fmt):
+    directory = current_app.config['PROFILE_DIR']
+    if profile_id not in list_profile_ids(directory):
+        abort(404)
+    if fmt == 'speedscope':
+        return send_from_directory(directory, profile_id + SPEEDSCOPE_SUFFIX, as_attachment=True,
+                                   mimetype='application/json')
+    if fmt == 'collapsed':
+        with open(os.path.join(directory, profile_id + SPEEDSCOPE_SUFFIX), encoding='utf-8') as src:
+            body = collapsed_stacks(json.load(src))
+        return current_app.response_class(body, mimetype='text/plain', headers={
+            'Content-Disposition': f'attachment; filename={profile_id}.collapsed.txt'
+        })
+    abort(404)
+
+
+def init_profiling(app):
+    app.register_blueprint(profiling)
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    # Process-wide hooks, shared by every app instance
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _cursor_error)
+        before_render_template.connect(_before_render)
+        template_rendered.connect(_after_render)
@@ -0,0 +1,173 @@
+"""
+Token-bucket rate limiting for write endpoints
+
+Every POST/PUT/PATCH/DELETE to the app is charged one token from two
+buckets: one for the signed-in user and one for the client IP (anonymous
+requests only have the IP bucket). Budgets are set per endpoint in
+RATE_LIMITS (DEFAULT_RATE_LIMIT for the rest). IP buckets are
+IP_BUDGET_MULTIPLIER times larger because a community center puts many
+people behind one address. A request that finds either bucket empty gets
+429 with a Retry-After header and is charged nothing, so one user being
+turned away doesn't use up the budget of everyone behind their IP.
+
+Buckets live in a small memory-mapped file (RATELIMIT_FILE, on /dev/shm
+when available) so every gunicorn worker on the host shares them without
+touching the database. The file is a fixed-size open-addressing hash table
+of (key hash, tokens, last update) slots, and each check holds an flock on
+it for a few microseconds. When the slots a key can probe are all taken,
+the one idle longest is reused; an idle bucket is a full bucket, so this
+only ever errs on the side of allowing a request.
+
+    python benchmarks/bench_ratelimit.py    # per-request overhead
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app, jsonify, request
+
+from app import current_user_id
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock, fine for the dev server
+    fcntl = None
+
+RateLimit = namedtuple('RateLimit', 'burst per_minute')
+
+# Endpoint -> budget for one user
+RATE_LIMITS = {
+    'main.api_posts': RateLimit(burst=5, per_minute=10),
+    'main.like_post': RateLimit(burst=20, per_minute=60),
+    'main.post_replies': RateLimit(burst=10, per_minute=30),
+    'main.claim_plot': RateLimit(burst=10, per_minute=30),
+    'main.release_plot': RateLimit(burst=10, per_minute=30),
+    'main.api_gardens': RateLimit(burst=3, per_minute=5),
+}
+DEFAULT_RATE_LIMIT = RateLimit(burst=30, per_minute=120)
+IP_BUDGET_MULTIPLIER = 10
+LIMITED_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+SLOT = struct.Struct('<Qdd')  # key hash (0 = empty), tokens, updated
+TABLE_SLOTS = 1 << 16  # 1.5 MB
+MAX_PROBES = 8
+
+
+def key_hash(key):
+    # Never 0, which marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+
+
+class RateLimiter:
+    """Token buckets in a memory-mapped file shared by every worker process"""
+
+    def __init__(self, path, slots=TABLE_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        # Reopened after a fork: flock only excludes other open file
+        # descriptions, and a forked worker would share its parent's
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        size = self.slots * SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd, self._map, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+
+    def _find_slot(self, table, wanted):
+        """Offset of key hash wanted's slot (or the one to use for it), and its (tokens, updated) if present"""
+        start = wanted % self.slots
+        oldest = None
+        for probe in range(MAX_PROBES):
+            offset = ((start + probe) % self.slots) * SLOT.size
+            slot_key, tokens, updated = SLOT.unpack_from(table, offset)
+            if slot_key == wanted:
+                return offset, (tokens, updated)
+            if slot_key == 0:
+                return offset, None
+            if oldest is None or updated < oldest[1]:
+                oldest = (offset, updated)
+        return oldest[0], None
+
+    def take(self, buckets, now=None):
+        """Spend a token from each of buckets, [(key, limit, multiplier)], only if all of them have one.
+
+        Returns 0 if the request is allowed, otherwise the seconds to wait
+        for the emptiest bucket; a denied request spends nothing.
+        """
+        now = now or time.time()
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            table = self._map
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                refilled = []
+                for key, limit, multiplier in buckets:
+                    capacity = limit.burst * multiplier
+                    rate = limit.per_minute * multiplier / 60.0
+                    wanted = key_hash(key)
+                    offset, state = self._find_slot(table, wanted)
+                    if state is None:
+                        tokens = float(capacity)  # new (or reused) bucket starts full
+                    else:
+                        tokens = min(capacity, state[0] + (now - state[1]) * rate)
+                    refilled.append((offset, wanted, tokens, rate))
+
+                wait = max(((1 - tokens) / rate for _, _, tokens, rate in refilled if tokens < 1), default=0)
+                for offset, wanted, tokens, _ in refilled:
+                    SLOT.pack_into(table, offset, wanted, tokens if wait else tokens - 1, now)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        return wait
+
+
+def client_ip():
+    # Behind a proxy this is only correct with PROXY_COUNT set (see create_app)
+    return request.remote_addr or 'unknown'
+
+
+def check_rate_limit():
+    """before_request hook: 429 once the user or their IP is out of tokens"""
+    if request.method not in LIMITED_METHODS or request.endpoint is None:
+        return None
+    limiter = current_app.extensions['rate_limiter']
+    endpoint = request.endpoint
+    limit = RATE_LIMITS.get(endpoint, DEFAULT_RATE_LIMIT)
+    user_id = current_user_id()
+    buckets = [(f'{endpoint}:ip:{client_ip()}', limit, IP_BUDGET_MULTIPLIER)]
+    if user_id is not None:
+        buckets.append((f'{endpoint}:user:{user_id}', limit, 1))
+    try:
+        wait = limiter.take(buckets)
+    except OSError:
+        current_app.logger.exception('Rate limiter unavailable; allowing request')
+        return None
+    if not wait:
+        return None
+
+    retry_after = max(1, math.ceil(wait))
+    response = jsonify({'error': 'Too many requests, please slow down.', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_rate_limiting(app):
+    app.extensions['rate_limiter'] = RateLimiter(app.config['RATELIMIT_FILE'])
+    if app.config['RATELIMIT_ENABLED']:
+        app.before_request(check_rate_limit)
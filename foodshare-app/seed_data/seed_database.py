@@ -5,22 +5,43 @@ This creates realistic users, gardens, posts, and community interactions.
 """
 import sys
 import os
+import argparse
+import bisect
+import itertools
 from datetime import datetime, timedelta
 import random
 
 # Add parent directory to path to import app modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app, db, User, Post, Reply, Garden, GardenPlot, GardenFollower
+from app import (create_app, db, User, Post, Reply, Garden, GardenPlot, GardenFollower,
+                 GardenOccupancy, FeedEntry, WaitlistEntry, Job, ChangeLog,
+                 FavoritePlant, SurplusMatch, MatchDigest, GardenPlant, PlantAlias, Plant,
+                 PLOT_SOIL_TYPES, PLOT_SUNLIGHT_LEVELS, rebuild_occupancy, index_all_garden_plants)
+from bulk_io import reset_id_sequence
+
+app = create_app()
 
 def clear_database():
     """Clear all existing data from the database"""
     print("🗑️  Clearing existing database data...")
     with app.app_context():
+        db.create_all()
+        ChangeLog.query.delete()
+        SurplusMatch.query.delete()
+        MatchDigest.query.delete()
+        FavoritePlant.query.delete()
+        Job.query.delete()
+        FeedEntry.query.delete()
+        WaitlistEntry.query.delete()
+        GardenOccupancy.query.delete()
         GardenFollower.query.delete()
         Reply.query.delete()
         Post.query.delete()
         GardenPlot.query.delete()
+        GardenPlant.query.delete()
+        PlantAlias.query.delete()
+        Plant.query.delete()
         Garden.query.delete()
         User.query.delete()
         db.session.commit()
@@ -83,6 +104,8 @@ def create_users():
             users.append(user)
         
         db.session.commit()
+        for user in users:
+            db.session.refresh(user)  # loaded now; the caller uses it after the session closes
         print(f"✅ Created {len(users)} users")
     
     return users
@@ -154,6 +177,9 @@ def create_gardens(users):
             gardens.append(garden)
         
         db.session.commit()
+        index_all_garden_plants()
+        for garden in gardens:
+            db.session.refresh(garden)  # loaded now; the caller uses it after the session closes
         print(f"✅ Created {len(gardens)} gardens")
     
     return gardens
@@ -197,8 +223,8 @@ def create_garden_plots(gardens, users):
                     claimed_at=datetime.utcnow() - timedelta(days=random.randint(1, 60)) if user_id else None,
                     water_available=random.choice([True, False]),
                     tools_available=random.choice([True, False]),
-                    soil_type=random.choice(['loam', 'clay', 'sandy', 'silt']),
-                    sunlight_level=random.choice(['full sun', 'partial shade', 'full shade']),
+                    soil_type=random.choice(PLOT_SOIL_TYPES),
+                    sunlight_level=random.choice(PLOT_SUNLIGHT_LEVELS),
                     notes='Great spot for tomatoes!' if random.random() < 0.2 else None
                 )
                 db.session.add(plot)
@@ -290,6 +316,8 @@ def create_posts(users):
             posts.append(post)
         
         db.session.commit()
+        for post in posts:
+            db.session.refresh(post)  # loaded now; the caller uses it after the session closes
         print(f"✅ Created {len(posts)} posts")
     
     return posts
@@ -357,19 +385,249 @@ def create_garden_followers(gardens, users):
         db.session.commit()
         print(f"✅ Created {follower_count} garden followers")
 
+
+# =========================
+#    SYNTHETIC GENERATOR
+# =========================
+#
+# Generator mode builds arbitrarily large datasets for benchmarking and
+# capacity planning. All randomness comes from one seeded Random instance and
+# timestamps are relative to a fixed date, so the same arguments always
+# produce the same database. Rows get explicit ids and are written with one
+# executemany per batch instead of one ORM object at a time.
+
+GENERATOR_EPOCH = datetime(2025, 1, 1)
+GENERATOR_BATCH_SIZE = 10000
+
+PLANT_NAMES = ['Tomatoes', 'Lettuce', 'Herbs', 'Zucchini', 'Peppers', 'Okra',
+               'Beans', 'Squash', 'Kale', 'Carrots', 'Pumpkins', 'Strawberries']
+
+REPLY_TEXTS = [
+    "Thanks for sharing! I'll stop by later today.",
+    "Do you still have some available?",
+    "I'd love to take some. When is the best time?",
+    "Would you be willing to trade for some of my carrots?",
+    "Let me know if you need any help!",
+]
+
+
+def parse_grid_sizes(spec):
+    """Parse '5x5:0.6,10x10:0.3,50x50:0.1' into ([(rows, cols), ...], [weight, ...])"""
+    sizes, weights = [], []
+    for part in spec.split(','):
+        size, _, weight = part.partition(':')
+        rows, cols = size.lower().split('x')
+        sizes.append((int(rows), int(cols)))
+        weights.append(float(weight or 1))
+    return sizes, weights
+
+
+class ZipfSampler:
+    """Draw ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.weights = [1.0 / (k ** s) for k in range(1, n + 1)]
+        self.cum_weights = list(itertools.accumulate(self.weights))
+        self.total = self.cum_weights[-1] if self.cum_weights else 0.0
+
+    def sample(self):
+        return bisect.bisect_left(self.cum_weights, self.rng.random() * self.total)
+
+    def share(self, rank, amount):
+        """Deterministic share of `amount` that falls on `rank`"""
+        return int(amount * self.weights[rank] / self.total)
+
+
+def bulk_insert(model, rows):
+    """Insert an iterable of dicts (with explicit ids) in batched executemany transactions"""
+    table = model.__table__
+    count = 0
+    for batch in iter(lambda: list(itertools.islice(rows, GENERATOR_BATCH_SIZE)), []):
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        count += len(batch)
+    reset_id_sequence(table)
+    print(f"✅ {table.name}: {count} rows")
+    return count
+
+
+def generate_database(args):
+    """Fill the database with a deterministic synthetic dataset"""
+    rng = random.Random(args.seed)
+    sizes, size_weights = parse_grid_sizes(args.grid_sizes)
+    n_users, n_gardens = args.users, args.gardens
+    n_posts = n_users * args.posts_per_user
+
+    def user_id():
+        return rng.randint(1, n_users)
+
+    def ago(max_days):
+        return GENERATOR_EPOCH - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"\n👥 Generating {n_users} users...")
+        bulk_insert(User, ({
+            'id': i,
+            'username': f'user{i:08d}',
+            'email': f'user{i:08d}@example.com',
+            'bio': 'Synthetic benchmark user',
+            'location': f'Zone {rng.randint(3, 9)}',
+            'role': 'Garden Volunteer',
+            'is_guest': False,
+            'created_at': ago(365),
+            'last_active': ago(30),
+        } for i in range(1, n_users + 1)))
+
+        print(f"\n🌱 Generating {n_gardens} gardens...")
+        garden_sizes = rng.choices(sizes, weights=size_weights, k=n_gardens)
+        bulk_insert(Garden, ({
+            'id': i,
+            'name': f'Garden {i:08d}',
+            'description': 'Synthetic benchmark garden',
+            'location': f'Site {rng.randint(1, max(1, n_gardens // 10))}',
+            'plants': ', '.join(rng.sample(PLANT_NAMES, 3)),
+            'user_id': user_id(),
+            'rows': rows,
+            'cols': cols,
+            'timestamp': ago(365),
+        } for i, (rows, cols) in enumerate(garden_sizes, start=1)))
+        print(f"✅ Indexed plants for {index_all_garden_plants()} gardens")
+
+        print("\n📍 Generating garden plots...")
+
+        def plots():
+            plot_id = itertools.count(1)
+            for garden_id, (rows, cols) in enumerate(garden_sizes, start=1):
+                total = rows * cols
+                corners = {0, cols - 1, total - cols, total - 1}
+                for i in range(total):
+                    owner, claimed_at = None, None
+                    if i in corners:
+                        status = 'null'
+                    elif rng.random() < 0.04:
+                        status = rng.choice(['water', 'tools'])
+                    elif rng.random() < args.claim_ratio:
+                        status, owner, claimed_at = 'taken', user_id(), ago(90)
+                    else:
+                        status = 'available'
+                    yield {
+                        'id': next(plot_id),
+                        'garden_id': garden_id,
+                        'plot_index': i,
+                        'status': status,
+                        'user_id': owner,
+                        'claimed_at': claimed_at,
+                        'water_available': rng.random() < 0.4,
+                        'tools_available': rng.random() < 0.3,
+                        'soil_type': rng.choice(PLOT_SOIL_TYPES),
+                        'sunlight_level': rng.choice(PLOT_SUNLIGHT_LEVELS),
+                    }
+        bulk_insert(GardenPlot, plots())
+
+        # Post popularity follows a Zipf law: a few posts collect most of the
+        # likes and replies, the long tail gets almost none
+        popularity = ZipfSampler(n_posts, args.zipf_s, rng)
+        rank_of_post = list(range(n_posts))
+        rng.shuffle(rank_of_post)
+        post_times = [ago(365) for _ in range(n_posts)]
+
+        print(f"\n📝 Generating {n_posts} posts...")
+        bulk_insert(Post, ({
+            'id': post_id,
+            'title': f'Surplus {PLANT_NAMES[post_id % len(PLANT_NAMES)].lower()} #{post_id}',
+            'content': 'Synthetic benchmark post',
+            'food_type': PLANT_NAMES[post_id % len(PLANT_NAMES)],
+            'quantity': f'{rng.randint(1, 20)} lbs',
+            'location': f'Site {rng.randint(1, max(1, n_gardens // 10))}',
+            'user_id': (post_id - 1) % n_users + 1,
+            'timestamp': post_times[post_id - 1],
+            'likes': popularity.share(rank_of_post[post_id - 1], n_posts * args.likes_per_post),
+        } for post_id in range(1, n_posts + 1)))
+
+        post_by_rank = [0] * n_posts
+        for index, rank in enumerate(rank_of_post):
+            post_by_rank[rank] = index + 1
+        n_replies = int(n_posts * args.replies_per_post)
+
+        def replies():
+            for reply_id in range(1, n_replies + 1):
+                post_id = post_by_rank[popularity.sample()]
+                yield {
+                    'id': reply_id,
+                    'content': rng.choice(REPLY_TEXTS),
+                    'user_id': user_id(),
+                    'post_id': post_id,
+                    'timestamp': post_times[post_id - 1] + timedelta(minutes=rng.randint(1, 2880)),
+                }
+        print(f"\n💬 Generating {n_replies} replies...")
+        bulk_insert(Reply, replies())
+
+        def followers():
+            follower_id = itertools.count(1)
+            follows = min(args.follows_per_user, n_gardens)
+            for uid in range(1, n_users + 1):
+                for garden_id in rng.sample(range(1, n_gardens + 1), follows):
+                    yield {
+                        'id': next(follower_id),
+                        'garden_id': garden_id,
+                        'user_id': uid,
+                        'followed_at': ago(90),
+                    }
+        print("\n❤️  Generating garden followers...")
+        bulk_insert(GardenFollower, followers())
+
+        rebuild_occupancy()
+        print("✅ garden_occupancy rebuilt")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Populate the FoodShare database.')
+    parser.add_argument('--generate', action='store_true',
+                        help='Generate a large synthetic dataset instead of the example data')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--users', type=int, default=1000, help='Number of users')
+    parser.add_argument('--gardens', type=int, default=100, help='Number of gardens')
+    parser.add_argument('--grid-sizes', default='5x5:0.6,10x10:0.3,50x50:0.1',
+                        help="Grid size distribution as ROWSxCOLS:WEIGHT,... "
+                             "(default: 5x5:0.6,10x10:0.3,50x50:0.1)")
+    parser.add_argument('--claim-ratio', type=float, default=0.3,
+                        help='Share of plantable plots that are claimed (default: 0.3)')
+    parser.add_argument('--posts-per-user', type=int, default=5, help='Posts per user (default: 5)')
+    parser.add_argument('--replies-per-post', type=float, default=3.0,
+                        help='Average replies per post (default: 3)')
+    parser.add_argument('--likes-per-post', type=float, default=4.0,
+                        help='Average likes per post (default: 4)')
+    parser.add_argument('--zipf-s', type=float, default=1.1,
+                        help='Zipf exponent for reply/like popularity (default: 1.1)')
+    parser.add_argument('--follows-per-user', type=int, default=3,
+                        help='Gardens followed by each user (default: 3)')
+    return parser.parse_args(argv)
+
 def main():
     """Main function to seed the database"""
+    args = parse_args()
+
     print("=" * 60)
     print("🌱 FoodShare Database Seeding Script")
     print("=" * 60)
     
     # Clear existing data
     clear_database()
+
+    if args.generate:
+        generate_database(args)
+        print("\n✅ Synthetic dataset generated (seed %d)" % args.seed)
+        return
     
     # Create all data
     users = create_users()
     gardens = create_gardens(users)
     create_garden_plots(gardens, users)
+    with app.app_context():
+        rebuild_occupancy()
     posts = create_posts(users)
     create_replies(posts, users)
     create_garden_followers(gardens, users)
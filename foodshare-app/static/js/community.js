@@ -0,0 +1,316 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Post submission handler
+    const submitPostBtn = document.getElementById('submitPostBtn');
+    if (submitPostBtn) {
+        submitPostBtn.addEventListener('click', submitPost);
+    }
+
+    // Like button handlers
+    document.querySelectorAll('.like-button').forEach(button => {
+        button.addEventListener('click', function() {
+            const postId = this.dataset.postId;
+            likePost(postId, this);
+        });
+    });
+
+    // Reply button handlers - toggle reply section
+    document.querySelectorAll('.reply-button').forEach(button => {
+        button.addEventListener('click', function() {
+            const postId = this.dataset.postId;
+            toggleRepliesSection(postId);
+        });
+    });
+
+    // Submit reply handlers
+    document.querySelectorAll('.submit-reply-btn').forEach(button => {
+        button.addEventListener('click', function() {
+            const postId = this.dataset.postId;
+            submitReply(postId);
+        });
+    });
+
+    // Allow Enter key to submit reply
+    document.querySelectorAll('.reply-input').forEach(input => {
+        input.addEventListener('keypress', function(e) {
+            if (e.key === 'Enter') {
+                const postId = this.dataset.postId;
+                submitReply(postId);
+            }
+        });
+    });
+});
+
+function submitPost() {
+    const form = document.getElementById('postForm');
+
+    if (!form) {
+        console.error('Form element not found!');
+        alert('Error: Form not found. Please refresh the page.');
+        return;
+    }
+
+    const formData = new FormData(form);
+
+    fetch('/api/posts', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => {
+        if (!response.ok) {
+            return response.json().then(err => {
+                throw new Error(err.error || 'Error creating post');
+            });
+        }
+        return response.json();
+    })
+    .then(data => {
+        console.log('Post created:', data);
+        // Close modal
+        const modal = bootstrap.Modal.getInstance(document.getElementById('newPostModal'));
+        if (modal) {
+            modal.hide();
+        }
+        // Clear form
+        form.reset();
+        // Reload page to show new post
+        location.reload();
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert(error.message || 'Error creating post');
+    });
+}
+
+function likePost(postId, button) {
+    fetch(`/api/posts/${postId}/like`, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        const likesCount = button.querySelector('.likes-count');
+        likesCount.textContent = data.likes;
+    })
+    .catch(error => {
+        console.error('Error:', error);
+    });
+}
+
+// Per post: ids of the oldest and newest reply on screen, so later requests
+// only fetch what is missing and the list is only ever added to
+const replyThreads = {};
+
+function toggleRepliesSection(postId) {
+    const repliesSection = document.getElementById(`replies-section-${postId}`);
+    const isHidden = repliesSection.style.display === 'none';
+
+    if (isHidden) {
+        repliesSection.style.display = 'block';
+        if (replyThreads[postId]) {
+            loadNewReplies(postId);
+        } else {
+            loadReplies(postId);
+        }
+    } else {
+        repliesSection.style.display = 'none';
+    }
+}
+
+// First look at a thread: its newest page
+function loadReplies(postId) {
+    fetch(`/api/posts/${postId}/replies`)
+    .then(response => response.json())
+    .then(page => showReplies(postId, page))
+    .catch(error => {
+        console.error('Error loading replies:', error);
+    });
+}
+
+function showReplies(postId, page) {
+    const replies = page.replies;
+    const repliesList = document.getElementById(`replies-list-${postId}`);
+    replyThreads[postId] = {newest: replies.length ? replies[replies.length - 1].id : 0};
+
+    if (replies.length === 0) {
+        repliesList.innerHTML = '<p class="text-muted small no-replies">No replies yet. Be the first to reply!</p>';
+        return;
+    }
+    repliesList.innerHTML = replies.map(renderReply).join('');
+    updateEarlierRepliesButton(postId, page.next_before);
+}
+
+function loadEarlierReplies(postId, before) {
+    fetch(`/api/posts/${postId}/replies?before=${before}`)
+    .then(response => response.json())
+    .then(page => {
+        const repliesList = document.getElementById(`replies-list-${postId}`);
+        repliesList.insertAdjacentHTML('afterbegin', page.replies.map(renderReply).join(''));
+        updateEarlierRepliesButton(postId, page.next_before);
+    })
+    .catch(error => {
+        console.error('Error loading replies:', error);
+    });
+}
+
+// Append replies posted since the newest one on screen
+function loadNewReplies(postId) {
+    const thread = replyThreads[postId];
+    fetch(`/api/posts/${postId}/replies?since=${thread.newest}`)
+    .then(response => response.json())
+    .then(page => showNewReplies(postId, page))
+    .catch(error => {
+        console.error('Error loading replies:', error);
+    });
+}
+
+function showNewReplies(postId, page) {
+    const thread = replyThreads[postId];
+    const replies = page.replies;
+    if (replies.length) {
+        const repliesList = document.getElementById(`replies-list-${postId}`);
+        const placeholder = repliesList.querySelector('.no-replies');
+        if (placeholder) placeholder.remove();
+        repliesList.insertAdjacentHTML('beforeend', replies.map(renderReply).join(''));
+        thread.newest = replies[replies.length - 1].id;
+    }
+    if (page.next_since) loadNewReplies(postId);
+}
+
+function updateEarlierRepliesButton(postId, before) {
+    const repliesList = document.getElementById(`replies-list-${postId}`);
+    let button = repliesList.previousElementSibling;
+    if (!button || !button.classList.contains('earlier-replies-btn')) {
+        button = document.createElement('button');
+        button.className = 'btn btn-link btn-sm earlier-replies-btn mb-2';
+        button.innerHTML = '<i class="fas fa-chevron-up"></i> Show earlier replies';
+        repliesList.before(button);
+    }
+    if (before) {
+        button.onclick = () => loadEarlierReplies(postId, before);
+        button.style.display = '';
+    } else {
+        button.style.display = 'none';
+    }
+}
+
+function renderReply(reply) {
+    return `
+        <div class="reply-item mb-2 p-2 bg-light rounded">
+            <div class="d-flex justify-content-between">
+                <strong class="text-primary">${escapeHtml(reply.author)}</strong>
+                <small class="text-muted">${formatTimestamp(reply.timestamp)}</small>
+            </div>
+            <p class="mb-0 mt-1">${escapeHtml(reply.content)}</p>
+        </div>
+    `;
+}
+
+function submitReply(postId) {
+    const input = document.querySelector(`.reply-input[data-post-id="${postId}"]`);
+    const content = input.value.trim();
+
+    if (!content) {
+        alert('Please enter a reply');
+        return;
+    }
+
+    // The reply and whatever is new in the thread, in one round trip
+    const thread = replyThreads[postId];
+    apiBatch([
+        {method: 'POST', path: `/api/posts/${postId}/replies`, body: {content: content}},
+        {method: 'GET', path: `/api/posts/${postId}/replies` + (thread ? `?since=${thread.newest}` : '')}
+    ])
+    .then(([posted, page]) => {
+        if (posted.status >= 400) {
+            alert(posted.body.error || 'Error creating reply');
+            return;
+        }
+        input.value = ''; // Clear input
+        if (page.status !== 200) {
+            loadReplies(postId);
+        } else if (thread) {
+            showNewReplies(postId, page.body); // Append it (and anything else new)
+        } else {
+            showReplies(postId, page.body);
+        }
+
+        // Update reply count
+        const replyButton = document.querySelector(`.reply-button[data-post-id="${postId}"]`);
+        const repliesCountSpan = replyButton.querySelector('.replies-count');
+        const currentCount = parseInt(repliesCountSpan.textContent.match(/\d+/)[0]);
+        repliesCountSpan.textContent = `(${currentCount + 1})`;
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error creating reply');
+    });
+}
+
+function formatTimestamp(timestamp) {
+    const date = new Date(timestamp);
+    const now = new Date();
+    const diffMs = now - date;
+    const diffMins = Math.floor(diffMs / 60000);
+    const diffHours = Math.floor(diffMs / 3600000);
+    const diffDays = Math.floor(diffMs / 86400000);
+
+    if (diffMins < 1) return 'Just now';
+    if (diffMins < 60) return `${diffMins}m ago`;
+    if (diffHours < 24) return `${diffHours}h ago`;
+    if (diffDays < 7) return `${diffDays}d ago`;
+
+    return date.toLocaleDateString();
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Mark post as resolved
+function markPostAsResolved(postId) {
+    if (!confirm('Mark this post as resolved?')) return;
+
+    fetch(`/api/posts/${postId}/resolve`, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'resolved') {
+            // Reload the page to show updated status
+            location.reload();
+        } else {
+            alert('Failed to mark post as resolved');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error marking post as resolved');
+    });
+}
+
+// Delete post
+function deletePost(postId) {
+    if (!confirm('Are you sure you want to delete this post? This action cannot be undone.')) return;
+
+    fetch(`/api/posts/${postId}`, {
+        method: 'DELETE'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.message) {
+            // Remove the post from the DOM
+            const postElement = document.getElementById(`post-${postId}`);
+            if (postElement) {
+                postElement.remove();
+            }
+            alert('Post deleted successfully');
+        } else {
+            alert('Failed to delete post');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error deleting post');
+    });
+}
@@ -0,0 +1,642 @@
+// Garden directory paging: the server renders one page of cards at a time,
+// search and sort are applied server-side and further pages are appended
+let loadingGardens = false;
+
+function gardenDirectoryUrl(page) {
+    const params = new URLSearchParams({
+        partial: 1,
+        page: page,
+        sort: document.getElementById('gardenSort').value,
+        q: document.getElementById('gardenSearch').value.trim()
+    });
+    if (document.getElementById('gardenOpenOnly').checked) params.set('open', 1);
+    return `/garden?${params}`;
+}
+
+function loadGardens(page, replace) {
+    if (loadingGardens) return;
+    loadingGardens = true;
+
+    fetch(gardenDirectoryUrl(page))
+        .then(response => response.text())
+        .then(html => {
+            const container = document.getElementById('gardensContainer');
+            const template = document.createElement('template');
+            template.innerHTML = html;
+
+            const more = template.content.querySelector('.garden-page-info');
+            const nextPage = more ? more.dataset.nextPage : '';
+            if (more) more.remove();
+
+            if (replace) container.innerHTML = '';
+            container.appendChild(template.content);
+            if (replace && !container.querySelector('.garden-item')) {
+                container.innerHTML = '<div class="col-12"><div class="alert alert-info"><i class="fas fa-info-circle"></i> No gardens match your search.</div></div>';
+            }
+
+            const sentinel = document.getElementById('gardensMore');
+            sentinel.dataset.nextPage = nextPage;
+            sentinel.style.display = nextPage ? '' : 'none';
+
+            updateFollowButtonStates(container.querySelectorAll('.follow-btn:not([data-checked])'));
+        })
+        .catch(error => console.error('Error loading gardens:', error))
+        .finally(() => { loadingGardens = false; });
+}
+
+function loadNextGardens() {
+    const nextPage = document.getElementById('gardensMore').dataset.nextPage;
+    if (nextPage) loadGardens(nextPage, false);
+}
+
+let gardenSearchTimer = null;
+document.getElementById('gardenSearch').addEventListener('input', function() {
+    clearTimeout(gardenSearchTimer);
+    gardenSearchTimer = setTimeout(() => loadGardens(1, true), 300);
+});
+document.getElementById('gardenSort').addEventListener('change', () => loadGardens(1, true));
+document.getElementById('gardenOpenOnly').addEventListener('change', () => loadGardens(1, true));
+document.getElementById('loadMoreGardens').addEventListener('click', loadNextGardens);
+
+if ('IntersectionObserver' in window) {
+    new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadNextGardens();
+    }, { rootMargin: '200px' }).observe(document.getElementById('gardensMore'));
+}
+
+// Designer grid state
+let designerPlotStates = [];
+let isSubmittingGarden = false;  // Flag to prevent double submissions
+
+// Debug: Log initial state
+console.log('🏁 Script loaded. Initial designerPlotStates:', designerPlotStates);
+
+// Initialize designer grid when modal opens or grid size changes
+function initializeDesignerGrid() {
+    console.log('🔧 initializeDesignerGrid() called');
+    const rows = parseInt(document.getElementById('newGardenRows').value) || 5;
+    const cols = parseInt(document.getElementById('newGardenCols').value) || 5;
+    const totalPlots = rows * cols;
+
+    // Preserve existing states when resizing, or initialize all as available
+    const oldStates = [...designerPlotStates];
+    designerPlotStates = new Array(totalPlots);
+
+    for (let i = 0; i < totalPlots; i++) {
+        // Keep old state if it exists, otherwise set as available
+        designerPlotStates[i] = (i < oldStates.length) ? oldStates[i] : 'available';
+    }
+
+    console.log('🔧 Designer grid initialized:', {rows, cols, totalPlots, statesLength: designerPlotStates.length});
+    console.log('🔧 First 5 states:', designerPlotStates.slice(0, 5));
+    renderDesignerGrid(rows, cols);
+}
+
+// Render the designer grid
+let designerGrid = null;
+
+function renderDesignerGrid(rows, cols) {
+    if (!designerGrid) {
+        designerGrid = new PlotGrid(document.getElementById('designerGrid'), {
+            cellSize: 45,
+            maxHeight: 0.5,
+            markUnavailable: true,
+            onSelect: toggleDesignerPlot
+        });
+    }
+    designerGrid.setGrid(rows, cols, designerPlotStates);
+}
+
+// Toggle plot type in designer (cycles through: available -> water -> tools -> null -> available)
+function toggleDesignerPlot(index) {
+    const currentState = designerPlotStates[index];
+    let nextState = 'available';
+
+    if (currentState === 'available') {
+        nextState = 'water';
+    } else if (currentState === 'water') {
+        nextState = 'tools';
+    } else if (currentState === 'tools') {
+        nextState = 'null';
+    }
+
+    // Repaints just this plot
+    designerGrid.setStatus(index, nextState);
+}
+
+// Clear all - make all plots available
+document.getElementById('clearAllBtn').addEventListener('click', function() {
+    const rows = parseInt(document.getElementById('newGardenRows').value) || 5;
+    const cols = parseInt(document.getElementById('newGardenCols').value) || 5;
+    const totalPlots = rows * cols;
+    designerPlotStates = new Array(totalPlots).fill('available');
+    renderDesignerGrid(rows, cols);
+    console.log('🧹 Cleared all plots to available');
+});
+
+// Update grid when rows/cols change
+document.getElementById('newGardenRows').addEventListener('change', initializeDesignerGrid);
+document.getElementById('newGardenCols').addEventListener('change', initializeDesignerGrid);
+
+// Initialize designer grid when modal is shown
+const modal = document.getElementById('newGardenModal');
+if (modal) {
+    modal.addEventListener('shown.bs.modal', function() {
+        console.log('🎬 Modal opened, initializing designer...');
+        initializeDesignerGrid();
+    });
+    console.log('✅ Modal event listener attached successfully');
+} else {
+    console.error('❌ Could not find newGardenModal element!');
+}
+
+// Reset submission flag when modal is hidden
+document.getElementById('newGardenModal').addEventListener('hidden.bs.modal', function() {
+    isSubmittingGarden = false;
+    document.getElementById('submitGardenBtn').disabled = false;
+    document.getElementById('submitGardenBtn').innerHTML = 'Create Garden';
+    document.getElementById('gardenForm').reset();
+});
+
+// Store current garden plots data
+let currentGardenData = {};
+
+// View garden plots
+function viewGardenPlots(gardenId, gardenName) {
+    document.getElementById('gardenPlotsTitle').innerHTML = `<i class="fas fa-th"></i> ${gardenName} - Garden Plots`;
+
+    // Fetch garden plot data
+    fetch(`/api/gardens/${gardenId}/plots`)
+        .then(response => response.json())
+        .then(data => {
+            currentGardenData = data;
+            renderGardenGrid(data);
+            const modal = new bootstrap.Modal(document.getElementById('gardenPlotsModal'));
+            modal.show();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Failed to load garden plots');
+        });
+}
+
+// Render the garden grid
+let gardenGrid = null;
+
+function renderGardenGrid(data) {
+    if (!gardenGrid) {
+        gardenGrid = new PlotGrid(document.getElementById('gardenGrid'), {
+            onSelect: index => selectPlot(index, currentGardenData.plots[index]),
+            canSelect: status => status !== 'null'
+        });
+        document.getElementById('gardenZoomIn').addEventListener('click', () => gardenGrid.zoomBy(1.5));
+        document.getElementById('gardenZoomOut').addEventListener('click', () => gardenGrid.zoomBy(1 / 1.5));
+        document.getElementById('gardenZoomFit').addEventListener('click', () => gardenGrid.fit());
+    }
+    gardenGrid.setGrid(data.rows, data.cols, data.plots.map(plot => plot.status));
+}
+
+// Select a plot
+function selectPlot(index, plot) {
+    gardenGrid.select(index);
+
+    // Show plot details modal
+    showPlotDetailsModal(index, plot);
+}
+
+// A claim or release changed one plot: repaint it instead of reloading the grid
+function updatePlot(index, plot) {
+    currentGardenData.plots[index] = plot;
+    gardenGrid.setStatus(index, plot.status);
+}
+
+// Show plot details in a modal
+function showPlotDetailsModal(index, plot) {
+    // Set plot number
+    document.getElementById('detailPlotNumber').textContent = `#${index + 1}`;
+
+    // Set status with special handling for water and tools
+    let statusText = plot.status.charAt(0).toUpperCase() + plot.status.slice(1);
+    if (plot.status === 'water') {
+        statusText = 'Water Source';
+    } else if (plot.status === 'tools') {
+        statusText = 'Tool Hub';
+    }
+    document.getElementById('detailPlotStatus').textContent = statusText;
+
+    // Show/hide owner section
+    const ownerSection = document.getElementById('detailOwnerSection');
+    if (plot.status === 'mine' || plot.status === 'taken') {
+        const ownerText = plot.status === 'mine' ? 'You' : (plot.owner || 'Another gardener');
+        document.getElementById('detailPlotOwner').textContent = ownerText;
+        ownerSection.style.display = 'block';
+    } else {
+        ownerSection.style.display = 'none';
+    }
+
+    // Show/hide plot attributes sections (only for claimed plots)
+    const showAttributes = (plot.status === 'mine' || plot.status === 'taken');
+
+    const waterSection = document.getElementById('detailWaterSection');
+    const toolsSection = document.getElementById('detailToolsSection');
+    const soilSection = document.getElementById('detailSoilSection');
+    const sunlightSection = document.getElementById('detailSunlightSection');
+    const notesSection = document.getElementById('detailNotesSection');
+
+    if (showAttributes) {
+        // Water available
+        if (plot.water_available !== null && plot.water_available !== undefined) {
+            document.getElementById('detailPlotWater').textContent = plot.water_available ? 'Yes' : 'No';
+            waterSection.style.display = 'block';
+        } else {
+            waterSection.style.display = 'none';
+        }
+
+        // Tools available
+        if (plot.tools_available !== null && plot.tools_available !== undefined) {
+            document.getElementById('detailPlotTools').textContent = plot.tools_available ? 'Yes' : 'No';
+            toolsSection.style.display = 'block';
+        } else {
+            toolsSection.style.display = 'none';
+        }
+
+        // Soil type
+        if (plot.soil_type) {
+            document.getElementById('detailPlotSoil').textContent = plot.soil_type;
+            soilSection.style.display = 'block';
+        } else {
+            soilSection.style.display = 'none';
+        }
+
+        // Sunlight level
+        if (plot.sunlight_level) {
+            document.getElementById('detailPlotSunlight').textContent = plot.sunlight_level;
+            sunlightSection.style.display = 'block';
+        } else {
+            sunlightSection.style.display = 'none';
+        }
+
+        // Notes
+        if (plot.notes) {
+            document.getElementById('detailPlotNotes').textContent = plot.notes;
+            notesSection.style.display = 'block';
+        } else {
+            notesSection.style.display = 'none';
+        }
+    } else {
+        waterSection.style.display = 'none';
+        toolsSection.style.display = 'none';
+        soilSection.style.display = 'none';
+        sunlightSection.style.display = 'none';
+        notesSection.style.display = 'none';
+    }
+
+    // Show appropriate actions
+    const plotActions = document.getElementById('detailPlotActions');
+    if (plot.status === 'available') {
+        plotActions.innerHTML = `
+            <button class="btn btn-success w-100" onclick="claimPlot(${index})">
+                <i class="fas fa-check"></i> Claim This Plot
+            </button>
+        `;
+    } else if (plot.status === 'mine') {
+        plotActions.innerHTML = `
+            <button class="btn btn-danger w-100" onclick="releasePlot(${index})">
+                <i class="fas fa-times"></i> Release This Plot
+            </button>
+        `;
+    } else if (plot.status === 'water') {
+        plotActions.innerHTML = '<p class="text-info text-center mb-0"><i class="fas fa-tint"></i> This is a water source for the garden.</p>';
+    } else if (plot.status === 'tools') {
+        plotActions.innerHTML = '<p class="text-warning text-center mb-0"><i class="fas fa-tools"></i> This is a tool hub where gardening tools are stored.</p>';
+    } else if (plot.status === 'taken') {
+        plotActions.innerHTML = `
+            <button class="btn btn-outline-success w-100" onclick="joinWaitlist(${index})">
+                <i class="fas fa-hourglass-half"></i> Join Waitlist for This Plot
+            </button>
+        `;
+    } else {
+        plotActions.innerHTML = '<p class="text-muted text-center mb-0">This area is not available for planting</p>';
+    }
+
+    // Show the modal with proper backdrop
+    const plotModal = document.getElementById('plotDetailsModal');
+    const modal = new bootstrap.Modal(plotModal, {
+        backdrop: true,
+        keyboard: true,
+        focus: true
+    });
+    modal.show();
+
+    // Ensure the backdrop appears above the garden plots modal
+    setTimeout(() => {
+        const backdrop = document.querySelector('.modal-backdrop:last-of-type');
+        if (backdrop) {
+            backdrop.style.zIndex = '1055';
+        }
+    }, 10);
+}
+
+// Claim a plot
+function claimPlot(index) {
+    // Close the details modal first
+    const detailsModal = bootstrap.Modal.getInstance(document.getElementById('plotDetailsModal'));
+    if (detailsModal) {
+        detailsModal.hide();
+    }
+
+    fetch(`/api/gardens/${currentGardenData.garden_id}/plots/${index}/claim`, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            updatePlot(index, {...data.plot, status: 'mine'});
+            alert('Plot claimed successfully!');
+        } else if (data.waitlist) {
+            if (confirm(data.error + '\n\nJoin the waitlist for this garden?')) {
+                joinWaitlist(null);
+            }
+        } else {
+            alert('Failed to claim plot: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Failed to claim plot');
+    });
+}
+
+// Release a plot
+function releasePlot(index) {
+    if (!confirm('Are you sure you want to release this plot?')) return;
+
+    // Close the details modal first
+    const detailsModal = bootstrap.Modal.getInstance(document.getElementById('plotDetailsModal'));
+    if (detailsModal) {
+        detailsModal.hide();
+    }
+
+    fetch(`/api/gardens/${currentGardenData.garden_id}/plots/${index}/release`, {
+        method: 'POST'
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // 'taken' if the waitlist handed it straight to someone else
+            updatePlot(index, data.plot);
+            alert('Plot released successfully!');
+        } else {
+            alert('Failed to release plot: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Failed to release plot');
+    });
+}
+
+// Join the garden's waitlist (plotIndex null = any plot)
+function joinWaitlist(plotIndex) {
+    const detailsModal = bootstrap.Modal.getInstance(document.getElementById('plotDetailsModal'));
+    if (detailsModal) {
+        detailsModal.hide();
+    }
+
+    fetch(`/api/gardens/${currentGardenData.garden_id}/waitlist`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({plot_index: plotIndex})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert(`You're on the waitlist (position ${data.position}). We'll assign you a plot as soon as one opens up.`);
+        } else {
+            alert('Failed to join waitlist: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Failed to join waitlist');
+    });
+}
+
+// Create new garden
+document.getElementById('submitGardenBtn').addEventListener('click', function(e) {
+    e.preventDefault();  // Prevent any default behavior
+    e.stopPropagation(); // Stop event from bubbling
+
+    const btn = this;
+
+    // IMMEDIATELY disable the button
+    if (btn.disabled || isSubmittingGarden) {
+        console.log('⛔ Button already disabled or submission in progress');
+        return;
+    }
+
+    btn.disabled = true;
+    isSubmittingGarden = true;
+
+    const form = document.getElementById('gardenForm');
+
+    // Validate form
+    if (!form.checkValidity()) {
+        form.reportValidity();
+        btn.disabled = false;
+        isSubmittingGarden = false;
+        return;
+    }
+
+    const formData = new FormData(form);
+    const gardenName = formData.get('name').trim();
+
+    // IMPORTANT: Capture plot states NOW before any async operations
+    const plotStatesToSend = [...designerPlotStates];  // Make a copy
+    console.log('💾 Captured plot states:', plotStatesToSend);
+    console.log('💾 Length:', plotStatesToSend.length);
+
+    // Validation: Ensure we have plot states
+    if (!plotStatesToSend || plotStatesToSend.length === 0) {
+        console.error('❌ ERROR: Plot states array is empty!');
+        alert('Error: Garden layout is not initialized. Please close and reopen the form.');
+        btn.disabled = false;
+        isSubmittingGarden = false;
+        return;
+    }
+
+    // Check if garden name already exists
+    fetch('/api/gardens')
+        .then(response => response.json())
+        .then(existingGardens => {
+            const nameExists = existingGardens.some(g => g.name.toLowerCase() === gardenName.toLowerCase());
+
+            if (nameExists) {
+                alert(`A garden named "${gardenName}" already exists! Please choose a different name.`);
+                btn.disabled = false;
+                isSubmittingGarden = false;
+                return;
+            }
+
+            // Proceed with submission if name is unique
+            submitGarden(formData, gardenName, plotStatesToSend, btn);
+        })
+        .catch(error => {
+            console.error('Error checking for duplicates:', error);
+            // Proceed anyway if check fails
+            submitGarden(formData, gardenName, plotStatesToSend, btn);
+        });
+});
+
+// Separate function to handle the actual submission
+function submitGarden(formData, gardenName, plotStatesToSend, btn) {
+    // Button is already disabled, just update the text
+    const originalText = btn.innerHTML;
+    btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Creating...';
+
+    const gardenData = {
+        name: gardenName,
+        description: formData.get('description'),
+        location: formData.get('location'),
+        plants: formData.get('plants'),
+        rows: parseInt(formData.get('rows')),
+        cols: parseInt(formData.get('cols')),
+        plot_states: plotStatesToSend  // Use the captured plot states
+    };
+
+    // Debug: Log what we're sending
+    console.log('📤 Sending garden data:', gardenData);
+    console.log('📤 Plot states array:', plotStatesToSend);
+    console.log('📤 Plot states length:', plotStatesToSend ? plotStatesToSend.length : 0);
+    console.log('📤 Rows x Cols:', gardenData.rows, 'x', gardenData.cols, '=', gardenData.rows * gardenData.cols);
+
+    fetch('/api/gardens', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(gardenData)
+    })
+    .then(response => response.json())
+    .then(data => {
+        bootstrap.Modal.getInstance(document.getElementById('newGardenModal')).hide();
+        location.reload();
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Failed to create garden');
+        // Re-enable button on error
+        isSubmittingGarden = false;
+        btn.disabled = false;
+        btn.innerHTML = originalText;
+    });
+}
+
+// Join garden function
+function joinGarden(gardenId, gardenName) {
+    const message = prompt(`Enter a message to join "${gardenName}" (optional):`);
+
+    // User cancelled
+    if (message === null) return;
+
+    fetch(`/api/gardens/${gardenId}/join`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            message: message
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            alert(data.error);
+        } else {
+            alert('Join request sent successfully! Check your profile to see pending requests.');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Failed to send join request');
+    });
+}
+
+// Check follow status for all gardens on page load
+document.addEventListener('DOMContentLoaded', function() {
+    updateFollowButtonStates(document.querySelectorAll('.garden-item .follow-btn'));
+});
+
+// Check follow status for a set of follow buttons, in one batched request
+function updateFollowButtonStates(buttons) {
+    const gardenIds = Array.from(buttons, btn => {
+        btn.dataset.checked = '1';
+        return btn.id.split('-')[2];
+    });
+    if (!gardenIds.length) return;
+
+    apiBatch(gardenIds.map(gardenId => ({method: 'GET', path: `/api/gardens/${gardenId}/is-following`})))
+        .then(responses => responses.forEach((response, i) => {
+            if (response.status === 200) showFollowState(gardenIds[i], response.body.is_following);
+        }))
+        .catch(error => console.error('Error checking follow status:', error));
+}
+
+// Update follow button state
+function updateFollowButtonState(gardenId) {
+    fetch(`/api/gardens/${gardenId}/is-following`)
+        .then(response => response.json())
+        .then(data => showFollowState(gardenId, data.is_following))
+        .catch(error => console.error('Error checking follow status:', error));
+}
+
+function showFollowState(gardenId, isFollowing) {
+    const btn = document.getElementById(`follow-btn-${gardenId}`);
+    if (isFollowing) {
+        btn.innerHTML = '<i class="fas fa-check"></i> Following';
+        btn.classList.remove('btn-success');
+        btn.classList.add('btn-outline-success');
+    } else {
+        btn.innerHTML = '<i class="fas fa-user-plus"></i> Follow';
+        btn.classList.remove('btn-outline-success');
+        btn.classList.add('btn-success');
+    }
+}
+
+// Toggle follow/unfollow garden
+function toggleFollowGarden(gardenId, gardenName) {
+    const btn = document.getElementById(`follow-btn-${gardenId}`);
+    const isFollowing = btn.classList.contains('btn-outline-success');
+
+    if (isFollowing) {
+        // Unfollow
+        fetch(`/api/gardens/${gardenId}/unfollow`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                alert(data.error);
+            } else {
+                updateFollowButtonState(gardenId);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Failed to unfollow garden');
+        });
+    } else {
+        // Follow
+        fetch(`/api/gardens/${gardenId}/follow`, {
+            method: 'POST'
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                alert(data.error);
+            } else {
+                updateFollowButtonState(gardenId);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Failed to follow garden');
+        });
+    }
+}
@@ -0,0 +1,421 @@
+// Garden plot grids drawn on a canvas, for the plots viewer and the designer.
+// Only the plots inside the visible part of the grid are painted, a status
+// change repaints just that plot, and big grids can be zoomed (ctrl+wheel,
+// pinch, + and - keys) and panned (drag, wheel, arrow keys).
+// Render times: benchmarks/bench_plot_grid.html
+
+const PLOT_COLORS = {
+    available: '#90EE90',
+    taken: '#FFD700',
+    mine: '#FFB6C1',
+    water: '#87CEEB',
+    tools: '#FFA500',
+    null: '#D3D3D3'
+};
+const PLOT_LABELS = {
+    available: 'Available',
+    taken: 'Taken',
+    mine: 'Your plot',
+    water: 'Water source',
+    tools: 'Tool hub',
+    null: 'Not available'
+};
+// Font Awesome glyphs: tint, wrench, xmark
+const PLOT_ICONS = {water: ['\uf043', '#1E90FF'], tools: ['\uf0ad', '#FF8C00'], null: ['\uf00d', '#555']};
+const PLOT_ICON_FONT = '"Font Awesome 6 Free"';
+const PLOT_GRID_BACKGROUND = '#f8f9fa';
+const PLOT_GRID_PADDING = 20;  // around the plots, in unzoomed pixels
+const PLOT_GRID_MAX_ZOOM = 3;
+const PLOT_MIN_LABEL_SIZE = 26;  // on-screen size below which plot numbers are left out
+const PLOT_MIN_ICON_SIZE = 14;
+const PLOT_DRAG_THRESHOLD = 5;  // pixels a press can move and still count as a click
+
+class PlotGrid {
+    // options: cellSize and gap (unzoomed pixels), maxHeight (fraction of the
+    // window), onSelect(index) when a plot is clicked or chosen with Enter,
+    // canSelect(status), markUnavailable (draw an X on 'null' plots)
+    constructor(canvas, options = {}) {
+        this.canvas = canvas;
+        this.ctx = canvas.getContext('2d');
+        this.cellSize = options.cellSize || 60;
+        this.gap = options.gap === undefined ? 8 : options.gap;
+        this.pitch = this.cellSize + this.gap;
+        this.maxHeight = options.maxHeight || 0.65;
+        this.onSelect = options.onSelect || null;
+        this.canSelect = options.canSelect || (() => true);
+        this.markUnavailable = !!options.markUnavailable;
+
+        this.rows = 0;
+        this.cols = 0;
+        this.statuses = [];
+        this.width = 0;
+        this.height = 0;
+        this.scale = 1;
+        this.offsetX = 0;
+        this.offsetY = 0;
+        this.fitted = true;  // keep fitting the grid to the canvas until the user zooms or pans
+        this.selected = -1;
+        this.hovered = -1;
+        this.focused = -1;
+        this.pointers = new Map();
+        this.drag = null;
+        this.drawPending = false;
+        this.iconsReady = false;
+
+        // Read out to screen readers as the keyboard focus moves
+        this.live = document.createElement('div');
+        this.live.className = 'visually-hidden';
+        this.live.setAttribute('aria-live', 'polite');
+        canvas.after(this.live);
+
+        canvas.addEventListener('pointerdown', e => this.onPointerDown(e));
+        canvas.addEventListener('pointermove', e => this.onPointerMove(e));
+        canvas.addEventListener('pointerup', e => this.onPointerUp(e));
+        canvas.addEventListener('pointercancel', e => this.onPointerUp(e));
+        canvas.addEventListener('pointerleave', () => this.setHovered(-1));
+        canvas.addEventListener('wheel', e => this.onWheel(e), {passive: false});
+        canvas.addEventListener('keydown', e => this.onKeyDown(e));
+        canvas.addEventListener('focus', () => this.moveFocus(Math.max(this.focused, 0)));
+        canvas.addEventListener('blur', () => this.drawCell(this.focused));
+
+        // Drawn at 0x0 while its modal is hidden; sized once it is shown
+        let observedWidth = 0;
+        new ResizeObserver(() => {
+            const width = canvas.parentElement.clientWidth;
+            if (width !== observedWidth) {
+                observedWidth = width;
+                this.resize();
+            }
+        }).observe(canvas.parentElement);
+
+        if (document.fonts) {
+            document.fonts.load(`900 16px ${PLOT_ICON_FONT}`).then(() => {
+                this.iconsReady = document.fonts.check(`900 16px ${PLOT_ICON_FONT}`);
+                this.scheduleDraw();
+            }, () => {});
+        }
+    }
+
+    // ---------- Data ----------
+
+    setGrid(rows, cols, statuses) {
+        this.rows = rows;
+        this.cols = cols;
+        this.statuses = statuses;
+        this.selected = this.hovered = this.focused = -1;
+        this.fitted = true;
+        this.resize();
+    }
+
+    setStatus(index, status) {
+        this.statuses[index] = status;
+        this.drawCell(index);
+    }
+
+    select(index) {
+        const previous = this.selected;
+        this.selected = index;
+        this.drawCell(previous);
+        this.drawCell(index);
+    }
+
+    // ---------- Geometry ----------
+
+    contentWidth() {
+        return this.cols * this.pitch - this.gap + 2 * PLOT_GRID_PADDING;
+    }
+
+    contentHeight() {
+        return this.rows * this.pitch - this.gap + 2 * PLOT_GRID_PADDING;
+    }
+
+    fitScale() {
+        return Math.min(1, this.width / this.contentWidth(), this.height / this.contentHeight());
+    }
+
+    overflows() {
+        return this.contentWidth() * this.scale > this.width + 1 || this.contentHeight() * this.scale > this.height + 1;
+    }
+
+    cellRect(index) {
+        const col = index % this.cols;
+        const row = Math.floor(index / this.cols);
+        return {
+            x: this.offsetX + (PLOT_GRID_PADDING + col * this.pitch) * this.scale,
+            y: this.offsetY + (PLOT_GRID_PADDING + row * this.pitch) * this.scale,
+            size: this.cellSize * this.scale
+        };
+    }
+
+    // Index of the plot under a point in client coordinates, or -1
+    cellAt(clientX, clientY) {
+        const rect = this.canvas.getBoundingClientRect();
+        const x = (clientX - rect.left - this.offsetX) / this.scale - PLOT_GRID_PADDING;
+        const y = (clientY - rect.top - this.offsetY) / this.scale - PLOT_GRID_PADDING;
+        const col = Math.floor(x / this.pitch);
+        const row = Math.floor(y / this.pitch);
+        if (col < 0 || row < 0 || col >= this.cols || row >= this.rows) return -1;
+        if (x - col * this.pitch > this.cellSize || y - row * this.pitch > this.cellSize) return -1;  // in a gap
+        return row * this.cols + col;
+    }
+
+    // ---------- View ----------
+
+    resize() {
+        const width = this.canvas.parentElement.clientWidth;
+        if (!width || !this.cols) return;
+        const fitToWidth = Math.min(1, width / this.contentWidth());
+        this.width = width;
+        this.height = Math.round(Math.min(this.contentHeight() * fitToWidth, window.innerHeight * this.maxHeight));
+
+        const ratio = window.devicePixelRatio || 1;
+        this.canvas.width = Math.round(width * ratio);
+        this.canvas.height = Math.round(this.height * ratio);
+        this.canvas.style.height = `${this.height}px`;
+        this.ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+
+        if (this.fitted) {
+            this.fit();
+        } else {
+            this.scale = Math.max(this.scale, this.fitScale());
+            this.clampOffset();
+            this.draw();
+        }
+    }
+
+    fit() {
+        this.scale = this.fitScale();
+        this.fitted = true;
+        this.clampOffset();
+        this.draw();
+    }
+
+    // Centre the grid along an axis where it fits, otherwise keep it covering the canvas
+    clampOffset() {
+        const width = this.contentWidth() * this.scale;
+        const height = this.contentHeight() * this.scale;
+        this.offsetX = width <= this.width ? (this.width - width) / 2
+            : Math.min(0, Math.max(this.width - width, this.offsetX));
+        this.offsetY = height <= this.height ? (this.height - height) / 2
+            : Math.min(0, Math.max(this.height - height, this.offsetY));
+    }
+
+    zoomAt(factor, x, y) {
+        const scale = Math.min(PLOT_GRID_MAX_ZOOM, Math.max(this.fitScale(), this.scale * factor));
+        this.offsetX = x - (x - this.offsetX) * scale / this.scale;
+        this.offsetY = y - (y - this.offsetY) * scale / this.scale;
+        this.scale = scale;
+        this.fitted = false;
+        this.clampOffset();
+        this.scheduleDraw();
+    }
+
+    zoomBy(factor) {
+        this.zoomAt(factor, this.width / 2, this.height / 2);
+    }
+
+    panBy(dx, dy) {
+        this.offsetX += dx;
+        this.offsetY += dy;
+        this.fitted = false;
+        this.clampOffset();
+        this.scheduleDraw();
+    }
+
+    // Pan just enough to bring a plot fully into view
+    reveal(index) {
+        const {x, y, size} = this.cellRect(index);
+        const margin = this.gap * this.scale;
+        let dx = 0;
+        let dy = 0;
+        if (x < margin) dx = margin - x;
+        else if (x + size > this.width - margin) dx = this.width - margin - x - size;
+        if (y < margin) dy = margin - y;
+        else if (y + size > this.height - margin) dy = this.height - margin - y - size;
+        if (dx || dy) this.panBy(dx, dy);
+    }
+
+    // ---------- Painting ----------
+
+    scheduleDraw() {
+        if (this.drawPending) return;
+        this.drawPending = true;
+        requestAnimationFrame(() => this.draw());
+    }
+
+    // Repaint every plot inside the canvas
+    draw() {
+        this.drawPending = false;
+        if (!this.width) return;
+        const ctx = this.ctx;
+        ctx.fillStyle = PLOT_GRID_BACKGROUND;
+        ctx.fillRect(0, 0, this.width, this.height);
+
+        const firstCol = Math.max(0, Math.floor((-this.offsetX / this.scale - PLOT_GRID_PADDING) / this.pitch));
+        const lastCol = Math.min(this.cols - 1, Math.floor(((this.width - this.offsetX) / this.scale - PLOT_GRID_PADDING) / this.pitch));
+        const firstRow = Math.max(0, Math.floor((-this.offsetY / this.scale - PLOT_GRID_PADDING) / this.pitch));
+        const lastRow = Math.min(this.rows - 1, Math.floor(((this.height - this.offsetY) / this.scale - PLOT_GRID_PADDING) / this.pitch));
+        for (let row = firstRow; row <= lastRow; row++) {
+            for (let col = firstCol; col <= lastCol; col++) {
+                this.paintCell(row * this.cols + col);
+            }
+        }
+    }
+
+    // Repaint one plot; a no-op when it is off screen or a full repaint is due anyway
+    drawCell(index) {
+        if (index < 0 || index >= this.statuses.length || this.drawPending || !this.width) return;
+        const {x, y, size} = this.cellRect(index);
+        if (x + size < 0 || y + size < 0 || x > this.width || y > this.height) return;
+        this.ctx.fillStyle = PLOT_GRID_BACKGROUND;
+        this.ctx.fillRect(x - 1, y - 1, size + 2, size + 2);
+        this.paintCell(index);
+    }
+
+    paintCell(index) {
+        const ctx = this.ctx;
+        const status = this.statuses[index];
+        const {x, y, size} = this.cellRect(index);
+        const highlighted = index === this.selected || index === this.hovered
+            || (index === this.focused && document.activeElement === this.canvas);
+        const line = Math.max(1, (index === this.selected ? 3 : 2) * this.scale);
+
+        // Stroked inside the plot's square so a repaint never touches its neighbours
+        ctx.globalAlpha = status === 'null' ? 0.5 : 1;
+        ctx.beginPath();
+        if (ctx.roundRect) {
+            ctx.roundRect(x + line / 2, y + line / 2, size - line, size - line, Math.min(4 * this.scale, size / 4));
+        } else {
+            ctx.rect(x + line / 2, y + line / 2, size - line, size - line);
+        }
+        ctx.fillStyle = PLOT_COLORS[status] || PLOT_COLORS.null;
+        ctx.fill();
+        ctx.lineWidth = line;
+        ctx.strokeStyle = highlighted ? '#0066cc' : '#333';
+        ctx.stroke();
+        ctx.globalAlpha = 1;
+
+        const centerX = x + size / 2;
+        const centerY = y + size / 2;
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'middle';
+        const icon = PLOT_ICONS[status];
+        if (icon && (status !== 'null' || this.markUnavailable)) {
+            if (this.iconsReady && size >= PLOT_MIN_ICON_SIZE) {
+                ctx.font = `900 ${Math.round(size * 0.4)}px ${PLOT_ICON_FONT}`;
+                ctx.fillStyle = icon[1];
+                ctx.fillText(icon[0], centerX, centerY);
+            }
+        } else if (status !== 'null' && size >= PLOT_MIN_LABEL_SIZE) {
+            ctx.fillStyle = '#000';
+            ctx.font = `bold ${Math.round(size * 0.2)}px system-ui, sans-serif`;
+            if (status === 'mine') {
+                ctx.fillText(`#${index + 1}`, centerX, centerY - size * 0.12);
+                ctx.font = `bold ${Math.round(size * 0.15)}px system-ui, sans-serif`;
+                ctx.fillText('YOU', centerX, centerY + size * 0.15);
+            } else {
+                ctx.fillText(`#${index + 1}`, centerX, centerY);
+            }
+        }
+    }
+
+    // ---------- Input ----------
+
+    setHovered(index) {
+        if (index === this.hovered) return;
+        const previous = this.hovered;
+        this.hovered = index;
+        this.drawCell(previous);
+        this.drawCell(index);
+        const clickable = index >= 0 && this.canSelect(this.statuses[index]);
+        this.canvas.style.cursor = clickable ? 'pointer' : (this.overflows() ? 'grab' : 'default');
+    }
+
+    activate(index) {
+        if (index >= 0 && this.canSelect(this.statuses[index]) && this.onSelect) this.onSelect(index);
+    }
+
+    pointerDistance() {
+        const [a, b] = [...this.pointers.values()];
+        return b ? Math.hypot(a.x - b.x, a.y - b.y) : 0;
+    }
+
+    onPointerDown(e) {
+        this.canvas.setPointerCapture(e.pointerId);
+        this.pointers.set(e.pointerId, {x: e.clientX, y: e.clientY});
+        // A second finger turns the press into a pinch, never a click
+        this.drag = this.pointers.size === 1 ? {x: e.clientX, y: e.clientY, moved: false} : null;
+        this.pinchDistance = this.pointerDistance();
+    }
+
+    onPointerMove(e) {
+        const pointer = this.pointers.get(e.pointerId);
+        if (!pointer) {
+            this.setHovered(this.cellAt(e.clientX, e.clientY));
+            return;
+        }
+        const dx = e.clientX - pointer.x;
+        const dy = e.clientY - pointer.y;
+        pointer.x = e.clientX;
+        pointer.y = e.clientY;
+
+        if (this.pointers.size === 2) {
+            const distance = this.pointerDistance();
+            const [a, b] = [...this.pointers.values()];
+            const rect = this.canvas.getBoundingClientRect();
+            if (this.pinchDistance) {
+                this.zoomAt(distance / this.pinchDistance, (a.x + b.x) / 2 - rect.left, (a.y + b.y) / 2 - rect.top);
+            }
+            this.pinchDistance = distance;
+        } else if (this.drag) {
+            if (!this.drag.moved && Math.hypot(e.clientX - this.drag.x, e.clientY - this.drag.y) < PLOT_DRAG_THRESHOLD) return;
+            this.drag.moved = true;
+            this.panBy(dx, dy);
+        }
+    }
+
+    onPointerUp(e) {
+        if (!this.pointers.delete(e.pointerId)) return;
+        if (e.type === 'pointerup' && this.drag && !this.drag.moved) {
+            this.activate(this.cellAt(e.clientX, e.clientY));
+        }
+        this.drag = null;
+        this.pinchDistance = this.pointerDistance();
+    }
+
+    onWheel(e) {
+        const rect = this.canvas.getBoundingClientRect();
+        if (e.ctrlKey) {  // also what trackpad pinches send
+            e.preventDefault();
+            this.zoomAt(Math.exp(-e.deltaY * 0.01), e.clientX - rect.left, e.clientY - rect.top);
+        } else if (this.overflows()) {
+            e.preventDefault();
+            this.panBy(-e.deltaX, -e.deltaY);
+        }
+    }
+
+    moveFocus(index) {
+        if (!this.statuses.length) return;
+        const previous = this.focused;
+        this.focused = index;
+        this.drawCell(previous);
+        this.reveal(index);
+        this.drawCell(index);
+        this.live.textContent = `Plot #${index + 1}: ${PLOT_LABELS[this.statuses[index]] || ''}`;
+    }
+
+    onKeyDown(e) {
+        const index = this.focused;
+        const col = index % this.cols;
+        if (e.key === 'ArrowLeft' && col > 0) this.moveFocus(index - 1);
+        else if (e.key === 'ArrowRight' && col < this.cols - 1) this.moveFocus(index + 1);
+        else if (e.key === 'ArrowUp' && index >= this.cols) this.moveFocus(index - this.cols);
+        else if (e.key === 'ArrowDown' && index + this.cols < this.statuses.length) this.moveFocus(index + this.cols);
+        else if (e.key === 'Enter' || e.key === ' ') this.activate(index);
+        else if (e.key === '+' || e.key === '=') this.zoomBy(1.25);
+        else if (e.key === '-') this.zoomBy(0.8);
+        else if (e.key === '0') this.fit();
+        else if (!e.key.startsWith('Arrow')) return;
+        e.preventDefault();
+    }
+}
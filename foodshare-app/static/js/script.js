@@ -28,8 +28,7 @@ function createGarden() {
         name: formData.get('name'),
         description: formData.get('description'),
         location: formData.get('location'),
-        plants: formData.get('plants'),
-        user_id: 1  // Default user ID - update this based on logged-in user
+        plants: formData.get('plants')
     };
 
     // Validate required fields
@@ -99,9 +98,6 @@ function createPost() {
 
     const formData = new FormData(postForm); // picks up file inputs
 
-    // Add user_id 
-    formData.append('user_id', 1);
-
     fetch('/api/posts', {
         method: 'POST',
         body: formData 
@@ -154,3 +150,34 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 });
+
+// Send several API requests in one round trip through /api/batch.
+// requests: [{method, path, body}]; resolves to [{status, body}] in the same
+// order. Atomic batches run in one transaction (see batch.py) and must fit
+// in one call; others are split into calls of BATCH_MAX_REQUESTS.
+const BATCH_MAX_REQUESTS = 20;
+
+function apiBatch(requests, {atomic = false} = {}) {
+    const chunks = [];
+    for (let i = 0; i < requests.length; i += BATCH_MAX_REQUESTS) {
+        chunks.push(requests.slice(i, i + BATCH_MAX_REQUESTS));
+    }
+    if (atomic && chunks.length > 1) {
+        return Promise.reject(new Error(`An atomic batch can have at most ${BATCH_MAX_REQUESTS} requests`));
+    }
+    return Promise.all(chunks.map(chunk =>
+        fetch('/api/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({requests: chunk, atomic: atomic})
+        })
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            return response.json();
+        })
+        .then(data => data.responses)
+    ))
+    .then(results => results.flat());
+}
@@ -0,0 +1,91 @@
+"""
+Shared fixtures: each test gets an app on its own SQLite database.
+
+    cd foodshare-app && python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from activity import activity_buffer  # noqa: E402
+from app import User, create_app, init_db  # noqa: E402
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app with its own database; make_app('name') for a second one.
+
+    initialized=False leaves the database without tables (no init-db).
+    """
+    def make(name='foodshare', initialized=True, **settings):
+        directory = tmp_path / name
+        directory.mkdir()
+
+        class TestConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(directory / 'foodshare.db')
+            KIOSK_SNAPSHOT_DIR = str(directory / 'kiosk')
+            PROFILE_DIR = str(directory / 'profiles')
+            RATELIMIT_FILE = str(directory / 'ratelimit.bin')
+            RATELIMIT_ENABLED = False
+            PROFILE_SAMPLE_RATE = 0
+
+        for key, value in settings.items():
+            setattr(TestConfig, key, value)
+        app = create_app(TestConfig)
+        if initialized:
+            with app.app_context():
+                init_db()
+        return app
+
+    yield make
+    activity_buffer.drain()  # don't let one test's activity reach the next database
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def register():
+    """register(client, username) signs up (and so signs in) a user; returns their id"""
+    def sign_up(client, username):
+        client.post('/register', data={
+            'username': username, 'email': f'{username}@example.com', 'password': 'password123',
+        })
+        with client.application.app_context():
+            return User.query.filter_by(username=username).one().id
+    return sign_up
+
+
+@pytest.fixture
+def user_queries():
+    """A list collecting the SELECTs from the user table run inside `with user_queries:`"""
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('SELECT') and 'FROM user' in statement:
+            recorder.append(statement)
+
+    class Recorder(list):
+        def __enter__(self):
+            self.clear()
+            event.listen(Engine, 'before_cursor_execute', record)
+            return self
+
+        def __exit__(self, *exc):
+            event.remove(Engine, 'before_cursor_execute', record)
+
+    recorder = Recorder()
+    return recorder
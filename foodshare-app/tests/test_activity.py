@@ -0,0 +1,11 @@
+import atexit
+
+import activity
+
+
+def test_apps_share_one_exit_flush(make_app):
+    before = atexit._ncallbacks()
+    make_app('first')
+    latest = make_app('second')
+    assert atexit._ncallbacks() == before
+    assert activity._exit_app is latest
@@ -0,0 +1,95 @@
+import logging
+
+import pytest
+
+import activity
+from app import db, Post, Reply, User
+
+
+@pytest.fixture
+def post_id(client, register):
+    register(client, 'alice')
+    response = client.post('/api/posts', data={'title': 'Spare kale', 'content': 'A bag of it'})
+    return response.json['id']
+
+
+def batch(client, *requests, atomic=False):
+    return client.post('/api/batch', json={'requests': list(requests), 'atomic': atomic})
+
+
+def reply_contents(app):
+    with app.app_context():
+        return [reply.content for reply in Reply.query.order_by(Reply.id)]
+
+
+def test_responses_come_back_in_order(client, post_id):
+    response = batch(
+        client,
+        {'method': 'POST', 'path': f'/api/posts/{post_id}/replies', 'body': {'content': 'Thanks!'}},
+        {'method': 'GET', 'path': f'/api/posts/{post_id}/replies?since=0'},
+        {'method': 'GET', 'path': '/api/posts/9999/replies'},
+        {'method': 'POST', 'path': f'/api/posts/{post_id}/like'},
+    )
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['responses']] == [201, 200, 404, 200]
+    assert [r['content'] for r in response.json['responses'][1]['body']['replies']] == ['Thanks!']
+
+
+def test_form_body_creates_a_post(app, client, post_id):
+    response = batch(client, {'method': 'POST', 'path': '/api/posts',
+                              'form': {'title': 'Extra basil', 'content': 'Two bunches', 'quantity': 2}})
+    assert response.json['responses'][0]['status'] == 201
+    with app.app_context():
+        assert Post.query.filter_by(title='Extra basil').one().quantity == '2'
+
+
+def test_atomic_batch_rolls_back_on_failure(app, client, post_id):
+    response = batch(
+        client,
+        {'method': 'POST', 'path': f'/api/posts/{post_id}/replies', 'body': {'content': 'rolled back'}},
+        {'method': 'POST', 'path': '/api/posts/9999/replies', 'body': {'content': 'no such post'}},
+        {'method': 'POST', 'path': f'/api/posts/{post_id}/replies', 'body': {'content': 'never run'}},
+        atomic=True,
+    )
+    assert response.json['committed'] is False
+    assert [r['status'] for r in response.json['responses']] == [201, 404, 424]
+    assert reply_contents(app) == []
+
+
+def test_atomic_batch_commits(app, client, post_id):
+    response = batch(
+        client,
+        {'method': 'POST', 'path': f'/api/posts/{post_id}/replies', 'body': {'content': 'first'}},
+        {'method': 'POST', 'path': f'/api/posts/{post_id}/replies', 'body': {'content': 'second'}},
+        atomic=True,
+    )
+    assert response.json['committed'] is True
+    assert reply_contents(app) == ['first', 'second']
+
+
+def test_atomic_batch_does_not_flush_activity(app, client, post_id, monkeypatch, caplog):
+    """The flush would wait for the batch's write lock; it happens on a later request"""
+    monkeypatch.setattr(activity, 'ACTIVITY_FLUSH_SIZE', 1)
+    with caplog.at_level(logging.ERROR):
+        response = batch(
+            client,
+            {'method': 'POST', 'path': f'/api/posts/{post_id}/replies', 'body': {'content': 'Thanks!'}},
+            atomic=True,
+        )
+    assert response.json['committed'] is True
+    assert 'Could not flush user activity' not in caplog.text
+
+    client.get(f'/api/posts/{post_id}/replies')
+    with app.app_context():
+        assert User.query.filter_by(username='alice').one().streak == 1
+
+
+@pytest.mark.parametrize('requests', [
+    [],
+    [{'path': '/garden'}],
+    [{'path': '/api/batch'}],
+    [{'method': 'POST', 'path': '/api/posts', 'body': {}, 'form': {}}],
+    [{'path': '/api/gardens'}] * 21,
+])
+def test_rejects_invalid_batches(client, requests):
+    assert client.post('/api/batch', json={'requests': requests}).status_code == 400
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import db, Post, User
+
+
+@pytest.fixture
+def backup(client, register, tmp_path):
+    """An export of a database with the demo user, alice (with a streak) and her post"""
+    user_id = register(client, 'alice')
+    app = client.application
+    client.post('/api/posts', data={'title': 'Spare kale', 'content': 'A bag of it'})
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.streak, user.streak_day = 3, date(2025, 6, 1)
+        db.session.commit()
+
+    path = str(tmp_path / 'backup')
+    result = app.test_cli_runner().invoke(args=['export', path])
+    assert result.exit_code == 0, result.output
+    return path
+
+
+def test_export_import_round_trip(make_app, backup):
+    target = make_app('target', initialized=False)
+    result = target.test_cli_runner().invoke(args=['import', backup])
+    assert result.exit_code == 0, result.output
+    with target.app_context():
+        user = User.query.filter_by(username='alice').one()
+        assert user.streak_day == date(2025, 6, 1)
+        assert isinstance(user.created_at, datetime)
+        assert Post.query.one().author.username == 'alice'
+
+
+def test_import_refuses_tables_with_rows(make_app, backup):
+    target = make_app('target')  # init-db added the demo user
+    result = target.test_cli_runner().invoke(args=['import', backup])
+    assert result.exit_code != 0
+    assert 'user' in result.output and '--resume' in result.output
+    with target.app_context():
+        assert [u.username for u in User.query] == ['demo']
+        assert Post.query.count() == 0
+
+
+def test_resume_continues_after_the_last_loaded_row(make_app, backup):
+    target = make_app('target', initialized=False)
+    runner = target.test_cli_runner()
+    assert runner.invoke(args=['import', backup]).exit_code == 0
+    with target.app_context():  # as if it had stopped after the first user
+        Post.query.delete()
+        User.query.filter(User.username != 'demo').delete()
+        db.session.commit()
+
+    result = runner.invoke(args=['import', '--resume', backup])
+    assert result.exit_code == 0, result.output
+    with target.app_context():
+        assert sorted(u.username for u in User.query) == ['alice', 'demo']
+        assert Post.query.count() == 1
+
+
+def test_postgresql_sequence_reset_quotes_the_table():
+    from sqlalchemy.dialects import postgresql
+
+    from bulk_io import id_sequence_reset
+
+    sql = str(id_sequence_reset(User.__table__, postgresql.dialect()).compile(
+        dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    assert sql == ("SELECT setval(pg_get_serial_sequence('\"user\"', 'id'), coalesce(max(\"user\".id), 0) + 1, false) "
+                   "AS setval_1 \nFROM \"user\"")
@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.mark.parametrize('status', ['active', 'resolved', 'all'])
+def test_board_filters(client, status):
+    assert client.get(f'/community?status={status}').status_code == 200
+    assert client.get(f'/api/posts?status={status}').status_code == 200
+
+
+def test_unknown_board_filter(client):
+    response = client.get('/community?status=bogus')
+    assert response.status_code == 302
+    assert response.headers['Location'] == '/community'
+    assert client.get('/api/posts?status=bogus').status_code == 400
@@ -0,0 +1,26 @@
+import pytest
+
+from app import db, MatchDigest
+
+
+@pytest.fixture
+def digest_user(client, register):
+    user_id = register(client, 'alice')
+    with client.application.app_context():
+        db.session.add_all(MatchDigest(user_id=user_id, match_count=i) for i in range(3))
+        db.session.commit()
+    return user_id
+
+
+def test_digests_page_with_next_before(client, digest_user):
+    first = client.get('/api/digests?limit=2').json
+    second = client.get(f"/api/digests?limit=2&before={first['next_before']}").json
+    assert [d['match_count'] for d in first['digests'] + second['digests']] == [2, 1, 0]
+    assert second['next_before'] is None
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_digests_limit_below_one_returns_one_digest(client, digest_user, limit):
+    response = client.get(f'/api/digests?limit={limit}')
+    assert response.status_code == 200
+    assert len(response.json['digests']) == 1
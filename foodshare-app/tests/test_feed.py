@@ -0,0 +1,34 @@
+import pytest
+
+from app import db, FeedEntry, Garden
+
+
+@pytest.fixture
+def feed_user(client, register):
+    user_id = register(client, 'alice')
+    with client.application.app_context():
+        garden = Garden(name='Riverside', user_id=user_id)
+        db.session.add(garden)
+        db.session.flush()
+        db.session.add_all(FeedEntry(user_id=user_id, garden_id=garden.id, garden_name=garden.name,
+                                     event='claim', plot_index=i) for i in range(5))
+        db.session.commit()
+    return user_id
+
+
+def test_feed_pages_with_next_before(client, feed_user):
+    first = client.get('/api/feed?limit=2').json
+    second = client.get(f"/api/feed?limit=2&before={first['next_before']}").json
+    assert [e['plot_index'] for e in first['entries'] + second['entries']] == [4, 3, 2, 1]
+
+
+@pytest.mark.parametrize('limit', [0, -1, -100])
+def test_feed_limit_below_one_returns_one_entry(client, feed_user, limit):
+    response = client.get(f'/api/feed?limit={limit}')
+    assert response.status_code == 200
+    assert len(response.json['entries']) == 1
+
+
+def test_feed_past_the_end_is_empty(client, feed_user):
+    response = client.get('/api/feed?before=1')
+    assert response.json == {'entries': [], 'next_before': None}
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('packed', [False, True], ids=['plot rows', 'packed'])
+def test_grid_names_owners_with_one_query(make_app, register, user_queries, packed):
+    app = make_app(PACKED_PLOT_LAYOUTS=packed)
+    owner = app.test_client()
+    register(owner, 'owner')
+    garden = owner.post('/api/gardens', json={'name': 'Riverside', 'rows': 2, 'cols': 2,
+                                              'plot_states': ['available'] * 4}).json
+    members = ('alice', 'bob', 'carol')
+    for index, name in enumerate(members):
+        member = app.test_client()
+        register(member, name)
+        assert member.post(f"/api/gardens/{garden['id']}/plots/{index}/claim").status_code == 200
+
+    with user_queries:
+        plots = owner.get(f"/api/gardens/{garden['id']}/plots").json['plots']
+
+    assert [plot['owner'] for plot in plots] == [*members, None]
+    assert len(user_queries) == 1
@@ -0,0 +1,37 @@
+from ratelimit import IP_BUDGET_MULTIPLIER, RateLimit, RateLimiter
+
+LIMIT = RateLimit(burst=2, per_minute=1)
+NOW = 1_000_000.0
+
+
+def buckets(user):
+    return [('like:ip:10.0.0.1', LIMIT, IP_BUDGET_MULTIPLIER), (f'like:user:{user}', LIMIT, 1)]
+
+
+def test_denied_user_does_not_spend_the_ip_budget(tmp_path):
+    limiter = RateLimiter(str(tmp_path / 'ratelimit.bin'), slots=64)
+    assert limiter.take(buckets('alice'), now=NOW) == 0
+    assert limiter.take(buckets('alice'), now=NOW) == 0
+    for _ in range(50):
+        assert limiter.take(buckets('alice'), now=NOW) > 0
+
+    # Everyone else behind the address still has the IP's budget minus alice's two
+    for user in range(IP_BUDGET_MULTIPLIER * LIMIT.burst - 2):
+        assert limiter.take(buckets(f'user{user}'), now=NOW) == 0
+    assert limiter.take(buckets('one-too-many'), now=NOW) > 0
+
+
+def test_wait_is_until_the_emptiest_bucket_refills(tmp_path):
+    limiter = RateLimiter(str(tmp_path / 'ratelimit.bin'), slots=64)
+    limiter.take(buckets('alice'), now=NOW)
+    limiter.take(buckets('alice'), now=NOW)
+    assert limiter.take(buckets('alice'), now=NOW) == 60  # one token a minute
+    assert limiter.take(buckets('alice'), now=NOW + 60) == 0
+
+
+def test_rate_limited_requests_get_429(make_app, register):
+    app = make_app(RATELIMIT_ENABLED=True)
+    client = app.test_client()
+    register(client, 'alice')  # the first write from this IP
+    statuses = [client.post('/api/gardens', json={'name': f'Garden {i}'}).status_code for i in range(5)]
+    assert statuses[:3] == [201, 201, 201] and statuses[3:] == [429, 429]
@@ -0,0 +1,49 @@
+import pytest
+
+from app import db, send_match_digests, Garden, GardenPlant, Plant
+from jobs import work
+
+
+@pytest.fixture
+def seeder(app, monkeypatch):
+    import seed_data.seed_database as seed_database
+    monkeypatch.setattr(seed_database, 'app', app)
+    return seed_database
+
+
+def table_counts(app):
+    with app.app_context():
+        return {table.name: db.session.execute(db.select(db.func.count()).select_from(table)).scalar()
+                for table in db.metadata.sorted_tables}
+
+
+def test_clear_database_empties_every_table(app, client, register, seeder):
+    register(client, 'alice')
+    client.post('/api/gardens', json={'name': 'Riverside', 'rows': 2, 'cols': 2, 'plants': 'Kale, Basil'})
+    fan = app.test_client()
+    register(fan, 'bob')
+    fan.post('/favorites', data={'action': 'add', 'plant_name': 'Kale'})
+    client.post('/api/posts', data={'title': 'Spare kale', 'content': 'A bag of it', 'food_type': 'Kale'})
+    with app.app_context():
+        work(burst=True)  # match_post
+        send_match_digests()
+        db.session.commit()
+
+    before = table_counts(app)
+    for table in ('favorite_plant', 'surplus_match', 'match_digest', 'garden_plant', 'plant', 'change_log', 'job'):
+        assert before[table], table
+
+    seeder.clear_database()
+
+    assert {name: count for name, count in table_counts(app).items() if count} == {}
+
+
+def test_seeded_gardens_are_indexed(app, seeder):
+    seeder.clear_database()
+    seeder.create_gardens(seeder.create_users())
+
+    with app.app_context():
+        herbs = Garden.query.filter(Garden.plants != '').all()
+        assert herbs
+        linked = db.session.query(GardenPlant.garden_id, Plant.name).join(Plant).all()
+        assert sorted(linked) == sorted((garden.id, 'Herbs') for garden in herbs)
@@ -0,0 +1,16 @@
+def test_plot_changes_carry_owner_names_from_one_query(app, client, register, user_queries):
+    register(client, 'owner')
+    garden = client.post('/api/gardens', json={'name': 'Riverside', 'rows': 1, 'cols': 3,
+                                               'plot_states': ['available'] * 3}).json
+    for index, name in enumerate(('alice', 'bob')):
+        member = app.test_client()
+        register(member, name)
+        assert member.post(f"/api/gardens/{garden['id']}/plots/{index}/claim").status_code == 200
+
+    with user_queries:
+        changes = client.get('/api/sync?since=0').json['changes']
+
+    owners = {change['data']['plot_index']: change['data']['owner']
+              for change in changes if change['entity'] == 'plot'}
+    assert owners == {0: 'alice', 1: 'bob', 2: None}
+    assert len(user_queries) == 1
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import event
+
+from app import db, allocate_waitlist, Garden, GardenOccupancy, GardenPlot, User, WaitlistEntry
+
+
+def waitlisted_garden(app, register):
+    """A garden with two free plots and two users waiting for one; returns its id"""
+    client = app.test_client()
+    register(client, 'owner')
+    client.post('/api/gardens', json={'name': 'Riverside', 'rows': 1, 'cols': 2,
+                                      'plot_states': ['available', 'available']})
+    for name in ('alice', 'bob'):
+        register(app.test_client(), name)
+    with app.app_context():
+        garden = Garden.query.filter_by(name='Riverside').one()
+        for name in ('alice', 'bob'):
+            user = User.query.filter_by(username=name).one()
+            db.session.add(WaitlistEntry(garden_id=garden.id, user_id=user.id))
+        db.session.commit()
+        return garden.id
+
+
+def occupancy(garden_id):
+    row = db.session.get(GardenOccupancy, garden_id)
+    return row.available, row.taken
+
+
+@pytest.mark.parametrize('packed', [False, True], ids=['plot rows', 'packed'])
+def test_allocates_free_plots_in_order(make_app, register, packed):
+    app = make_app(PACKED_PLOT_LAYOUTS=packed)
+    garden_id = waitlisted_garden(app, register)
+    with app.app_context():
+        assert [index for _, index in allocate_waitlist(garden_id, 'fifo')] == [0, 1]
+        assert occupancy(garden_id) == (0, 2)
+        assert {e.status for e in WaitlistEntry.query.filter_by(garden_id=garden_id)} == {'allocated'}
+
+
+def test_plot_claimed_during_allocation_leaves_everyone_waiting(app, register):
+    """A claim that lands between reading the free plots and assigning them wins"""
+    garden_id = waitlisted_garden(app, register)
+
+    def claim_plot_first(conn, cursor, statement, parameters, context, executemany):
+        if executemany and statement.startswith('UPDATE garden_plot SET status'):
+            cursor.connection.execute(
+                "UPDATE garden_plot SET status = 'taken' WHERE garden_id = ? AND plot_index = 0", (garden_id,)
+            )
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', claim_plot_first)
+        try:
+            assert allocate_waitlist(garden_id, 'fifo') == []
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', claim_plot_first)
+
+        assert occupancy(garden_id) == (2, 0)
+        assert {e.status for e in WaitlistEntry.query.filter_by(garden_id=garden_id)} == {'waiting'}
+        assert GardenPlot.query.filter_by(garden_id=garden_id, status='taken').count() == 0  # rolled back too
+
+
+def test_packed_layout_changed_during_allocation_leaves_everyone_waiting(make_app, register):
+    app = make_app(PACKED_PLOT_LAYOUTS=True)
+    garden_id = waitlisted_garden(app, register)
+
+    def claim_plot_first(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE garden SET plot_states'):
+            cursor.connection.execute("UPDATE garden SET plot_states = 'ta' WHERE id = ?", (garden_id,))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', claim_plot_first)
+        try:
+            assert allocate_waitlist(garden_id, 'fifo') == []
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', claim_plot_first)
+
+        assert {e.status for e in WaitlistEntry.query.filter_by(garden_id=garden_id)} == {'waiting'}
+        assert GardenPlot.query.filter_by(garden_id=garden_id).count() == 0
@@ -2,7 +2,11 @@
 """
 WSGI entry point for production deployment
 """
-from app import app
+from app import create_app
+from plant_search import warm_plant_names
+
+app = create_app()
+warm_plant_names(app)  # under preload_app, workers inherit the loaded trie
 
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()